@@ -262,5 +262,20 @@ CREATE TABLE `HCS_Capacity` (
     ON UPDATE CASCADE
 ) ENGINE=InnoDB;
 
+-- -----------------------------------------------------
+-- Table `element_database_anal`.`Anal_Dependencies`
+-- Which reference keys (concrete strength class, steel grade, test region) each analysis
+-- row was computed from, so `cli.py invalidate` can recompute only the rows a corrected
+-- material-library row or new in-situ test result reaches.
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `Anal_Dependencies` (
+  `Anal_Table` VARCHAR(30) NOT NULL,
+  `Product_ID` VARCHAR(30) NOT NULL,
+  `Ref_Kind` VARCHAR(20) NOT NULL,
+  `Ref_Key` VARCHAR(45) NOT NULL,
+  PRIMARY KEY (`Anal_Table`, `Product_ID`, `Ref_Kind`, `Ref_Key`),
+  INDEX `idx_anal_dep_ref` (`Ref_Kind`, `Ref_Key`)
+) ENGINE=InnoDB;
+
 
 
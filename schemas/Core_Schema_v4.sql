@@ -1344,6 +1344,69 @@ CREATE TABLE IF NOT EXISTS `element_database_core`.`LCC` (
 ENGINE = InnoDB;
 
 
+-- -----------------------------------------------------
+-- Table `element_database_core`.`Core_Change_Log`
+-- Written by the core loaders: one row per element/reinforcement/zone key a load touched.
+-- The phys and anal loaders' --incremental mode rebuilds only the logged keys, then stamps
+-- the rows consumed.
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `element_database_core`.`Core_Change_Log` (
+  `Change_ID` BIGINT NOT NULL AUTO_INCREMENT,
+  `Element` VARCHAR(15) NOT NULL,
+  `Table_Name` VARCHAR(50) NOT NULL,
+  `Product_ID` VARCHAR(30) NULL,
+  `Reinf_ID` VARCHAR(30) NULL,
+  `Zone_ID` VARCHAR(30) NULL,
+  `Logged_At` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `Phys_Consumed_At` TIMESTAMP NULL,
+  `Anal_Consumed_At` TIMESTAMP NULL,
+  PRIMARY KEY (`Change_ID`),
+  INDEX `idx_change_log_phys` (`Element` ASC, `Phys_Consumed_At` ASC) VISIBLE,
+  INDEX `idx_change_log_anal` (`Anal_Consumed_At` ASC) VISIBLE)
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `element_database_core`.`Run_Ledger`
+-- Written by `cli.py run-all`: one checkpoint row per pipeline stage of a run, so a restarted
+-- run skips the stages already done (core workbooks are matched by a fingerprint of the file).
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `element_database_core`.`Run_Ledger` (
+  `Run_ID` VARCHAR(64) NOT NULL,
+  `Stage` VARCHAR(150) NOT NULL,
+  `Fingerprint` VARCHAR(64) NOT NULL DEFAULT '',
+  `Status` ENUM('done', 'failed') NOT NULL,
+  `Seconds` FLOAT NULL,
+  `Detail` TEXT NULL,
+  `Finished_At` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`Run_ID`, `Stage`))
+ENGINE = InnoDB;
+
+
+-- -----------------------------------------------------
+-- Table `element_database_core`.`Phys_Work_Queue`
+-- Partitions of a distributed phys build (load-phys --partitions). Each row is one slice of an
+-- element's products for one phase of its stages; workers claim pending rows with
+-- SELECT ... FOR UPDATE SKIP LOCKED, and a phase is claimable once every earlier phase of the
+-- element is done.
+-- -----------------------------------------------------
+CREATE TABLE IF NOT EXISTS `element_database_core`.`Phys_Work_Queue` (
+  `Job_ID` VARCHAR(64) NOT NULL,
+  `Element` VARCHAR(15) NOT NULL,
+  `Phase` INT NOT NULL,
+  `Part` INT NOT NULL,
+  `Products` MEDIUMTEXT NOT NULL,
+  `Reinfs` MEDIUMTEXT NOT NULL,
+  `Status` ENUM('pending', 'running', 'done', 'failed') NOT NULL DEFAULT 'pending',
+  `Worker` VARCHAR(150) NULL,
+  `Claimed_At` TIMESTAMP NULL,
+  `Seconds` FLOAT NULL,
+  `Detail` TEXT NULL,
+  PRIMARY KEY (`Job_ID`, `Element`, `Phase`, `Part`),
+  INDEX `idx_work_queue_claim` (`Job_ID` ASC, `Status` ASC, `Phase` ASC) VISIBLE)
+ENGINE = InnoDB;
+
+
 SET SQL_MODE=@OLD_SQL_MODE;
 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;
 SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;
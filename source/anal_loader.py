@@ -1,31 +1,91 @@
 # Import packages
-import yaml
 import pandas as pd
-from sqlalchemy import text
-from utils.formulas import FORMULA_REGISTRY
-import inspect
+from utils.formulas import FORMULA_REGISTRY, BATCH_REGISTRY
+from utils.plan import load_plans
+from utils.fetch import fetch_by_keys, select_list
+from utils.upsert import upsert_frame, DEFAULT_CHUNKSIZE
+from utils.changelog import pending_changes, mark_consumed, expanding
+from utils.depindex import dependency_rows, write_dependencies, dependents
+from utils.layers import pivot_layers
+
+# How the Beam_Capacity input frame is assembled: "pandas" reads each source table and merges
+# client-side; "sql" runs one cross-schema statement on the core connection (both schemas must
+# live on the same MySQL server), so only the final feature rows cross the wire.
+ASSEMBLY_MODES = ("pandas", "sql")
+
+# Beam_Capacity inputs in one statement: layers ranked by effective depth (1 = tensile As1/d,
+# 2 = compressive As2/d', both 0 for a single layer as in utils.layers), the steel grade of each
+# Reinf_ID's first bar row, and the material and width lookups. {core} and {phys} are the schema names.
+BEAM_FEATURES_SQL = """
+WITH layers AS (
+    SELECT Reinf_ID, bar_area_mm2, effective_depth_mm,
+           ROW_NUMBER() OVER (PARTITION BY Reinf_ID ORDER BY effective_depth_mm DESC, Long_ID) AS layer
+      FROM `{phys}`.`Beam_Long_Reinf`
+), grades AS (
+    SELECT Reinf_ID, Steel_Grade,
+           ROW_NUMBER() OVER (PARTITION BY Reinf_ID ORDER BY Long_ID) AS pick
+      FROM `{core}`.`Beam_Long_Reinf`
+), grade_counts AS (
+    SELECT Reinf_ID, COUNT(DISTINCT Steel_Grade) AS n_grades
+      FROM `{core}`.`Beam_Long_Reinf`
+     GROUP BY Reinf_ID
+), features AS (
+    SELECT g.Reinf_ID, g.Steel_Grade, sp.f_yk AS fyk_MPa,
+           l1.bar_area_mm2 AS As1_mm2, COALESCE(l2.bar_area_mm2, 0) AS As2_mm2,
+           l1.effective_depth_mm AS d_mm, COALESCE(l2.effective_depth_mm, 0) AS dp_mm,
+           bg.Product_ID, bg.Strength_Class, cp.f_ck AS fck_MPa, pg.total_width_mm AS b_mm,
+           gc.n_grades
+      FROM grades g
+      JOIN grade_counts gc ON gc.Reinf_ID = g.Reinf_ID
+      JOIN layers l1 ON l1.Reinf_ID = g.Reinf_ID AND l1.layer = 1
+      LEFT JOIN layers l2 ON l2.Reinf_ID = g.Reinf_ID AND l2.layer = 2
+      JOIN `{core}`.`Beam_Geometry` bg ON bg.Reinf_ID = g.Reinf_ID
+      LEFT JOIN `{core}`.`Concrete_Props` cp ON cp.Strength_Class = bg.Strength_Class
+      LEFT JOIN `{core}`.`Steel_Props` sp ON sp.Steel_Grade = g.Steel_Grade
+      LEFT JOIN `{phys}`.`Beam_Geometry` pg ON pg.Product_ID = bg.Product_ID
+     WHERE g.pick = 1
+)
+SELECT * FROM features"""
 
 
 class AnalysisLoader:
-    def __init__(self, core_engine, phys_engine, anal_engine, mapping_path: str):
+    def __init__(self, core_engine, phys_engine, anal_engine, mapping_path: str,
+                 upsert_method: str = "chunked", chunksize: int = DEFAULT_CHUNKSIZE, incremental: bool = False,
+                 assembly: str = "pandas"):
         self.core_engine = core_engine      # element_database_core
         self.phys_engine = phys_engine      # element_database_phys
         self.anal_engine = anal_engine      # element_database_anal
-        with open(mapping_path, 'r') as f:
-            self.mapping = yaml.safe_load(f)
-
-    def _fetch_core(self, table: str) -> pd.DataFrame:
-        return pd.read_sql(f"SELECT * FROM `{table}`", self.core_engine)
-
-    def _fetch_phys(self, table: str) -> pd.DataFrame:
-        return pd.read_sql(f"SELECT * FROM `{table}`", self.phys_engine)
-
-    # Copy the DataFrame and for each column in cfg, apply its formula.
-    def _apply_formulas(self, df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
+        self.upsert_method = upsert_method  # "chunked" or "temp_table" (see utils.upsert)
+        self.chunksize = chunksize
+        self.incremental = incremental  # rebuild only rows whose core inputs are in Core_Change_Log
+        self.changes = None
+        self.scope = None  # {anal table: Product_IDs} when only invalidated rows are recomputed
+        if assembly not in ASSEMBLY_MODES:
+            raise ValueError(f"Unknown assembly mode '{assembly}', expected one of {ASSEMBLY_MODES}")
+        self.assembly = assembly  # "pandas" or "sql" (see BEAM_FEATURES_SQL)
+        # Compiled plan: formula args are checked against the assembled feature columns up front
+        self.mapping, plans = load_plans(mapping_path, "anal")
+        self.plan = plans[None]
+
+    # Projected reads: only the named columns are fetched, never SELECT *
+    def _fetch_core(self, table: str, columns) -> pd.DataFrame:
+        return pd.read_sql(f"SELECT {select_list(columns)} FROM `{table}`", self.core_engine)
+
+    def _fetch_phys(self, table: str, columns) -> pd.DataFrame:
+        return pd.read_sql(f"SELECT {select_list(columns)} FROM `{table}`", self.phys_engine)
+
+    # Copy the DataFrame and for each step of a compiled stage, apply its formula.
+    def _apply_formulas(self, df: pd.DataFrame, steps) -> pd.DataFrame:
         out = df.copy()
-        for col, col_cfg in cfg["columns"].items():
-            func     = FORMULA_REGISTRY[col_cfg["formula"]]
-            args     = col_cfg.get("args", [])
+        for step in steps:
+            func     = FORMULA_REGISTRY[step.formula]
+            args     = step.arg_names
+
+            # Column-at-a-time path: pass whole columns when a batch implementation exists
+            batch = BATCH_REGISTRY.get(step.formula)
+            if batch is not None:
+                out[step.name] = batch(*[out[a].to_numpy() for a in args])
+                continue
 
             # Build a row-wise call
             def apply_fn(row, func=func, args=args):
@@ -34,108 +94,159 @@ class AnalysisLoader:
                     vals.append(row[a])
                 return func(*vals)
 
-            out[col] = out.apply(apply_fn, axis=1)
+            out[step.name] = out.apply(apply_fn, axis=1)
 
         return out
     
-    # Insert or update into element_database_anal.<table> using a temp table.
+    # What the table holds for df's primary keys, the rows a write of df is compared with
+    def _fetch_anal(self, df: pd.DataFrame, table: str, pk: str) -> pd.DataFrame:
+        return fetch_by_keys(self.anal_engine, f"`{table}`", df.columns, pk, df[pk].dropna().astype(str),
+                             self.chunksize)
+
+    # Insert or update into element_database_anal.<table> (chunked multi-row upsert by default),
+    # writing only the rows and columns whose values differ from what the table holds
     def _upsert_anal(self, df: pd.DataFrame, table: str, pk: str):
-        tmp = f"_tmp_{table}"
-        with self.anal_engine.begin() as conn:
-            # drop old temp
-            conn.execute(text(f"DROP TABLE IF EXISTS `{tmp}`;"))
-            # create it
-            df.to_sql(tmp, conn, if_exists="fail", index=False)
-            # build upsert
-            cols    = ", ".join(f"`{c}`" for c in df.columns)
-            updates = ", ".join(f"`{c}`=VALUES(`{c}`)"
-                                for c in df.columns if c != pk)
-            conn.execute(text(f"""
-                INSERT INTO `{table}` ({cols})
-                SELECT {cols} FROM `{tmp}`
-                ON DUPLICATE KEY UPDATE {updates};
-            """))
-            # clean up
-            conn.execute(text(f"DROP TABLE `{tmp}`;"))
+        upsert_frame(self.anal_engine, df, table, pk, method=self.upsert_method, chunksize=self.chunksize,
+                     existing=self._fetch_anal(df, table, pk), types=self.plan.target_types.get(table))
+
+    # Test regions covering each element of a family, as (Product_ID, Test_Region_ID)
+    def _test_regions(self, elt_name: str) -> pd.DataFrame:
+        return pd.read_sql(
+            f"SELECT e.Product_ID, tr.Test_Region_ID FROM Test_Region tr "
+            f"JOIN {elt_name}_Element e ON e.Element_ID = tr.Element_ID WHERE e.Product_ID IS NOT NULL",
+            self.core_engine)
+
+    # Recompute only the analysis rows computed from the given keys of a reference table
+    # (a corrected Concrete_Props/Steel_Props row, or new Concrete/Reinforcement_Testing results)
+    def invalidate(self, ref_table: str, keys):
+        stale = dependents(self.anal_engine, ref_table, keys)
+        if not stale:
+            print(f"[invalidate] no analysis rows depend on {ref_table} {list(keys)}")
+            return
+        print(f"[invalidate] {ref_table} {list(keys)}: "
+              + ", ".join(f"{len(products)} rows of {table}" for table, products in stale.items()))
+        self.scope = stale
+        self.run()
+
+    # Beam_Capacity inputs from per-table reads, merged and pivoted client-side
+    def _beam_features(self) -> pd.DataFrame:
+        # Pull geometry + concrete strength from core
+        df_geom = pd.read_sql(
+            "SELECT Product_ID, Reinf_ID, Strength_Class FROM Beam_Geometry",
+            self.core_engine
+        )
+        df_ck = pd.read_sql(
+            "SELECT Strength_Class, f_ck AS fck_MPa FROM Concrete_Props",
+            self.core_engine
+        )
+        df_geom = df_geom.merge(df_ck, on="Strength_Class", how="left")
+
+        # Pull reinforcement grade from core, and check uniformity
+        df_r = pd.read_sql(
+            "SELECT Reinf_ID, Steel_Grade FROM Beam_Long_Reinf",
+            self.core_engine
+        )
+        # Warn if any Reinf_ID has >1 grade
+        self._warn_grades(df_r.groupby("Reinf_ID")["Steel_Grade"].nunique())
+        # Reduce to one grade per Reinf_ID
+        df_r = df_r.drop_duplicates(["Reinf_ID"]) 
+
+        # Map to f_yk
+        df_sy = pd.read_sql(
+            "SELECT Steel_Grade, f_yk AS fyk_MPa FROM Steel_Props",
+            self.core_engine
+        )
+        df_r = df_r.merge(df_sy, on="Steel_Grade", how="left")
+
+        # Pull areas & depth layer‐wise from phys
+        df_lp = pd.read_sql(
+            "SELECT Long_ID, Reinf_ID, bar_area_mm2, effective_depth_mm "
+            "  FROM Beam_Long_Reinf",
+            self.phys_engine
+        )
+
+        # Deepest layer = tensile (As1, d), next = compressive (As2, d')
+        df_lp2 = pivot_layers(df_lp, tiebreak="Long_ID")
+
+        # Assemble into one table keyed by Reinf_ID
+        df = (
+            df_r
+            .merge(df_lp2, on="Reinf_ID", how="inner")
+            .merge(df_geom, on="Reinf_ID", how="inner")  # brings in Product_ID & fck
+        )
+
+        # Pull b_mm from phys layer and merge on Product_ID
+        df_b = pd.read_sql(
+            "SELECT Product_ID, total_width_mm AS b_mm "
+            "  FROM Beam_Geometry",
+            self.phys_engine
+        )
+        df = df.merge(df_b, on="Product_ID", how="left")
+        return df
+
+    # Beam_Capacity inputs from one cross-schema statement; the incremental/invalidation filters
+    # are applied server-side too
+    def _beam_features_sql(self) -> pd.DataFrame:
+        sql = BEAM_FEATURES_SQL.format(core=self.core_engine.url.database, phys=self.phys_engine.url.database)
+        conds, params = [], {}
+        if self.changes is not None:
+            where, params = self.changes.where(["Product_ID", "Reinf_ID"])
+            conds.append(f"({where})")
+        if self.scope is not None:
+            params["scope"] = sorted(self.scope.get("Beam_Capacity", set()))
+            conds.append("`Product_ID` IN :scope")
+        if conds:
+            sql += " WHERE " + " AND ".join(conds)
+        df = pd.read_sql(expanding(sql, params), self.core_engine, params=params)
+        self._warn_grades(df.drop_duplicates("Reinf_ID").set_index("Reinf_ID")["n_grades"])
+        return df.drop(columns="n_grades")
+
+    # Warn about Reinf_IDs whose bars have more than one steel grade (the first bar row's is used)
+    def _warn_grades(self, n_grades: pd.Series):
+        varying = n_grades[n_grades > 1]
+        if not varying.empty:
+            print(f"[warn] Reinf_IDs with multiple steel grades: {list(varying.index)}")
 
     def run(self):
+        # Incremental: only core changes phys has already applied, widened to every beam sharing a Reinf_ID
+        if self.incremental:
+            links = self._fetch_core("Beam_Geometry", ["Product_ID", "Reinf_ID"])
+            self.changes = pending_changes(self.core_engine, "anal", products_reinfs=links)
+            if self.changes.empty:
+                print("[incremental] anal: no pending core changes")
+                return
+            print(f"[incremental] anal: rebuilding {self.changes}")
+
         # Only implement Beam_Capacity here for this version; other tables can be empty passes
-        if "Beam_Capacity" in self.mapping:
-            cfg = self.mapping["Beam_Capacity"]
-
-            # Pull geometry + concrete strength from core
-            df_geom = pd.read_sql(
-                "SELECT Product_ID, Reinf_ID, Strength_Class FROM Beam_Geometry",
-                self.core_engine
-            )
-            df_ck = pd.read_sql(
-                "SELECT Strength_Class, f_ck AS fck_MPa FROM Concrete_Props",
-                self.core_engine
-            )
-            df_geom = df_geom.merge(df_ck, on="Strength_Class", how="left")
-
-            # Pull reinforcement grade from core, and check uniformity
-            df_r = pd.read_sql(
-                "SELECT Reinf_ID, Steel_Grade FROM Beam_Long_Reinf",
-                self.core_engine
-            )
-            # Warn if any Reinf_ID has >1 grade
-            bad = df_r.groupby("Reinf_ID")["Steel_Grade"].nunique()
-            varying = bad[bad>1]
-            if not varying.empty:
-                print(f"[warn] Reinf_IDs with multiple steel grades: {list(varying.index)}")
-            # Reduce to one grade per Reinf_ID
-            df_r = df_r.drop_duplicates(["Reinf_ID"]) 
-
-            # Map to f_yk
-            df_sy = pd.read_sql(
-                "SELECT Steel_Grade, f_yk AS fyk_MPa FROM Steel_Props",
-                self.core_engine
-            )
-            df_r = df_r.merge(df_sy, on="Steel_Grade", how="left")
-
-            # Pull areas & depth layer‐wise from phys
-            df_lp = pd.read_sql(
-                "SELECT Reinf_ID, bar_area_mm2, effective_depth_mm "
-                "  FROM Beam_Long_Reinf",
-                self.phys_engine
-            ).sort_values("effective_depth_mm", ascending=False)
-
-            # Pivot to get first row = tensile (As1) and second = compressive (As2)
-            def pivot_layers(grp):
-                a1 = grp.iloc[0]["bar_area_mm2"]
-                a2 = grp.iloc[1]["bar_area_mm2"] if len(grp)>1 else 0.0
-                d  = grp.iloc[0]["effective_depth_mm"]
-                dp = grp.iloc[1]["effective_depth_mm"]
-                return pd.Series({"As1_mm2": a1, "As2_mm2": a2, "d_mm": d, "dp_mm": dp})
-
-            df_lp2 = df_lp.groupby("Reinf_ID").apply(pivot_layers).reset_index()
-
-            # Assemble into one table keyed by Reinf_ID
-            df = (
-                df_r
-                .merge(df_lp2, on="Reinf_ID", how="inner")
-                .merge(df_geom, on="Reinf_ID", how="inner")  # brings in Product_ID & fck
-            )
-
-            # Pull b_mm from phys layer and merge on Product_ID
-            df_b = pd.read_sql(
-                "SELECT Product_ID, total_width_mm AS b_mm "
-                "  FROM Beam_Geometry",
-                self.phys_engine
-            )
-            df = df.merge(df_b, on="Product_ID", how="left")
+        stage = self.plan.stage("Beam_Capacity")
+        if stage is not None:
+
+            # Assemble the capacity inputs (client-side merges, or one cross-schema query)
+            df = self._beam_features_sql() if self.assembly == "sql" else self._beam_features()
+            if self.changes is not None:
+                df = df[self.changes.affects(df)]
+            if self.scope is not None:
+                df = df[df["Product_ID"].astype(str).isin(self.scope.get("Beam_Capacity", set()))]
 
             # Compute bending capacities
-            df_cap = self._apply_formulas(df, cfg)
+            df_cap = self._apply_formulas(df, stage.steps)
 
             # Prune & upsert
-            keep = [cfg["pk"], "Reinf_ID"] + list(cfg["columns"].keys())
+            keep = [stage.pk, "Reinf_ID"] + stage.columns
             df_cap = df_cap[keep]
-            self._upsert_anal(df_cap, "Beam_Capacity", pk=cfg["pk"])
+            self._upsert_anal(df_cap, "Beam_Capacity", pk=stage.pk)
+
+            # Index the reference keys each row was computed from, for later invalidation
+            deps = df[["Product_ID", "Strength_Class", "Steel_Grade"]].merge(
+                self._test_regions("Beam"), on="Product_ID", how="left")
+            write_dependencies(self.anal_engine, "Beam_Capacity", df_cap["Product_ID"],
+                               dependency_rows(deps, "Beam_Capacity"))
 
         # Repeat similar empty stubs for the other capacity tables --
         for tbl in ("Wall_Capacity","Column_Capacity",
                     "1W_Slab_Capacity","2W_Slab_Capacity","HCS_Capacity"):
             if tbl in self.mapping:
-                print(f"[skip] no formulas for {tbl} in this proof-of-concept")
\ No newline at end of file
+                print(f"[skip] no formulas for {tbl} in this proof-of-concept")
+
+        if self.incremental:
+            mark_consumed(self.core_engine, "anal", self.changes)
@@ -0,0 +1,95 @@
+#----------------------------------------------------------------------------------------#
+#                        BENCHMARK: FAST-PATH WKT DECODER VS SHAPELY
+#----------------------------------------------------------------------------------------#
+
+"""
+Compares the fast-path decoder in utils/geometry.py against the Shapely-based parsing the
+formulas used before, on synthetic Coords_XYZ (MULTIPOINT Z) and Shape_Coords (MULTIPOINT ZM)
+columns shaped like the ones written by the core loaders.
+
+Run from the repository root:  python source/benchmarks/wkt_decode_bench.py [--rows N]
+"""
+
+# Import packages
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from shapely import wkt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.functions import convert_to_3d, format_multipointz, format_multipointzm
+from utils.geometry import decode_wkt, decode_wkt_column
+
+
+# Wall-like elements: rectangular front/side/plan views with a recess, in whole mm
+def make_coords_xyz(n: int, rng: np.random.Generator) -> list:
+    elements = []
+    for _ in range(n):
+        L = int(rng.integers(1000, 8000)); H = int(rng.integers(2000, 4000)); T = int(rng.integers(150, 300))
+        r = int(rng.integers(50, 400))
+        front = [(0, 0), (0, H), (L, H), (L, 0), (r, 0), (r, r)]
+        side = [(0, 0), (0, H), (T, H), (T, 0)]
+        plan = [(0, 0), (L, 0), (L, T), (0, T)]
+        elements.append(convert_to_3d(front, side, plan))
+    return format_multipointz(elements)
+
+# Stirrup shapes in the YZ plane with bend angles as M, like create_shape_arrays output
+def make_shape_coords(n: int, rng: np.random.Generator) -> list:
+    shapes = []
+    for _ in range(n):
+        w = int(rng.integers(150, 400)); h = int(rng.integers(200, 700)); z0 = int(rng.integers(0, 5000))
+        shapes.append([(0, 25, z0, 79.695), (0, 25, z0 + h, 90), (0, w, z0 + h, 90), (0, w, z0, 90), (0, 40, z0, 100.305)])
+    return format_multipointzm(shapes)
+
+
+# Previous Shapely path for MULTIPOINT Z: build the geometry, pull the coordinates back out
+def shapely_multipointz(wkt_str: str) -> list:
+    geom = wkt.loads(wkt_str)
+    return [(pt.x, pt.y, pt.z) for pt in geom.geoms]
+
+# Shapely path for MULTIPOINT ZM (Shapely drops M, so theta is compared on x, y, z only)
+def shapely_multipointzm(wkt_str: str) -> list:
+    geom = wkt.loads(wkt_str)
+    return [(pt.x, pt.y, pt.z) for pt in geom.geoms]
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fast-path WKT decoder against Shapely")
+    parser.add_argument("--rows", type=int, default=5000, help="Rows per synthetic column")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions (best time is reported)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    columns = [
+        ("Coords_XYZ", make_coords_xyz(args.rows, rng), shapely_multipointz, 3),
+        ("Shape_Coords", make_shape_coords(args.rows, rng), shapely_multipointzm, 4),
+    ]
+
+    print(f"{'column':<14}{'path':<24}{'seconds':>10}{'speed-up':>10}")
+    for name, values, shapely_fn, dims in columns:
+        # Same coordinates from every path (Shapely compared on x, y, z only)
+        flat, offsets = decode_wkt_column(values, "MULTIPOINT", dims)
+        ref = np.concatenate([np.asarray(shapely_fn(v)) for v in values])
+        assert np.array_equal(flat[:, :3], ref) and offsets[-1] == len(ref)
+
+        t_shapely = best_of(lambda: [shapely_fn(v) for v in values], args.repeat)
+        t_single = best_of(lambda: [decode_wkt(v, "MULTIPOINT", dims) for v in values], args.repeat)
+        t_column = best_of(lambda: decode_wkt_column(values, "MULTIPOINT", dims), args.repeat)
+        for label, t in (("shapely per row", t_shapely), ("decode_wkt per row", t_single),
+                         ("decode_wkt_column", t_column)):
+            print(f"{name:<14}{label:<24}{t:>10.4f}{t_shapely / t:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,12 @@ from core.slab_run import load_slab
 from core.materials_run import load_materials
 from core.site_run import load_site
 
-from phys_loader import PhysLoader
-from anal_loader import AnalysisLoader
+from phys_loader import PhysLoader, load_phys_elements, load_phys_distributed, work_phys_job
+from anal_loader import AnalysisLoader, ASSEMBLY_MODES
+from pipeline import run_all
+from utils.upsert import UPSERT_METHODS, DEFAULT_CHUNKSIZE
+from utils.depindex import REFERENCE_TABLES
+from utils.plan import ELEMENTS
 
 def main():
     parser = argparse.ArgumentParser(
@@ -36,10 +40,25 @@ def main():
 
     # Load-phys subcommand
     pp = sub.add_parser("load-phys", help="Generate phys layer from core")
-    pp.add_argument("--element", choices=["wall","beam","column","slab","hcs"], required=True, help="Which element to load")
+    pp.add_argument("--element", choices=["wall","beam","column","slab","hcs","all"], required=True, help="Which element to load ('all' runs every element in parallel)")
     pp.add_argument("--db_core", required=True, help="Name of the core schema (e.g. element_database_core)")
     pp.add_argument("--db_phys", required=True, help="Name of the phys schema (e.g. element_database_phys)")
     pp.add_argument("--mapping",  default="configs/phys_map.yml", help="Path to phys_map.yml")
+    pp.add_argument("--upsert-method", choices=UPSERT_METHODS, default="chunked", help="How phys tables are written")
+    pp.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per multi-row upsert statement")
+    pp.add_argument("--incremental", action="store_true", help="Rebuild only products logged in Core_Change_Log")
+    pp.add_argument("--workers", type=int, default=None, help="Worker processes for --element all or --partitions (default: up to the CPU count)")
+    pp.add_argument("--partitions", type=int, default=None, help="Split each element's products into this many partitions and build them from the Phys_Work_Queue")
+    pp.add_argument("--job", default=None, help="Work-queue job ID for --partitions; reuse it to resume a job or to let phys-worker hosts join")
+
+    # Phys-worker subcommand: join a distributed phys build published by load-phys --partitions
+    pw = sub.add_parser("phys-worker", help="Work partitions of a distributed phys build from the Phys_Work_Queue")
+    pw.add_argument("--db_core", required=True, help="Name of the core schema (e.g. element_database_core)")
+    pw.add_argument("--db_phys", required=True, help="Name of the phys schema (e.g. element_database_phys)")
+    pw.add_argument("--mapping",  default="configs/phys_map.yml", help="Path to phys_map.yml")
+    pw.add_argument("--job", required=True, help="Job ID printed by load-phys --partitions")
+    pw.add_argument("--upsert-method", choices=UPSERT_METHODS, default="chunked", help="How phys tables are written")
+    pw.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per multi-row upsert statement")
 
     # Load-analysis subcommand
     pa = sub.add_parser("load-anal", help="Generate analysis layer from core & phys")
@@ -47,6 +66,32 @@ def main():
     pa.add_argument("--db_phys", required=True, help="Name of the phys schema (e.g. element_database_phys)")
     pa.add_argument("--db_anal", required=True, help="Name of the analysis schema (e.g. element_database_anal)")
     pa.add_argument("--mapping", default="configs/anal_map.yml", help="Path to anal_map.yml")
+    pa.add_argument("--upsert-method", choices=UPSERT_METHODS, default="chunked", help="How analysis tables are written")
+    pa.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per multi-row upsert statement")
+    pa.add_argument("--incremental", action="store_true", help="Rebuild only rows whose core inputs are logged in Core_Change_Log")
+    pa.add_argument("--assembly", choices=ASSEMBLY_MODES, default="pandas", help="Build capacity inputs client-side (pandas) or in one cross-schema query (sql; core and phys on one server)")
+
+    # Invalidate subcommand: recompute the analysis rows that used corrected reference data
+    pi = sub.add_parser("invalidate", help="Recompute analysis rows that depend on changed reference rows")
+    pi.add_argument("--db_core", required=True, help="Name of the core schema (e.g. element_database_core)")
+    pi.add_argument("--db_phys", required=True, help="Name of the phys schema (e.g. element_database_phys)")
+    pi.add_argument("--db_anal", required=True, help="Name of the analysis schema (e.g. element_database_anal)")
+    pi.add_argument("--mapping", default="configs/anal_map.yml", help="Path to anal_map.yml")
+    pi.add_argument("--table", choices=list(REFERENCE_TABLES), required=True, help="Reference table that changed")
+    pi.add_argument("--keys", nargs="+", required=True, help="Changed keys (Strength_Class, Steel_Grade or Test_Region_ID)")
+    pi.add_argument("--upsert-method", choices=UPSERT_METHODS, default="chunked", help="How analysis tables are written")
+    pi.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per multi-row upsert statement")
+
+    # Run-all subcommand: every stage from a folder of workbooks, checkpointed in Run_Ledger
+    pr = sub.add_parser("run-all", help="Run core -> phys -> anal for a folder of workbooks, resuming a failed run")
+    pr.add_argument("--data-dir", required=True, help="Folder of workbooks, matched to loaders by name (Materials*.xlsx, Wall*.xlsx, ...)")
+    pr.add_argument("--db_core", required=True, help="Name of the core schema (e.g. element_database_core)")
+    pr.add_argument("--db_phys", required=True, help="Name of the phys schema (e.g. element_database_phys)")
+    pr.add_argument("--db_anal", required=True, help="Name of the analysis schema (e.g. element_database_anal)")
+    pr.add_argument("--phys-mapping", default="configs/phys_map.yml", help="Path to phys_map.yml")
+    pr.add_argument("--anal-mapping", default="configs/anal_map.yml", help="Path to anal_map.yml")
+    pr.add_argument("--run-id", default=None, help="Ledger key of the run; rerun with the same ID to resume (default: the data folder's name)")
+    pr.add_argument("--workers", type=int, default=4, help="Stages run concurrently")
 
     args = parser.parse_args()
 
@@ -67,12 +112,51 @@ def main():
         # Build engines
         core_url = (f"mysql+mysqlconnector://{args.user}:{args.password}" f"@{args.host}:{args.port}/{args.db_core}")
         phys_url = (f"mysql+mysqlconnector://{args.user}:{args.password}" f"@{args.host}:{args.port}/{args.db_phys}")
+        options = dict(upsert_method=args.upsert_method, chunksize=args.chunksize, incremental=args.incremental)
+        if args.partitions:
+            if args.incremental:
+                parser.error("--partitions rebuilds every product and cannot be combined with --incremental")
+            elements = list(ELEMENTS) if args.element == "all" else [args.element]
+            failed = load_phys_distributed(core_url, phys_url, args.mapping, elements, args.partitions,
+                                           workers=args.workers, job=args.job,
+                                           upsert_method=args.upsert_method, chunksize=args.chunksize)
+            if failed:
+                sys.exit(1)
+            return
+        if args.element == "all":
+            results = load_phys_elements(core_url, phys_url, args.mapping, workers=args.workers, **options)
+            if any(error is not None for error in results.values()):
+                sys.exit(1)
+            return
+
         core_engine = create_engine(core_url)       
         phys_engine = create_engine(phys_url)
 
-        loader = PhysLoader(core_engine, phys_engine, args.mapping, args.element)
+        loader = PhysLoader(core_engine, phys_engine, args.mapping, args.element, **options)
         loader.run()
 
+    elif args.cmd == "run-all":
+        conn = (args.host, args.port, args.user, args.password, args.db_core)
+        mappings = {"phys": args.phys_mapping, "anal": args.anal_mapping}
+        failed = run_all(args.data_dir, conn, args.db_phys, args.db_anal, mappings,
+                         run_id=args.run_id, workers=args.workers)
+        if failed:
+            sys.exit(1)
+
+    elif args.cmd == "phys-worker":
+        core_url = f"mysql+mysqlconnector://{args.user}:{args.password}@{args.host}:{args.port}/{args.db_core}"
+        phys_url = f"mysql+mysqlconnector://{args.user}:{args.password}@{args.host}:{args.port}/{args.db_phys}"
+        work_phys_job(core_url, phys_url, args.mapping, args.job,
+                      dict(upsert_method=args.upsert_method, chunksize=args.chunksize))
+
+    elif args.cmd == "invalidate":
+        core_url = f"mysql+mysqlconnector://{args.user}:{args.password}@{args.host}:{args.port}/{args.db_core}"
+        phys_url = f"mysql+mysqlconnector://{args.user}:{args.password}@{args.host}:{args.port}/{args.db_phys}"
+        anal_url = f"mysql+mysqlconnector://{args.user}:{args.password}@{args.host}:{args.port}/{args.db_anal}"
+        loader = AnalysisLoader(create_engine(core_url), create_engine(phys_url), create_engine(anal_url), args.mapping,
+                                upsert_method=args.upsert_method, chunksize=args.chunksize)
+        loader.invalidate(args.table, args.keys)
+
     else:  # load-analysis
         core_url = f"mysql+mysqlconnector://{args.user}:{args.password}@{args.host}:{args.port}/{args.db_core}"
         phys_url = f"mysql+mysqlconnector://{args.user}:{args.password}@{args.host}:{args.port}/{args.db_phys}"
@@ -81,7 +165,9 @@ def main():
         phys_engine = create_engine(phys_url)
         anal_engine = create_engine(anal_url)
 
-        loader = AnalysisLoader(core_engine, phys_engine, anal_engine, args.mapping)
+        loader = AnalysisLoader(core_engine, phys_engine, anal_engine, args.mapping,
+                                upsert_method=args.upsert_method, chunksize=args.chunksize,
+                                incremental=args.incremental, assembly=args.assembly)
         loader.run()
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 # import connector and packages
 import mysql.connector
-import pandas as pd
 import numpy as np
+from utils.workbook import read_workbook, SheetColumns
 
 from core.tables.Beam_Element import beam_elmt_table
 from core.tables.Beam_Geometry import beam_geom_table
@@ -11,6 +11,7 @@ from core.tables.Beam_Long_Reinf import beam_longReinf_table
 from core.tables.Zone_Anchorage_Beam import zone_anch_table
 from core.tables.Layer_Anchorage_Beam import layer_anch_table
 from core.tables.Beam_Transv_Reinf import beam_transvReinf_table
+from utils.changelog import log_core_changes
 
 
 # Connect to server host
@@ -29,11 +30,14 @@ def load_beam(
     )
     cur = conn.cursor()
 
-    # Read the sheets
-    meta = pd.read_excel(file_path, sheet_name="Beam ID")
-    geom = pd.read_excel(file_path, sheet_name="Geometry")
-    longr = pd.read_excel(file_path, sheet_name="Long Reinf")
-    transr= pd.read_excel(file_path, sheet_name="Transv Reinf")
+    # Read the sheets from one open of the workbook (the columns the table modules use)
+    sheets = read_workbook(file_path, {
+        "Beam ID":      SheetColumns(16),
+        "Geometry":     SheetColumns(37, ("Product ID", "Notes")),
+        "Long Reinf":   SheetColumns(37),
+        "Transv Reinf": SheetColumns(18, ("Reinf ID", "Bent Plane")),
+    })
+    meta, geom, longr, transr = sheets.values()
 
     # Clean NaNs
     for df in (meta, geom, longr, transr):
@@ -53,7 +57,7 @@ def load_beam(
     cur.execute("SET FOREIGN_KEY_CHECKS=1;")
 
     # Bulk INSERT in the correct order
-    for insert, tups in [
+    batches = [
         (super_insert, super_tups),
         (beamGeom_insert, beamGeom_tups),
         (beamMeta_insert, beamMeta_tups),
@@ -63,8 +67,11 @@ def load_beam(
         (zone_insert, zone_tups),
         (layer_insert, layer_tups),
         (beamTrans_insert, beamTrans_tups),
-    ]:
+    ]
+    for insert, tups in batches:
         if tups and insert:                              # only run if non‐empty
             cur.executemany(insert, tups)
+    # Record the keys this load touched, for incremental phys/anal rebuilds
+    log_core_changes(cur, "beam", batches)
     conn.commit()
     conn.close()
\ No newline at end of file
@@ -1,13 +1,14 @@
 # import connector and packages
 import mysql.connector
-import pandas as pd
 import numpy as np
+from utils.workbook import read_workbook, SheetColumns
 
 from core.tables.HCS_Element import hcs_elmt_table
 from core.tables.HCS_Geometry import hcs_geom_table
 from core.tables.Structural_Topping import hcs_topping_table
 from core.tables.HCS_Connections import hcs_conns_table
 from core.tables.HCS_Prestressing import hcs_prestress_table
+from utils.changelog import log_core_changes
 
 
 # Connect to server host
@@ -26,11 +27,14 @@ def load_hcs(
     )
     cur = conn.cursor()
 
-    # Read the sheets
-    meta = pd.read_excel(file_path, sheet_name="Slab ID")
-    geom = pd.read_excel(file_path, sheet_name="Geometry")
-    conns = pd.read_excel(file_path, sheet_name="Connections")
-    prestr = pd.read_excel(file_path, sheet_name="Prestressing")
+    # Read the sheets from one open of the workbook (the columns the table modules use)
+    sheets = read_workbook(file_path, {
+        "Slab ID":      SheetColumns(16),
+        "Geometry":     SheetColumns(22),
+        "Connections":  SheetColumns(11),
+        "Prestressing": SheetColumns(5, ("Reinf ID", "Strand ID", "Layer Num", "Num Wires", "Strand Diameter (mm)", "Steel Grade", "Notes")),
+    })
+    meta, geom, conns, prestr = sheets.values()
 
     # Clean NaNs
     for df in (meta, geom, conns, prestr):
@@ -47,15 +51,18 @@ def load_hcs(
     cur.execute("SET FOREIGN_KEY_CHECKS=0;")
 
     # Bulk INSERT in the correct order
-    for insert, tups in [
+    batches = [
         (super_insert, super_tups),
         (hcsGeom_insert, hcsGeom_tuples),
         (hcsMeta_insert, hcsMeta_tuples),
         (hcsTop_insert, hcsTop_tuples),
         (hcsConn_insert, hcsConn_tuples),
         (hcsPrestr_insert, hcsPrestr_tuples),
-    ]:
+    ]
+    for insert, tups in batches:
         if tups and insert:                             # only run if non‐empty
             cur.executemany(insert, tups)
+    # Record the keys this load touched, for incremental phys/anal rebuilds
+    log_core_changes(cur, "hcs", batches)
     conn.commit()
     conn.close()
\ No newline at end of file
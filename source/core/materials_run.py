@@ -1,7 +1,7 @@
 # import connector and packages
 import mysql.connector
-import pandas as pd
 import numpy as np
+from utils.workbook import read_workbook, SheetColumns
 
 
 # Connect to server host
@@ -20,9 +20,12 @@ def load_materials(
     )
     cur = conn.cursor()
 
-    # Read the sheets
-    conc = pd.read_excel(file_path, sheet_name="Concrete")
-    steel = pd.read_excel(file_path, sheet_name="Steel")
+    # Read the sheets from one open of the workbook (the columns the table modules use)
+    sheets = read_workbook(file_path, {
+        "Concrete": SheetColumns(),
+        "Steel":    SheetColumns(),
+    })
+    conc, steel = sheets.values()
 
     # Clean NaNs
     for df in (conc, steel):
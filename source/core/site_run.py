@@ -1,7 +1,7 @@
 # import connector and packages
 import mysql.connector
-import pandas as pd
 import numpy as np
+from utils.workbook import read_workbook, SheetColumns
 
 from core.tables.Donor_Building import donor_building_table 
 from core.tables.Circularity_Data import circul_data_table
@@ -23,8 +23,11 @@ def load_site(
     )
     cur = conn.cursor()
 
-    # Read the sheets
-    site = pd.read_excel(file_path, sheet_name="Building Data")
+    # Read the sheets from one open of the workbook (the columns the table modules use)
+    sheets = read_workbook(file_path, {
+        "Building Data": SheetColumns(28),
+    })
+    site = sheets["Building Data"]
 
     # Clean NaNs
     site.replace({np.nan: None}, inplace=True)
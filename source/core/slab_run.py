@@ -1,7 +1,7 @@
 # import connector and packages
 import mysql.connector
-import pandas as pd
 import numpy as np
+from utils.workbook import read_workbook, SheetColumns
 
 from core.tables.Slab_Element import slab_elmt_table
 from core.tables.Slab_Geometry import slab_geom_table
@@ -11,6 +11,7 @@ from core.tables.Slab_Long_Reinf import slab_longReinf_table
 from core.tables.Zone_Anchorage_Slab import zone_anch_table
 from core.tables.Layer_Anchorage_Slab import layer_anch_table
 from core.tables.Slab_Transv_Reinf import slab_transvReinf_table
+from utils.changelog import log_core_changes
 
 # Connect to server host
 def load_slab(
@@ -28,11 +29,14 @@ def load_slab(
     )
     cur = conn.cursor()
 
-    # Read the sheets
-    meta = pd.read_excel(file_path, sheet_name="Slab ID")
-    geom = pd.read_excel(file_path, sheet_name="Geometry")
-    longr = pd.read_excel(file_path, sheet_name="Long Reinf")
-    transr= pd.read_excel(file_path, sheet_name="Transv Reinf")
+    # Read the sheets from one open of the workbook (the columns the table modules use)
+    sheets = read_workbook(file_path, {
+        "Slab ID":      SheetColumns(16),
+        "Geometry":     SheetColumns(29, ("Product ID",)),
+        "Long Reinf":   SheetColumns(37),
+        "Transv Reinf": SheetColumns(18, ("Reinf ID", "Bent Plane")),
+    })
+    meta, geom, longr, transr = sheets.values()
 
     # Clean NaNs
     for df in (meta, geom, longr, transr):
@@ -52,7 +56,7 @@ def load_slab(
     cur.execute("SET FOREIGN_KEY_CHECKS=0;")
 
     # Bulk INSERT in the correct order
-    for insert, tups in [
+    batches = [
         (super_insert, super_tups),
         (slabGeom_insert, slabGeom_tups),
         (slabMeta_insert, slabMeta_tups),
@@ -62,8 +66,11 @@ def load_slab(
         (zone_insert, zone_tups),
         (layer_insert, layer_tups),
         (slabTrans_insert, slabTrans_tups),
-    ]:
+    ]
+    for insert, tups in batches:
         if tups and insert:                             # only run if non‐empty
             cur.executemany(insert, tups)
+    # Record the keys this load touched, for incremental phys/anal rebuilds
+    log_core_changes(cur, "slab", batches)
     conn.commit()
     conn.close()
\ No newline at end of file
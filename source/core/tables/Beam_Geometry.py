@@ -1,80 +1,24 @@
 # Import packages
 import pandas as pd
 from utils.functions import format_polygon, convert_to_3d_element, format_multipointz, format_tinz
+from utils.blocks import segment, block_points, nonzero
 
 
 
 # Beam Geometry table data formatting function
 def beam_geom_table(beamGeom_wksh):
 
-    beam_elmt = []
-    front_array = []; side_array = []; plan_array = []
-    poly_array = []
-    has_Connections = []
-    has_Corbel = []
-
-    # Find indices of all unique beam elements
-    for index, rows in beamGeom_wksh.iterrows():
-        if not pd.isnull(rows["Product ID"]):
-            beam_elmt.append(index)
-            
-    # Iterate over the pairs of indices in elmt_index to derive geometry
-    for i in range(len(beam_elmt) - 1):
-        start_index = beam_elmt[i]
-        end_index = beam_elmt[i + 1]
-
-        # Create geometry arrays
-        coords_xz = []
-        coords_yz = []
-        coords_xy = []    
-
-        for index in range(start_index, end_index):
-            front_x, front_z = beamGeom_wksh.iloc[index, 5], beamGeom_wksh.iloc[index, 6]
-            side_y, side_z = beamGeom_wksh.iloc[index, 8], beamGeom_wksh.iloc[index, 9]
-            plan_x, plan_y = beamGeom_wksh.iloc[index, 11], beamGeom_wksh.iloc[index, 12]
-
-            # Skip empty cells
-            if pd.notnull(front_x) and pd.notnull(front_z):
-                coords_xz.append( (front_x, front_z) )
-            if pd.notnull(side_y) and pd.notnull(side_z):
-                coords_yz.append( (side_y, side_z) )
-            if pd.notnull(plan_x) and pd.notnull(plan_y):
-                coords_xy.append( (plan_x, plan_y) )
-
-        front_array.append(coords_xz)
-        side_array.append(coords_yz)
-        plan_array.append(coords_xy)
-
-        # Append to poly_array only if poly_points is not empty
-        if coords_xy:
-            poly_ring = coords_xy + [coords_xy[0]] # Close the polygon
-            poly_array.append(poly_ring)
-
-
-    # Calculate geometry for the last element in the geometry worksheet
-    last_coords_xz = []; last_coords_yz = []; last_coords_xy = []
-    last_start_index = beam_elmt[-1]
-    last_end_index = len(beamGeom_wksh) - 1
-
-    # Create footprint polyline for the last element
-    for index in range(last_start_index, last_end_index):
-        front_x = beamGeom_wksh.iloc[index, 5]
-        front_z = beamGeom_wksh.iloc[index, 6]
-        side_y = beamGeom_wksh.iloc[index, 8]
-        side_z = beamGeom_wksh.iloc[index, 9]
-        plan_x = beamGeom_wksh.iloc[index, 11]
-        plan_y = beamGeom_wksh.iloc[index, 12]
-
-        if front_x is not None and plan_x is not None:
-            last_coords_xz.append((front_x, front_z))
-            last_coords_yz.append((side_y, side_z))
-            last_coords_xy.append((plan_x, plan_y))
-
-    # Append the values for the last element to the respective lists
-    front_array.append(last_coords_xz)
-    side_array.append(last_coords_yz)
-    plan_array.append(last_coords_xy)
-    poly_array.append(last_coords_xy)
+    # Label every row with its beam element: an element opens on each Product ID and runs to the next
+    # one (the last row of the sheet is not read)
+    beam_elmt = segment(beamGeom_wksh["Product ID"].notna(), stop=len(beamGeom_wksh) - 1)
+
+    # Front (x, z), side (y, z) and plan (x, y) coordinates of every element, skipping empty cells
+    front_array = block_points(beamGeom_wksh, beam_elmt, [5, 6])
+    side_array = block_points(beamGeom_wksh, beam_elmt, [8, 9])
+    plan_array = block_points(beamGeom_wksh, beam_elmt, [11, 12])
+
+    # Footprint rings of the elements with plan coordinates
+    poly_array = [coords_xy + [coords_xy[0]] for coords_xy in plan_array if coords_xy] # Close the polygon
 
     # Convert 2D orthographic coordinates in 3D coordinates
     geom_coords = convert_to_3d_element(front_array, side_array, plan_array)
@@ -94,23 +38,10 @@ def beam_geom_table(beamGeom_wksh):
     beam_footprint = pd.DataFrame({"FootprintPolyline": beam_footprint})
 
 
-    # Create boolean dataframes for subtables
-    for index in beam_elmt:
-        # Connection check
-        conn_count = beamGeom_wksh.iloc[index, 14]
-        if pd.isnull(conn_count) or (isinstance(conn_count, (int, float)) and conn_count == 0):
-            conn_check = False
-        else:
-            conn_check = True
-        has_Connections.append(conn_check)
-
-        # Corbel check
-        corb_count = beamGeom_wksh.iloc[index, 21]
-        if pd.isnull(corb_count) or (isinstance(corb_count, (int, float)) and corb_count == 0):
-            corb_check = False
-        else:
-            corb_check = True
-        has_Corbel.append(corb_check)        
+    # Create boolean dataframes for subtables (connection and corbel counts of each element)
+    elmt_rows = beamGeom_wksh.iloc[beam_elmt.rows]
+    has_Connections = nonzero(elmt_rows.iloc[:, 14])
+    has_Corbel = nonzero(elmt_rows.iloc[:, 21])
 
     has_Connections = pd.DataFrame({"has_Connections": has_Connections})
     has_Corbel = pd.DataFrame({"has_Corbel": has_Corbel})
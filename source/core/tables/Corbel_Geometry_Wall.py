@@ -1,60 +1,36 @@
 # Import packages
 import pandas as pd
 from utils.functions import format_multipointz, format_tinz, convert_to_3d_element, skip_empty_sheet
+from utils.blocks import segment, block_points, nonzero
 
 @skip_empty_sheet
 # Wall-Corbel Geometry table data formatting function
 def corbel_geom_table(wallGeom_wksh, wallGeom_rcds):
 
-    corb_indices = []
     corb_front = []; corb_side = []; corb_plan = []
-    extruded_plane = []
- 
-    # Find all corbel indices (each element could have multiple corbels)
-    for idx in range(2, len(wallGeom_wksh)):
-        val = wallGeom_wksh.iloc[idx, 27]
-        if pd.notnull(val) and val != 0:
-            corb_indices.append(idx)
+
+    # Label every row with its corbel: a corbel opens on each non-zero corbel count below the two
+    # header rows (each element could have multiple corbels) and runs to the next one (the last row
+    # of the sheet is not read)
+    corb_indices = segment(nonzero(wallGeom_wksh.iloc[:, 27]), start=2, stop=len(wallGeom_wksh) - 1)
 
     # Extract raw data from worksheet
-    corb_data = wallGeom_wksh.loc[2:, ["Product ID", "Notes"]]
-    corb_data = corb_data.loc[corb_indices,:]
+    corb_data = wallGeom_wksh.loc[corb_indices.rows, ["Product ID", "Notes"]]
     corb_data.reset_index(drop=True, inplace=True) # Reset indices
 
     # Fill all empty Product ID's with the previous ID (for walls with more than one corbel)
-    last_prodID = None
-    for index, row in corb_data.iterrows():
-        if pd.isnull(row["Product ID"]):
-            corb_data.at[index, "Product ID"] = last_prodID
-        else:
-            last_prodID = row["Product ID"]
-
-
-    # Calculate corbel geometrical properties
-    for i in range(len(corb_indices) - 1):
-        start_index = corb_indices[i]
-        end_index = corb_indices[i + 1]
-
-        # Get the extrusion plane for the current corbel
-        plane = wallGeom_wksh.iloc[start_index, 28]
-
-        # Create geometry arrays
-        coords_xz = []
-        coords_yz = []
-        coords_xy = []        
-
-        for index in range(start_index, end_index):
-            front_x, front_z = wallGeom_wksh.iloc[index, 29], wallGeom_wksh.iloc[index, 30]
-            side_y, side_z = wallGeom_wksh.iloc[index, 32], wallGeom_wksh.iloc[index, 33]
-            plan_x, plan_y = wallGeom_wksh.iloc[index, 35], wallGeom_wksh.iloc[index, 36]            
-
-            # Skip empty cells
-            if pd.notnull(front_x) and pd.notnull(front_z):
-                coords_xz.append( (front_x, front_z) )
-            if pd.notnull(side_y) and pd.notnull(side_z):
-                coords_yz.append( (side_y, side_z) )
-            if pd.notnull(plan_x) and pd.notnull(plan_y):
-                coords_xy.append( (plan_x, plan_y) )
+    corb_data["Product ID"] = corb_data["Product ID"].ffill()
+
+    # Extrusion plane of each corbel
+    extruded_plane = wallGeom_wksh.iloc[corb_indices.rows, 28].tolist()
+
+
+    # Calculate corbel geometrical properties (front, side and plan coordinates, skipping empty cells)
+    blocks = zip(extruded_plane,
+                 block_points(wallGeom_wksh, corb_indices, [29, 30]),
+                 block_points(wallGeom_wksh, corb_indices, [32, 33]),
+                 block_points(wallGeom_wksh, corb_indices, [35, 36]))
+    for plane, coords_xz, coords_yz, coords_xy in blocks:
 
         # Extrude the remaining 2D plane.
         if plane == "XZ":
@@ -75,49 +51,6 @@ def corbel_geom_table(wallGeom_wksh, wallGeom_rcds):
         corb_front.append(coords_xz)
         corb_side.append(coords_yz)
         corb_plan.append(coords_xy)
-        extruded_plane.append(plane)
-            
-                
-    # Calculate corbel geometry for last entry in the worksheet
-    last_corb_front, last_corb_side, last_corb_plan = [], [], []
-    last_start_index = corb_indices[-1]
-    last_end_index = len(wallGeom_wksh) - 1
-    last_plane = wallGeom_wksh.iloc[start_index, 28]
-
-    for index in range(last_start_index, last_end_index):
-        front_x, front_z = wallGeom_wksh.iloc[index, 29], wallGeom_wksh.iloc[index, 30]
-        side_y, side_z = wallGeom_wksh.iloc[index, 32], wallGeom_wksh.iloc[index, 33]
-        plan_x, plan_y = wallGeom_wksh.iloc[index, 35], wallGeom_wksh.iloc[index, 36]
-        
-        # Skip empty cells
-        if pd.notnull(front_x) and pd.notnull(front_z):
-            last_corb_front.append( (front_x, front_z) )
-        if pd.notnull(side_y) and pd.notnull(side_z):
-            last_corb_side.append( (side_y, side_z) )
-        if pd.notnull(plan_x) and pd.notnull(plan_y):
-            last_corb_plan.append( (plan_x, plan_y) )
-
-    # Extrude the remaining 2D plane.
-    if plane == "XZ":
-        # We have side and plan, need to infer front 
-        x_side = sorted({x for x, _ in last_corb_plan})
-        z_side = sorted({z for _, z in last_corb_side})
-        last_corb_front = [(x, z) for x in x_side for z in z_side]
-
-    elif plane == "XY":
-        # We have front and plan, need to infer side 
-        y_side = sorted({y for y, _ in last_corb_plan})
-        z_side = sorted({z for _, z in last_corb_front})
-        last_corb_side = [(y, z) for y in y_side for z in z_side]
-
-    # else:
-    #     raise ValueError(f"Unexpected Extrusion Plane: {plane!r}")
-
-    # Append the last corbel geometry to the respective lists
-    corb_front.append(last_corb_front)
-    corb_side.append(last_corb_side)
-    corb_plan.append(last_corb_plan)
-    extruded_plane.append(last_plane)
 
     # Convert 2D orthographic coordinates in 3D coordinate attributes
     corb_3d_coords = convert_to_3d_element(corb_front, corb_side, corb_plan)
@@ -7,22 +7,13 @@ from utils.functions import skip_empty_sheet
 # Layer Anchorage table for wall longitudinal reinforcement -- data formatting function
 def layer_anch_table(wallLongRF_wksh):
 
-    anchor_indices = []
-    layerID_anch = []
-
     layer_anch_data = wallLongRF_wksh.iloc[2:, [21, 22, 23, 24, 25, 26]]
     layer_anch_data.columns =["Anchorage_Type", "Angle_1", "Angle_2", 
                             "Hook_Length_1", "Hook_Length_2", "Notes"]
 
-    # Find all anchorage indices
-    for index, rows in layer_anch_data.iterrows():
-        if not pd.isnull(rows["Anchorage_Type"]):
-            anchor_indices.append(index)
-
-    # Create unqiue IDs
-    for index in anchor_indices:
-        layerID = wallLongRF_wksh.iloc[index, 0] + "_" + wallLongRF_wksh.iloc[index, 1] + "_" + wallLongRF_wksh.iloc[index, 7]
-        layerID_anch.append(layerID)
+    # Create unqiue IDs for all anchored layers
+    anchored = wallLongRF_wksh.iloc[2:][layer_anch_data["Anchorage_Type"].notna()]
+    layerID_anch = anchored.iloc[:, 0] + "_" + anchored.iloc[:, 1] + "_" + anchored.iloc[:, 7]
 
 
     # Remove empty rows and reset indices
@@ -31,11 +22,12 @@ def layer_anch_table(wallLongRF_wksh):
 
 
     # Create (bent angle, bent length) arrays
-    anchorage_start = layer_anch_data.apply(lambda row: ((row['Angle_1'], row['Hook_Length_1'])), axis=1) # left or bottom end.
-    anchorage_end = layer_anch_data.apply(lambda row: ((row['Angle_2'], row['Hook_Length_2'])), axis=1) # left or bottom end.
+    angles = layer_anch_data[["Angle_1", "Hook_Length_1", "Angle_2", "Hook_Length_2"]].to_numpy(dtype=object)
+    anchorage_start = list(zip(angles[:, 0], angles[:, 1])) # left or bottom end.
+    anchorage_end = list(zip(angles[:, 2], angles[:, 3])) # right or top end.
 
     # Convert to dataframes
-    layerID_anch = pd.DataFrame({"Layer_ID": layerID_anch})
+    layerID_anch = pd.DataFrame({"Layer_ID": layerID_anch.to_numpy()})
     anchorage_start = pd.DataFrame({"Anchorage_Start": anchorage_start}).astype(str)
     anchorage_end = pd.DataFrame({"Anchorage_End": anchorage_end}).astype(str)
 
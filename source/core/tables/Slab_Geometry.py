@@ -1,82 +1,24 @@
 # Import packages
 import pandas as pd
 from utils.functions import format_polygon, convert_to_3d_element, format_multipointz, format_tinz
+from utils.blocks import segment, block_points, nonzero
 
 
 
 # slab Geometry table data formatting function
 def slab_geom_table(slabGeom_wksh):
 
-    slab_elmt = []
-    front_array = []; side_array = []; plan_array = []
-    poly_array = []
-    has_Void = []
-    has_Connections = []
-
-    # Find indices of all unique slab elements
-    for index, rows in slabGeom_wksh.iterrows():
-        if not pd.isnull(rows["Product ID"]):
-            slab_elmt.append(index)
-            
-    # Iterate over the pairs of indices in elmt_index to derive geometry
-    for i in range(len(slab_elmt) - 1):
-        start_index = slab_elmt[i]
-        end_index = slab_elmt[i + 1]
-
-        # Create geometry arrays
-        coords_xz = []
-        coords_yz = []
-        coords_xy = []
-  
-
-        for index in range(start_index, end_index):
-            front_x, front_z = slabGeom_wksh.iloc[index, 4], slabGeom_wksh.iloc[index, 5]
-            side_y, side_z = slabGeom_wksh.iloc[index, 7], slabGeom_wksh.iloc[index, 8]
-            plan_x, plan_y = slabGeom_wksh.iloc[index, 10], slabGeom_wksh.iloc[index, 11]
-
-            # Skip empty cells
-            if pd.notnull(front_x) and pd.notnull(front_z):
-                coords_xz.append( (front_x, front_z) )
-            if pd.notnull(side_y) and pd.notnull(side_z):
-                coords_yz.append( (side_y, side_z) )
-            if pd.notnull(plan_x) and pd.notnull(plan_y):
-                coords_xy.append( (plan_x, plan_y) )
-
-        front_array.append(coords_xz)
-        side_array.append(coords_yz)
-        plan_array.append(coords_xy)
-
-        # Append to poly_array only if poly_points is not empty
-        if coords_xy:
-            poly_ring = coords_xy + [coords_xy[0]] # Close the polygon
-            poly_array.append(poly_ring)
-
-
-    # Calculate geometry for the last element in the geometry worksheet
-    last_coords_xz = []; last_coords_yz = []; last_coords_xy = []
-    last_start_index = slab_elmt[-1]
-    last_end_index = len(slabGeom_wksh) - 1
-
-    # Create footprint polyline for the last element
-    for index in range(last_start_index, last_end_index):
-        front_x = slabGeom_wksh.iloc[index, 4]
-        front_z = slabGeom_wksh.iloc[index, 5]
-        side_y = slabGeom_wksh.iloc[index, 7]
-        side_z = slabGeom_wksh.iloc[index, 8]
-        plan_x = slabGeom_wksh.iloc[index, 10]
-        plan_y = slabGeom_wksh.iloc[index, 11]
-
-        if front_x is not None and plan_x is not None:
-            last_coords_xz.append((front_x, front_z))
-            last_coords_yz.append((side_y, side_z))
-            last_coords_xy.append((plan_x, plan_y))
-            # last_poly_points.append((plan_x, plan_y))
-
-    # Append the values for the last element to the respective lists
-    front_array.append(last_coords_xz)
-    side_array.append(last_coords_yz)
-    plan_array.append(last_coords_xy)
-    poly_array.append(last_coords_xy)
+    # Label every row with its slab element: an element opens on each Product ID and runs to the next
+    # one (the last row of the sheet is not read)
+    slab_elmt = segment(slabGeom_wksh["Product ID"].notna(), stop=len(slabGeom_wksh) - 1)
+
+    # Front (x, z), side (y, z) and plan (x, y) coordinates of every element, skipping empty cells
+    front_array = block_points(slabGeom_wksh, slab_elmt, [4, 5])
+    side_array = block_points(slabGeom_wksh, slab_elmt, [7, 8])
+    plan_array = block_points(slabGeom_wksh, slab_elmt, [10, 11])
+
+    # Footprint rings of the elements with plan coordinates
+    poly_array = [coords_xy + [coords_xy[0]] for coords_xy in plan_array if coords_xy] # Close the polygon
 
     # Convert 2D orthographic coordinates in 3D coordinates
     geom_coords = convert_to_3d_element(front_array, side_array, plan_array)
@@ -96,23 +38,10 @@ def slab_geom_table(slabGeom_wksh):
     slab_footprint = pd.DataFrame({"FootprintPolyline": slab_footprint})
 
 
-    # Create boolean dataframes for subtables
-    for index in slab_elmt:
-        # Void check
-        void_count = slabGeom_wksh.iloc[index, 13]
-        if pd.isnull(void_count) or (isinstance(void_count, (int, float)) and void_count == 0):
-            void_check = False
-        else:
-            void_check = True
-        has_Void.append(void_check)
-
-        # Connection check
-        conn_count = slabGeom_wksh.iloc[index, 17]
-        if pd.isnull(conn_count) or (isinstance(conn_count, (int, float)) and conn_count == 0):
-            conn_check = False
-        else:
-            conn_check = True
-        has_Connections.append(conn_check)      
+    # Create boolean dataframes for subtables (void and connection counts of each element)
+    elmt_rows = slabGeom_wksh.iloc[slab_elmt.rows]
+    has_Void = nonzero(elmt_rows.iloc[:, 13])
+    has_Connections = nonzero(elmt_rows.iloc[:, 17])
 
     has_Void = pd.DataFrame({"Has_Void": has_Void})
     has_Connections = pd.DataFrame({"Has_Connections": has_Connections})
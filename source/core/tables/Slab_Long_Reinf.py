@@ -1,7 +1,7 @@
 # import connector and packages
 import pandas as pd
 import numpy as np
-from utils.functions import format_polygon, format_linestr, skip_empty_sheet
+from utils.functions import coord_text, skip_empty_sheet
 
 @skip_empty_sheet
 # Slab Longitudinal Reinforcement table data formatting function
@@ -21,26 +21,17 @@ def slab_longReinf_table(slabLongRF_wksh):
     layerID = zoneID + "_" + slabLongRF_wksh.iloc[2:, 7]
 
     # Create zone polygon coordinate array (H = horizontal, V = vertical) relative to chosen plane
-    zone_cols = slabLongRF_wksh.iloc[2:, [3, 4, 5, 6]]
-    zone_cols.columns = ["H1", "H2", "V1", "V2"]
-    zone_coords = zone_cols.apply(lambda row: ((row['H1'], row['V1']), (row['H1'], row['V2']), 
-                                (row['H2'], row['V2']), (row['H2'], row['V1'])), axis=1)
+    h1, h2, v1, v2 = coord_text(slabLongRF_wksh.iloc[2:, [3, 4, 5, 6]])
 
-    # Reformat zone coordinates in POLYGON WKT format
-    zone_polygon = format_polygon(zone_coords)
+    # Reformat zone coordinates in POLYGON WKT format: (H1 V1, H1 V2, H2 V2, H2 V1), closed
+    zone_polygon = ("POLYGON((" + h1 + " " + v1 + ", " + h1 + " " + v2 + ", " + h2 + " " + v2 + ", "
+                    + h2 + " " + v1 + ", " + h1 + " " + v1 + "))")
 
     # Create layer coordinate array (H = horizontal position, V = vertical position)
-    layer_cols = slabLongRF_wksh.iloc[2:, [12, 13, 14, 15]]
-    layer_cols.columns = ["H1", "H2", "V1", "V2"]
-    layer_cols = layer_cols.astype(int) # Clean coordinates into integers
-    layer_coords = layer_cols.apply(lambda row: ((row['H1'], row['V1']), (row['H2'], row['V2'])), axis=1)
+    h1, h2, v1, v2 = coord_text(slabLongRF_wksh.iloc[2:, [12, 13, 14, 15]].astype(int)) # Clean coordinates into integers
 
     # Reformat layer coordinates in LINESTRING WKT format
-    layer_linestr = []
-    for index, row in layer_coords.items():
-
-        linestr_wkt = format_linestr(row)
-        layer_linestr.append(linestr_wkt)
+    layer_linestr = "LINESTRING(" + h1 + " " + v1 + ", " + h2 + " " + v2 + ")"
 
     # Convert to DataFrames 
     zoneID = pd.DataFrame({"Zone_ID": zoneID})
@@ -48,25 +39,18 @@ def slab_longReinf_table(slabLongRF_wksh):
     zone_polygon = pd.DataFrame({"Zone_Coords": zone_polygon})
     layer_linestr = pd.DataFrame({"Layer_Coords": layer_linestr})
 
-    # Anchorage Type
-    anchor_raw = slabLongRF_wksh.iloc[2:, [21]]
-    anchor_type = pd.DataFrame(index=anchor_raw.index, columns=["Anchorage_Type"])
-
-    # Reclassify the anchorage type based on function (Zone/Layer)
-    for index, row in anchor_raw.iterrows():
-
-        if pd.isnull(row.iloc[0]) or row.iloc[0] == "HAIRPIN":
-            anchor_type.at[index, 'Anchorage_Type'] = "ZONE"
-        elif row.iloc[0] == "NONE":
-            anchor_type.at[index, 'Anchorage_Type'] = "NONE"
-        else:
-            anchor_type.at[index, 'Anchorage_Type'] = "LAYER"
+    # Anchorage Type, reclassified based on function (Zone/Layer)
+    anchor_raw = slabLongRF_wksh.iloc[2:, 21]
+    anchor_type = np.where(anchor_raw.isna() | (anchor_raw == "HAIRPIN"), "ZONE",
+                           np.where(anchor_raw == "NONE", "NONE", "LAYER"))
+    anchor_type = pd.DataFrame({"Anchorage_Type": anchor_type})
 
     # Reset indices in all dataframes to match
     lngReinf_data.reset_index(drop=True, inplace=True)
     zoneID.reset_index(drop=True, inplace=True)
     layerID.reset_index(drop=True, inplace=True)
-    anchor_type.reset_index(drop=True, inplace=True)
+    zone_polygon.reset_index(drop=True, inplace=True)
+    layer_linestr.reset_index(drop=True, inplace=True)
 
     # Concatenate dataframes
     slabLongRF_rcds = pd.concat([lngReinf_data, zoneID, layerID, zone_polygon, layer_linestr, anchor_type], axis=1)
@@ -2,6 +2,7 @@
 import pandas as pd
 import numpy as np
 from utils.functions import create_shape_arrays, format_multipointzm, skip_empty_sheet
+from utils.blocks import segment
 
 @skip_empty_sheet
 # Slab Longitudinal Reinforcement table data formatting function
@@ -14,11 +15,8 @@ def slab_transvReinf_table(slabTrnvRF_wksh):
     zoneID_T.reset_index(drop=True, inplace=True)
 
 
-    # Find indices of all unique reinforcement designs
-    reinf_index = []
-    for index, rows in slabTrnvRF_wksh.iterrows():
-        if not pd.isnull(rows["Reinf ID"]):
-            reinf_index.append(index)
+    # Label every row with its reinforcement design (a design opens on each Reinf ID)
+    reinf_index = segment(slabTrnvRF_wksh["Reinf ID"].notna())
 
 
     # Call function that creates arrays of shape coordinates
@@ -32,9 +30,7 @@ def slab_transvReinf_table(slabTrnvRF_wksh):
     span_cols.columns = ["Start", "End"]
     span_cols = span_cols.dropna() # Drop all empty rows
 
-    span_points = span_cols.apply(lambda row: (row['Start'], row['End']), axis=1)
-    span_points = pd.DataFrame({"Spanned_Length": span_points}).astype(str)
-    span_points.reset_index(drop=True, inplace=True)
+    span_points = pd.DataFrame({"Spanned_Length": list(map(tuple, span_cols.to_numpy()))}).astype(str)
 
 
     # Import raw transverse reinforcement data
@@ -2,70 +2,27 @@
 import pandas as pd
 import numpy as np
 from utils.functions import format_multipointz, format_tinz, skip_empty_sheet
+from utils.blocks import segment, block_points, nonzero
 
 
 @skip_empty_sheet
 # Slab Voids table data formatting function
 def slab_voids_table(slabGeom_wksh, slabGeom_rcds):
 
-    void_indices = []
-    void_array = []
-
-    # Find all void indices (different to slab indices)
-    for index, rows in slabGeom_wksh.iloc[2:].iterrows():
-        if not pd.isnull(rows.iloc[13]) and rows.iloc[13] != 0:
-            void_indices.append(index)
+    # Label every row with its void: a void opens on each non-zero void count (below the two header
+    # rows, so different to slab indices) and runs to the next one (the last row of the sheet is not read)
+    void_indices = segment(nonzero(slabGeom_wksh.iloc[:, 13]), start=2, stop=len(slabGeom_wksh) - 1)
 
     # Add raw data to pd
-    void_data = slabGeom_wksh.iloc[:, [0, 28]]
+    void_data = slabGeom_wksh.iloc[void_indices.rows, [0, 28]]
     void_data.columns = ["Product_ID", "Notes"]
-    void_data = void_data.loc[void_indices,:]
     void_data.reset_index(drop=True, inplace=True) # Reset indices
 
     # Fill all empty Product ID's with the previous ID (for slabs with more than one void)
-    last_prodID = None
-    for index, row in void_data.iterrows():
-        if pd.isnull(row["Product_ID"]):
-            void_data.at[index, "Product_ID"] = last_prodID
-        else:
-            last_prodID = row["Product_ID"]
-
-    # Iterate over the void indices to derive geometric properties
-    for i in range(len(void_indices) - 1):
-        start_index = void_indices[i]
-        end_index = void_indices[i + 1]
-
-        # Create coordinate array
-        void_points = []
-        for index in range(start_index, end_index):
-            x = slabGeom_wksh.iloc[index, 14]
-            y = slabGeom_wksh.iloc[index, 16]
-            z = slabGeom_wksh.iloc[index, 15]
-
-            # Skip empty cells
-            if x is not None and z is not None and y is not None:
-                void_points.append((x, y, z))
-
-        # Append to void_array only if void_points is not empty
-        if void_points:
-            void_array.append(void_points)
-
-    # Determine records for the last element in the geometry worksheet
-    last_start_index = void_indices[-1]
-    last_end_index = len(slabGeom_wksh) - 1
-
-    # Find void coordinates for the last element
-    last_void_points = []
-    for index in range(last_start_index, last_end_index):
-        x = slabGeom_wksh.iloc[index, 14]
-        y = slabGeom_wksh.iloc[index, 16]
-        z = slabGeom_wksh.iloc[index, 15]
-
-        if x is not None and z is not None and y is not None:
-            last_void_points.append((x, y, z))
+    void_data["Product_ID"] = void_data["Product_ID"].ffill()
 
-    # Append the values for the last element to the respective lists
-    void_array.append(last_void_points)
+    # Void coordinates (x, y, z) of every void, skipping empty cells; kept for voids that have any
+    void_array = [points for points in block_points(slabGeom_wksh, void_indices, [14, 16, 15]) if points]
 
     # Convert 3D void coordinates into MULITPOINTZ
     void_coords = format_multipointz(void_array)
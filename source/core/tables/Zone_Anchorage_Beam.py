@@ -2,54 +2,34 @@
 import pandas as pd
 import numpy as np
 from utils.functions import skip_empty_sheet
+from utils.blocks import segment, split_blocks
 
 @skip_empty_sheet
 # Zone Anchorage table for beam longitudinal reinforcement -- data formatting function
 def zone_anch_table(beamLongRF_wksh):
 
-    anchor_indices = []
-    bent_angles = []
-    zoneID_anch = []
-
     zone_anch_data = beamLongRF_wksh.iloc[2:, [26, 29, 30, 31, 32, 36]]
     zone_anch_data.columns =["Anchorage_Type", "Diameter", "Spacing", 
                             "Num_Pins", "Pin_Span", "Notes"]
 
 
-    # Find all anchorage indices
-    for index, rows in zone_anch_data.iterrows():
-        anchorage_type = rows["Anchorage_Type"]
-        if isinstance(anchorage_type, str) and "HAIRPIN" in anchorage_type:
-            anchor_indices.append(index)
+    # Label every row with its hairpin anchorage: one opens on each anchorage type naming a
+    # HAIRPIN and runs to the next one
+    hairpin = beamLongRF_wksh.iloc[:, 26].map(lambda anchorage_type: isinstance(anchorage_type, str) and "HAIRPIN" in anchorage_type)
+    anchor_indices = segment(hairpin.to_numpy(dtype=bool), start=2)
+    if not len(anchor_indices.rows): # No zone anchorages
+        return [], [], None
 
     # Create unqiue IDs
-    for index in anchor_indices:
-        zoneID = beamLongRF_wksh.iloc[index, 0] + "_" + beamLongRF_wksh.iloc[index, 1]
-        zoneID_anch.append(zoneID)
-        
-    zoneID_anch = pd.DataFrame({"Zone_ID": zoneID_anch})
-
-    # Create bent_angle lists
-    for i in range(len(anchor_indices) - 1):
-        start_index = anchor_indices[i]
-        end_index = anchor_indices[i + 1]
-        
-        # Extract Bent Angles
-        bentAngle_vals = beamLongRF_wksh.iloc[start_index:end_index, 27].values
-        
-        # Append the values to arrays_list as an array
-        bent_angles.append(tuple(bentAngle_vals))
-
-    # Extract final record from worksheet
-    last_index = anchor_indices[-1]
-    bentAngle_last = beamLongRF_wksh.iloc[last_index:, 27].values
-    bent_angles.append(tuple(bentAngle_last))
+    zoneID_anch = beamLongRF_wksh.iloc[anchor_indices.rows, 0] + "_" + beamLongRF_wksh.iloc[anchor_indices.rows, 1]
+    zoneID_anch = pd.DataFrame({"Zone_ID": zoneID_anch.to_numpy()})
 
-    # Filter out tuples containing None values
-    bent_angles_cleaned = [tuple(filter(None, angle_tuple)) for angle_tuple in bent_angles]
-    bent_angles_cleaned = [(angle[0] if len(angle) == 1 else angle) for angle in bent_angles_cleaned] # remove trailing comma
+    # Bent angles of each anchorage, filtering out None values (a single angle without the tuple)
+    bentAngle_vals = beamLongRF_wksh.iloc[:, 27].to_numpy()
+    bent_angles = split_blocks(bentAngle_vals, anchor_indices, bentAngle_vals.astype(bool))
+    bent_angles = [(angle[0] if len(angle) == 1 else tuple(angle)) for angle in bent_angles]
 
-    bent_angles = pd.DataFrame({"Bent_Angle": bent_angles_cleaned}).astype(str)
+    bent_angles = pd.DataFrame({"Bent_Angle": bent_angles}).astype(str)
 
 
     # Drop all empty rows from worksheet
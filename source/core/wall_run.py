@@ -1,7 +1,7 @@
 # import connector and packages
 import mysql.connector
-import pandas as pd
 import numpy as np
+from utils.workbook import read_workbook, SheetColumns
 
 from core.tables.Wall_Element import wall_elmt_table
 from core.tables.Wall_Geometry import wall_geom_table
@@ -13,6 +13,7 @@ from core.tables.Wall_Long_Reinf import wall_longReinf_table
 from core.tables.Zone_Anchorage_Wall import zone_anch_table
 from core.tables.Layer_Anchorage_Wall import layer_anch_table
 from core.tables.Wall_Transv_Reinf import wall_transvReinf_table
+from utils.changelog import log_core_changes
 
 
 # Connect to server host
@@ -31,12 +32,15 @@ def load_wall(
     )
     cur = conn.cursor()
 
-    # Read the sheets
-    meta = pd.read_excel(file_path, sheet_name="Wall ID")
-    geom = pd.read_excel(file_path, sheet_name="Geometry")
-    panels = pd.read_excel(file_path, sheet_name="Extra Panels")
-    longr = pd.read_excel(file_path, sheet_name="Long Reinf")
-    transr= pd.read_excel(file_path, sheet_name="Transv Reinf")
+    # Read the sheets from one open of the workbook (the columns the table modules use)
+    sheets = read_workbook(file_path, {
+        "Wall ID":      SheetColumns(17),
+        "Geometry":     SheetColumns(43, ("Product ID", "Notes")),
+        "Extra Panels": SheetColumns(18, ("Product ID", "Void", "External Finish", "Notes", "Linked Resources")),
+        "Long Reinf":   SheetColumns(37),
+        "Transv Reinf": SheetColumns(18, ("Reinf ID", "Bent Plane")),
+    })
+    meta, geom, panels, longr, transr = sheets.values()
 
     # Clean NaNs
     for df in (meta, geom, panels, longr, transr):
@@ -58,7 +62,7 @@ def load_wall(
     cur.execute("SET FOREIGN_KEY_CHECKS=1;")
 
     # Bulk INSERT in the correct order
-    for insert, tups in [
+    batches = [
         (super_insert, super_tups),
         (wallGeom_insert, wallGeom_tups),
         (wallMeta_insert, wallMeta_tups),
@@ -70,8 +74,11 @@ def load_wall(
         (zone_insert, zone_tups),
         (layer_insert, layer_tups),
         (wallTrans_insert, wallTrans_tups),
-    ]:
+    ]
+    for insert, tups in batches:
         if tups and insert:                              # only run if non‐empty
             cur.executemany(insert, tups)
+    # Record the keys this load touched, for incremental phys/anal rebuilds
+    log_core_changes(cur, "wall", batches)
     conn.commit()
     conn.close()
\ No newline at end of file
@@ -1,441 +1,541 @@
 # Import packages
-import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+import multiprocessing
+import os
+import time
+import traceback
 import pandas as pd
-from sqlalchemy import text
-from utils.formulas import FORMULA_REGISTRY
-import inspect
+from sqlalchemy import create_engine
+from utils.formulas import FORMULA_REGISTRY, BATCH_REGISTRY, PAIR_FORMATS, format_pairs
+from utils.geometry import geometry_cache
+from utils.plan import load_plans, ELEMENTS
+from utils.fetch import TableSnapshots, TransferLog, fetch_by_keys, select_list
+from utils.upsert import upsert_frame, DEFAULT_CHUNKSIZE
+from utils.changelog import ChangeSet, pending_changes, mark_consumed, expanding
+from utils.workqueue import WorkItem, partition_products, publish, work, unfinished_elements
 
 class PhysLoader:
-    def __init__(self, core_engine, phys_engine, mapping_path: str, element: str):
+    def __init__(self, core_engine, phys_engine, mapping_path: str, element: str,
+                 upsert_method: str = "chunked", chunksize: int = DEFAULT_CHUNKSIZE, incremental: bool = False,
+                 table_locks: Optional[Dict[str, object]] = None):
         self.core_engine = core_engine
         self.phys_engine = phys_engine
         self.element = element.lower()  # e.g. "wall","beam","column","slab"
-        # Load the YAML once
-        with open(mapping_path, 'r') as f:
-            self.mapping = yaml.safe_load(f)
-
-    # Pulls data from core layer for a given table. Can use SELECT * or a view
-    def _fetch_core(self, table: str) -> pd.DataFrame:
-        sql = f"SELECT * FROM {table}"
-        return pd.read_sql(sql, self.core_engine)   
-
-    # For each phys column in mapping[table], apply the registered formula
-    def _apply_formulas(self, df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
+        self.upsert_method = upsert_method  # "chunked" or "temp_table" (see utils.upsert)
+        self.chunksize = chunksize
+        self.incremental = incremental  # rebuild only what Core_Change_Log says changed
+        self.changes: Optional[ChangeSet] = None
+        self.table_locks = table_locks or {}  # tables other elements' loaders write concurrently
+        # Load the compiled plan once (missing inputs and cycles are reported here, before any DB work)
+        self.mapping, plans = load_plans(mapping_path, "phys")
+        self.plan = plans[self.element]
+        self.transfers = TransferLog(core_engine)
+        self.snapshots = TableSnapshots()
+
+    # Join keys the stages use; the first read of a core table also takes whichever of these it has
+    JOIN_KEYS = ("Product_ID", "Reinf_ID", "Zone_ID", "Long_ID", "Transv_ID", "Void_ID", "Corbel_ID",
+                 "Strand_ID", "Wall_Product_ID", "Beam_Product_ID", "Column_Product_ID")
+
+    # Pulls only the core columns a stage consumes (its mapped args) plus the join keys it needs.
+    # The first read of a table takes what every stage of the run needs, later reads are served
+    # from the run's snapshot.
+    def _fetch_core(self, table: str, keys, stage) -> pd.DataFrame:
+        columns = list(dict.fromkeys([*keys, *sorted(stage.sources().get(table, ()))]))
+        run_keys = [k for k in self.JOIN_KEYS if k in self.plan.core_columns.get(table, ())]
+
+        def fetch(wanted):
+            wanted = list(dict.fromkeys([*wanted, *run_keys, *self.plan.source_columns(table)]))
+            sql = (f"SELECT {select_list(wanted, self.plan.spatial.get(table, ()))} "
+                   f"FROM `{self.core_engine.url.database}`.`{table}`")
+            if self.changes is None:
+                df = pd.read_sql(sql, self.core_engine)
+            else: # incremental: only the rows of changed products / reinforcement sets
+                where, params = self.changes.where(self.plan.core_columns.get(table, ()))
+                df = pd.read_sql(expanding(f"{sql} WHERE {where}", params), self.core_engine, params=params)
+            self.transfers.record(table, df)
+            return df
+        return self.snapshots.get(("core", table), columns, fetch)
+
+    # Pulls phys columns, from the run's snapshot when this run already read or wrote them. With a
+    # change set (incremental runs, partitions) only the rows of its products / reinforcement sets
+    # are read, unless the table has no key to restrict it by.
+    def _fetch_phys(self, table: str, columns) -> pd.DataFrame:
+        table_columns = self.plan.target_types.get(table, {})
+
+        def fetch(wanted):
+            sql = f"SELECT {select_list(wanted)} FROM `{self.phys_engine.url.database}`.`{table}`"
+            if self.changes is None or not self.changes.keyed(table_columns):
+                return pd.read_sql(sql, con=self.phys_engine)
+            where, params = self.changes.where(table_columns)
+            return pd.read_sql(expanding(f"{sql} WHERE {where}", params), self.phys_engine, params=params)
+        return self.snapshots.get(("phys", table), list(columns), fetch)
+
+    # The rows a write of df is compared with: what the table holds for df's primary keys, from the
+    # run's snapshot when it holds all of them, otherwise read by key
+    def _existing_phys(self, df: pd.DataFrame, table: str, pk: str) -> pd.DataFrame:
+        keys = df[pk].dropna().astype(str)
+        held = self.snapshots.rows(("phys", table), list(df.columns), pk, keys)
+        if held is not None:
+            return held
+        return fetch_by_keys(self.phys_engine, f"`{self.phys_engine.url.database}`.`{table}`", df.columns,
+                             pk, keys, self.chunksize)
+
+    # For each step of a compiled stage, apply the registered formula
+    def _apply_formulas(self, df: pd.DataFrame, steps) -> pd.DataFrame:
         phys_df = df.copy()
-        for col_name, col_cfg in cfg["columns"].items():
-            func = FORMULA_REGISTRY[col_cfg["formula"]]
-            arg_names = col_cfg.get("args", [])
-            
-            # Check if func expects an 'element' parameter
-            sig = inspect.signature(func)
-            needs_element = "element" in sig.parameters
+        for step in steps:
+            func = FORMULA_REGISTRY[step.formula]
+            literal = [ref.kind == "literal" for ref in step.args]
+            arg_names = step.arg_names
+
+            # Column-at-a-time path: pass whole columns when a batch implementation exists
+            batch = BATCH_REGISTRY.get(step.formula)
+            if batch is not None:
+                vals = [name if lit else phys_df[name].to_numpy() for name, lit in zip(arg_names, literal)]
+                if step.needs_element:
+                    vals.insert(step.element_index, self.element)
+                phys_df[step.name] = batch(*vals)
+                continue
 
             def apply_fn(row):
-                vals = []
-                for name in arg_names:
-                    if name in row.index:
-                        vals.append(row[name])
-                    else: # otherwise a literal constant
-                        vals.append(name)
-                if needs_element:
-                    vals.insert(1, self.element)
+                vals = [name if lit else row[name] for name, lit in zip(arg_names, literal)]
+                if step.needs_element:
+                    vals.insert(step.element_index, self.element)
                 return func(*vals)
 
-            # def apply_fn(row):
-            #     # Positional args from DataFrame columns
-            #     vals = [row[name] for name in arg_names]
-            #     # If the function needs the `element`, append it last
-            #     if needs_element:
-            #         vals.insert(1, self.element)
-            #     return func(*vals)
-
-            phys_df[col_name] = phys_df.apply(apply_fn, axis=1)
+            phys_df[step.name] = phys_df.apply(apply_fn, axis=1)
         return phys_df
+
+    # Read the upstream phys columns a stage needs from one table, renamed to their argument names
+    def _fetch_upstream(self, stage, table: str, key: str, extra=()) -> pd.DataFrame:
+        refs = stage.upstream().get(table, {})
+        return self._fetch_phys(table, [key, *extra, *refs]).rename(columns=refs)
     
+    # Pair columns (num_legs, volumetric ratios) stay numeric through the run and are formatted here
+    def _format_pairs(self, df: pd.DataFrame, table: str) -> pd.DataFrame:
+        cols = (self.mapping.get(table) or {}).get("columns") or {}
+        pairs = {c: PAIR_FORMATS[cfg["formula"]] for c, cfg in cols.items()
+                 if c in df.columns and cfg["formula"] in PAIR_FORMATS}
+        if not pairs:
+            return df
+        df = df.copy()
+        for col, fmt in pairs.items():
+            df[col] = format_pairs(df[col], fmt)
+        return df
+
     # Upsert the new phys df into the phys table using INSERT ... ON DUPLICATE KEY UPDATE.
-    def _upsert_phys(self, df: pd.DataFrame, table: str, pk: str):
-        tmp = f"_tmp_{table}"
-        with self.phys_engine.begin() as conn:
-            conn.execute(text(f"DROP TABLE IF EXISTS `{tmp}`;"))
-            # Write to temp
-            df.to_sql(f"_tmp_{table}", conn, schema="element_database_phys", if_exists="fail", index=False)
-            cols = ", ".join(df.columns)
-            updates = ", ".join([f"{c}=VALUES({c})" for c in df.columns if c!=pk])
-            # Upsert into the phys layer from that temp table
-            conn.execute(text(f"""
-                INSERT INTO `element_database_phys`.`{table}` ({cols})
-                SELECT {cols} FROM `element_database_phys`.`_tmp_{table}`
-                ON DUPLICATE KEY UPDATE {updates};
-            """))
-            # Clean up: drop the temp table once done
-            conn.execute(text(f"DROP TABLE `{tmp}`;"))
-
-    # Create the dataframes by looping over every table in phys_map and load in dependency order.
+    # Rows are compared with what the table holds, so only new and changed values are written;
+    # `placeholders` are columns a later pass fills, which keep their stored value on existing rows.
+    def _upsert_phys(self, df: pd.DataFrame, table: str, pk: str, placeholders=()):
+        df = self._format_pairs(df, table)
+        existing = self._existing_phys(df, table, pk)
+        if len(placeholders):
+            held = existing.assign(**{pk: existing[pk].astype(str)}).drop_duplicates(pk).set_index(pk)
+            for col in placeholders:
+                df[col] = df[pk].astype(str).map(held[col]).fillna(df[col]).to_numpy()
+        upsert_frame(self.phys_engine, df, table, pk, method=self.upsert_method, chunksize=self.chunksize,
+                     existing=existing, types=self.plan.target_types.get(table))
+        self.snapshots.put(("phys", table), df, pk) # later stages read the written rows from memory
+
+    # The element's product -> reinforcement set and zone -> reinforcement set links in core
+    def _links(self) -> Dict[str, pd.DataFrame]:
+        db = self.core_engine.url.database
+        links = {}
+        for name, table, cols in (("products_reinfs", f"{self._elt_name}_Geometry", ["Product_ID", "Reinf_ID"]),
+                                  ("zones_reinfs", f"{self._elt_name}_Long_Reinf", ["Zone_ID", "Reinf_ID"])):
+            if set(cols) <= set(self.plan.core_columns.get(table, ())):
+                links[name] = pd.read_sql(f"SELECT DISTINCT {select_list(cols)} FROM `{db}`.`{table}`",
+                                          self.core_engine)
+        return links
+
+    # Pending Core_Change_Log rows for this element, widened through the element's links
+    def _pending_changes(self) -> ChangeSet:
+        return pending_changes(self.core_engine, "phys", self.element, **self._links())
+
+    # The element's products split into partitions (see utils.workqueue.partition_products)
+    def partitions(self, parts: int) -> List[tuple]:
+        links = self._links()
+        products = links.get("products_reinfs", pd.DataFrame(columns=["Product_ID", "Reinf_ID"]))
+        zones = links.get("zones_reinfs")
+        return partition_products(products, parts, () if zones is None else zones["Reinf_ID"].dropna())
+
+    # Run every stage against one parsed-geometry cache, so each WKT value is decoded once per run.
+    # In incremental mode only the changed products are rebuilt, and the log rows are then consumed.
     def run(self):
-
-        core_db = self.core_engine.url.database
-        phys_db = self.phys_engine.url.database
-
-        # normalize element name for building tables
-        if self.element.lower() == "hcs":
-            elt_name = "HCS"
-        else:
-            elt_name = self.element.capitalize()
-
-        # Geometry tables (without volume)
-        if self.element != "hcs":
-            geom_table = f"{elt_name}_Geometry"
-            if geom_table in self.mapping:
-                full_cfg = self.mapping[geom_table]
-                df_core = self._fetch_core(geom_table)
-
-                if df_core.empty: # no rows to process, skip this table
-                    print(f"[skip] no geometry for {self.element}, skipping {geom_table}")
-                else:
-                    # Chose columns that are not formulas for volume or mass
-                    basic_cols = {
-                        k: v
-                        for k, v in full_cfg["columns"].items()
-                        if v["formula"] not in ("element_volume_m3", "element_mass_kg")
-                    }
-                    init_cfg = {"pk": full_cfg["pk"], "columns": basic_cols}
-                    df_basic = self._apply_formulas(df_core, init_cfg)
-
-                    # Distinguish between column cross-section type for correct dimension names.
-                    if geom_table == "Column_Geometry":
-                        section = df_core["Cross_Section"].str.lower()
-
-                        # For rectangular columns: null out diameters
-                        is_rect = section == "rectangular"
-                        df_basic.loc[is_rect, ["diameter_a_mm","diameter_b_mm"]] = None
-
-                        # For elliptical columns: null out depth & width
-                        is_ell = section == "elliptical"
-                        df_basic.loc[is_ell, ["total_depth_mm","total_width_mm"]] = None
-
-                    # Placeholder zeros for the NOT NULL volume & mass fields
-                    df_basic["element_volume_m3"] = 0.0
-                    df_basic["element_mass_kg"]   = 0.0
-                    keep = ([init_cfg["pk"]] + list(basic_cols.keys()) + ["element_volume_m3", "element_mass_kg"]) # trim to PK + basic phys + placeholders
-                    df_basic = df_basic[keep]
-                    self._upsert_phys(df_basic, geom_table, pk=init_cfg["pk"])
-            
-
-        # Additional_Panelling for walls
-        if self.element == "wall" and "Additional_Panelling" in self.mapping:
-            cfg = self.mapping["Additional_Panelling"]
-            df_core = self._fetch_core("Additional_Panelling")
-
-            if df_core.empty: # no rows to process, skip this table
-                print(f"[skip] no geometry for {self.element}, skipping Additional_Panelling")
-            else:
-                df_phys = self._apply_formulas(df_core, cfg)
-                keep = [cfg["pk"]] + list(cfg["columns"].keys()) # Keep only pk + all mapped phys columns
-                df_phys = df_phys[keep]
-                self._upsert_phys(df_phys, "Additional_Panelling", pk=cfg["pk"])
-
-
-        # Zone tables are new to phys layer
-        zone_table = f"{elt_name}_Zone_Geometry"
-        if zone_table in self.mapping:
-            cfg = self.mapping[zone_table]
-            df_core = self._fetch_core(f"{elt_name}_Long_Reinf")
-
-            if df_core.empty:
-                print(f"[skip] no zones for {self.element}, skipping {zone_table}")
-            else:
-                # Load the zone definitions from the core (no Product_ID yet)
-                core_zone = pd.read_sql(
-                    f""" SELECT Zone_ID, Reinf_ID, ST_AsText(Zone_Coords) AS Zone_Coords, Zone_Plane
-                    FROM `{core_db}`.`{elt_name}_Long_Reinf` """,
-                    con=self.core_engine)
-                # Pull Product_ID out of the core element geometry via Reinf_ID
-                parent_core = pd.read_sql(
-                    f"SELECT Product_ID, Reinf_ID "
-                    f"  FROM {core_db}.`{elt_name}_Geometry`",
-                    con=self.core_engine
-                )
-                core_zone = core_zone.merge(parent_core, on="Reinf_ID", how="left")
-
-                # Dynamically pull whichever “total” column exists
-                total_width_col = (
-                    "total_thickness_mm"
-                    if f"{elt_name}_Geometry" in self.mapping and
-                    "total_thickness_mm" in pd.read_sql(
-                        f"SHOW COLUMNS FROM `{phys_db}`.`{elt_name}_Geometry`",
-                        con=self.phys_engine
-                    )["Field"].tolist()
-                    else
-                    "total_width_mm"
-                )
-                # Get the calculated phys dimensions
-                phys_dims = pd.read_sql(
-                    f"SELECT Product_ID, total_height_mm, total_length_mm, `{total_width_col}` "
-                    f"  FROM `{phys_db}`.`{elt_name}_Geometry`",
-                    con=self.phys_engine
-                )
-                
-                df_zone = core_zone.merge(phys_dims, on="Product_ID", how="left", validate="many_to_one")
-                df_zone_phys = self._apply_formulas(df_zone, cfg) # compute phys columns
-                keep = ["Zone_ID", "Reinf_ID", "Product_ID"] + list(cfg["columns"].keys())
-                df_zone_phys = df_zone_phys[keep]
-                self._upsert_phys(df_zone_phys, zone_table, pk=cfg["pk"])
-
-        # Voids geometry
-        void_table = f"{elt_name}_Voids"
-        if void_table in self.mapping:
-            cfg = self.mapping[void_table]
-            # Load core void coords
-            df_core = pd.read_sql(f"""SELECT Void_ID, Product_ID, Void_Coords_XYZ
-                                  FROM `{core_db}`.`{void_table}` """, con=self.core_engine)
-
-            if df_core.empty: # no rows to process, skip this table
-                print(f"[skip] no geometry for {self.element}, skipping {void_table}")
-            else:
-                # Pull total_length_mm from phys parent
-                phys_geom = pd.read_sql(f"""SELECT Product_ID, total_length_mm
-                                        FROM `{phys_db}`.`{elt_name}_Geometry` """, con=self.phys_engine)
-
-                # Normalize & merge
-                for df in (df_core, phys_geom):
-                    df["Product_ID"] = df["Product_ID"].astype(str).str.strip()
-                df_core = df_core.merge(phys_geom, on="Product_ID", how="left")
-
-                df_phys = self._apply_formulas(df_core, cfg)
-                keep = ["Void_ID", "Product_ID"] + list(cfg["columns"].keys())
-                df_phys = df_phys[keep]
-                self._upsert_phys(df_phys, void_table, pk=cfg["pk"])
-
-
-        # Corbel_Geometry
+        if self.incremental:
+            self.changes = self._pending_changes()
+            if self.changes.empty:
+                print(f"[incremental] {self.element}: no pending core changes")
+                return
+            print(f"[incremental] {self.element}: rebuilding {self.changes}")
+        with geometry_cache() as cache:
+            self._run_stages()
+        if self.incremental:
+            mark_consumed(self.core_engine, "phys", self.changes, self.element)
+        print(f"[cache] {self.element} geometry: {cache.summary()}")
+        print(f"[io] {self.element} core reads: {self.transfers.summary()}")
+        print(f"[cache] {self.element} tables: {self.snapshots.summary()}")
+
+    # Run some of the stages (indexes into the plan) for one partition of the element's products,
+    # reading and writing only the rows of those products and reinforcement sets
+    def run_partition(self, products, reinfs, stages: List[int]):
+        self.changes = ChangeSet(0, frozenset(map(str, products)), frozenset(map(str, reinfs)))
+        with geometry_cache():
+            self._run_stages(stages)
+
+    # Run the compiled stages in dependency order, dispatching each to its role's loader.
+    # A stage writing a table shared with a concurrently running element holds that table's lock.
+    def _run_stages(self, indexes: Optional[List[int]] = None):
+        for i, stage in enumerate(self.plan.stages):
+            if indexes is not None and i not in indexes:
+                continue
+            with self.table_locks.get(stage.table) or nullcontext():
+                getattr(self, f"_stage_{stage.role}")(stage)
+
+    # Table-name prefix for this element, e.g. "Wall", "HCS"
+    @property
+    def _elt_name(self) -> str:
+        return "HCS" if self.element == "hcs" else self.element.capitalize()
+
+    # Geometry tables: the first pass writes placeholders for the columns a later pass computes,
+    # the later pass adds volume & mass once corbels and voids are loaded.
+    def _stage_geometry(self, stage):
+        if stage.pass_index > 0:
+            return self._stage_geometry_totals(stage)
+
+        geom_table = stage.table
+        section_col = ["Cross_Section"] if geom_table == "Column_Geometry" else []
+        df_core = self._fetch_core(geom_table, [stage.pk, *section_col], stage)
+
+        if df_core.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping {geom_table}")
+            return
+        df_basic = self._apply_formulas(df_core, stage.steps)
+
+        # Distinguish between column cross-section type for correct dimension names.
+        if geom_table == "Column_Geometry":
+            section = df_core["Cross_Section"].str.lower()
+
+            # For rectangular columns: null out diameters
+            is_rect = section == "rectangular"
+            df_basic.loc[is_rect, ["diameter_a_mm","diameter_b_mm"]] = None
+
+            # For elliptical columns: null out depth & width
+            is_ell = section == "elliptical"
+            df_basic.loc[is_ell, ["total_depth_mm","total_width_mm"]] = None
+
+        # Placeholder zeros for the NOT NULL fields computed by a later pass (volume & mass)
+        for col in stage.later_columns:
+            df_basic[col] = 0.0
+        keep = [stage.pk] + stage.columns + list(stage.later_columns) # trim to PK + basic phys + placeholders
+        df_basic = df_basic[keep]
+        self._upsert_phys(df_basic, geom_table, pk=stage.pk, placeholders=stage.later_columns)
+
+    # Element volume & mass (depends on corbels and voids)
+    def _stage_geometry_totals(self, stage):
+        geom_table = stage.table
+        pk = stage.pk
+
+        # Read the phys geometry columns computed by the earlier pass
+        earlier = [c for c in self.mapping[geom_table]["columns"] if c not in stage.columns]
+        df_phys_geom = self._fetch_phys(geom_table, [pk, *earlier])
+        if self.changes is not None:
+            df_phys_geom = df_phys_geom[self.changes.affects(df_phys_geom)]
+        if df_phys_geom.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping {geom_table}")
+            return
+
+        # Pull the core columns the plan needs (Coords_XYZ, Has_Corbel/Has_Void flags)
+        df_core_geom = self._fetch_core(geom_table, ["Product_ID"], stage)
+
+        # Corbel and void volumes, summed per element (an element may have several of each)
+        upstream = stage.upstream()
+        fk_col = f"{self._elt_name}_Product_ID"
+        parts = [df_phys_geom, df_core_geom]
+        for table, key in (("Corbel_Geometry", fk_col), (f"{self._elt_name}_Voids", "Product_ID")):
+            if table in upstream:
+                df_up = self._fetch_upstream(stage, table, key).rename(columns={key: "Product_ID"})
+                df_up["Product_ID"] = df_up["Product_ID"].astype(str).str.strip()
+                parts.append(df_up.groupby("Product_ID", as_index=False).sum(numeric_only=True))
+
+        # Merge everything onto a single DF
+        for d in parts[:2]:
+            d["Product_ID"] = d["Product_ID"].astype(str).str.strip()
+        df = parts[0]
+        for d in parts[1:]:
+            df = df.merge(d, on="Product_ID", how="left")
+        df = df.fillna({"corb_volume_m3": 0.0, "void_volume_m3": 0.0, "Has_Corbel": False, "Has_Void": False})
+
+        # Call the formulas for *only* this pass's columns, then subset & upsert every mapped column
+        df_full_phys = self._apply_formulas(df, stage.steps)
+        keep = [pk] + list(self.mapping[geom_table]["columns"].keys())
+        self._upsert_phys(df_full_phys[keep], geom_table, pk=pk)
+
+    # Additional_Panelling for walls
+    def _stage_panels(self, stage):
+        df_core = self._fetch_core(stage.table, [stage.pk], stage)
+
+        if df_core.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping {stage.table}")
+            return
+        df_phys = self._apply_formulas(df_core, stage.steps)
+        keep = [stage.pk] + stage.columns # Keep only pk + all mapped phys columns
+        self._upsert_phys(df_phys[keep], stage.table, pk=stage.pk)
+
+    # Zone tables are new to phys layer
+    def _stage_zones(self, stage):
+        elt_name = self._elt_name
+        zone_table = stage.table
+        # Load the zone definitions from the core (no Product_ID yet)
+        core_zone = self._fetch_core(f"{elt_name}_Long_Reinf", ["Zone_ID", "Reinf_ID"], stage)
+
+        if core_zone.empty:
+            print(f"[skip] no zones for {self.element}, skipping {zone_table}")
+            return
+        # Pull Product_ID out of the core element geometry via Reinf_ID
+        parent_core = self._fetch_core(f"{elt_name}_Geometry", ["Product_ID", "Reinf_ID"], stage)
+        core_zone = core_zone.merge(parent_core, on="Reinf_ID", how="left")
+
+        # Get the calculated phys dimensions the zone formulas fall back on
+        phys_dims = self._fetch_upstream(stage, f"{elt_name}_Geometry", "Product_ID")
+
+        df_zone = core_zone.merge(phys_dims, on="Product_ID", how="left", validate="many_to_one")
+        df_zone_phys = self._apply_formulas(df_zone, stage.steps) # compute phys columns
+        keep = ["Zone_ID", "Reinf_ID", "Product_ID"] + stage.columns
+        self._upsert_phys(df_zone_phys[keep], zone_table, pk=stage.pk)
+
+    # Voids geometry
+    def _stage_voids(self, stage):
+        void_table = stage.table
+        # Load core void coords
+        df_core = self._fetch_core(void_table, ["Void_ID", "Product_ID"], stage)
+
+        if df_core.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping {void_table}")
+            return
+        # Pull total_length_mm from phys parent
+        phys_geom = self._fetch_upstream(stage, f"{self._elt_name}_Geometry", "Product_ID")
+
+        # Normalize & merge
+        for df in (df_core, phys_geom):
+            df["Product_ID"] = df["Product_ID"].astype(str).str.strip()
+        df_core = df_core.merge(phys_geom, on="Product_ID", how="left")
+
+        df_phys = self._apply_formulas(df_core, stage.steps)
+        keep = ["Void_ID", "Product_ID"] + stage.columns
+        self._upsert_phys(df_phys[keep], void_table, pk=stage.pk)
+
+    # Corbel_Geometry
+    def _stage_corbels(self, stage):
+        elt_name = self._elt_name
         fk_col = f"{elt_name}_Product_ID"
-        if self.element in ("wall", "beam", "column") and "Corbel_Geometry" in self.mapping:
-            cfg = self.mapping["Corbel_Geometry"]
-            df_core = self._fetch_core("Corbel_Geometry")
-
-            if df_core.empty: # no rows to process, skip this table
-                print(f"[skip] no geometry for {self.element}, skipping Corbel_Geometry")
-            else:
-                # JOIN in parent Coords_XYZ from the element Geometry table
-                core_parent_geom = (self._fetch_core(f"{elt_name}_Geometry")
-                            [["Product_ID","Coords_XYZ"]].rename(columns={"Product_ID": fk_col}))
-                df_core = df_core.merge(core_parent_geom, on=fk_col, how="left")
-
-                # Filter out any rows without a parent (NaN in fk_col)
-                df_core = df_core[df_core[fk_col].notna()]
-                if df_core.empty:
-                    print(f"[skip] no corbels for {self.element}, skipping Corbel_Geometry")
-                else:
-                    # Merge phys total_length_mm from the parent phys geometry
-                    phys_parent_geom = pd.read_sql(
-                        f"SELECT Product_ID, total_length_mm, density_kgm3 "
-                        f"FROM `{phys_db}`.`{elt_name}_Geometry`",
-                        con=self.phys_engine
-                    ).rename(columns={"Product_ID": fk_col})
-
-                    # Depending on element, populate the correct FK column
-                    for col in ("Wall_Product_ID","Beam_Product_ID","Column_Product_ID"):
-                        if col not in df_core.columns:
-                            df_core[col] = None
-
-                    # Normalize the key
-                    df_core[fk_col] = df_core[fk_col].astype(str).str.strip()
-                    phys_parent_geom[fk_col] = phys_parent_geom[fk_col].astype(str).str.strip()
-
-                    # Merge once with an indicator
-                    df_core = df_core.merge(
-                        phys_parent_geom,
-                        on=fk_col,
-                        how="left",
-                        indicator="match",
-                        suffixes=("", "_drop")
-                    )
-                    # Clean up drops and indicator, merge and upsert
-                    df_core = df_core.drop(columns=[c for c in df_core.columns if c.endswith("_drop")] + ["match"])
-                    df_phys = self._apply_formulas(df_core, cfg)
-                    keep = [cfg["pk"]] + list(cfg["columns"].keys()) # Keep only pk + all mapped phys columns
-                    df_phys = df_phys[keep]
-                    self._upsert_phys(df_phys, "Corbel_Geometry", pk=cfg["pk"])
-
-
-        # Longitudinal Reinforcement
-        long_table = f"{elt_name}_Long_Reinf"
-        if long_table in self.mapping:
-            cfg = self.mapping[long_table]
-            # pull core data, including WKT for Layer_Coords
-            df_core = pd.read_sql(
-                f"""SELECT Long_ID, Zone_ID, Zone_Plane, ST_AsText(Layer_Coords) AS Layer_Coords, Bar_Diameter, Num_Bars
-                  FROM `{core_db}`.`{long_table}`""", con=self.core_engine)
-            
-            if df_core.empty: # no rows to process, skip this table
-                print(f"[skip] no geometry for {self.element}, skipping {long_table}")
-            else:
-                # Retrieve zone_height_mm
-                phys_zone = pd.read_sql(
-                    f""" SELECT Zone_ID, Reinf_ID, zone_height_mm 
-                    FROM `{phys_db}`.`{elt_name}_Zone_Geometry`""", con=self.phys_engine)
-                df_core = df_core.merge(phys_zone, on="Zone_ID", how="left")
-
-                df_phys = self._apply_formulas(df_core, cfg) # apply formulas
-                keep = [cfg["pk"], "Reinf_ID"] + list(cfg["columns"].keys())
-                df_phys = df_phys[keep]
-                self._upsert_phys(df_phys, long_table, pk=cfg["pk"])
-
-
-        # Transverse reinforcement
-        transv_table = f"{elt_name}_Transv_Reinf"
-        if transv_table in self.mapping:
-            cfg = self.mapping[transv_table]
-            # Pull core data with WKT for Shape_Coords
-            df_core = pd.read_sql(
-                f""" SELECT Transv_ID, Zone_ID, Reinf_ID, Shape_Coords, Bent_Plane, Bar_Diameter, Spacing
-                  FROM `{core_db}`.`{transv_table}`""", con=self.core_engine)
-            if df_core.empty: # no rows to process, skip this table
-                print(f"[skip] no geometry for {self.element}, skipping {transv_table}")
-            else:
-                # bring in zone_width_mm
-                phys_zone = pd.read_sql(
-                    f""" SELECT Zone_ID, zone_thickness_mm AS zone_width_mm
-                    FROM `{phys_db}`.`{elt_name}_Zone_Geometry`""", con=self.phys_engine)
-                df_core = df_core.merge(phys_zone, on="Zone_ID", how="left")
-
-                if "zone_thickness_mm" in df_core.columns:
-                    df_core["zone_width_mm"] = df_core["zone_thickness_mm"]
-                elif "zone_width_mm" in df_core.columns:
-                    pass
-                else:
-                    raise RuntimeError("No zone width column found for transverse reinf")
-
-                # First compute num_legs via the generic path on its own
-                simple_cols = {k:v for k,v in cfg["columns"].items() if k!="volumetric_ratio_mm3"}
-                simple_cfg = {"pk":cfg["pk"], "columns": simple_cols}
-                df_phys = self._apply_formulas(df_core, simple_cfg)
-
-                # Then compute volumetric_ratio_mm3 manually
-                f_vol = FORMULA_REGISTRY["volumetric_ratio_mm3"]
-                def compute_vol(row):
-                    return f_vol(row["Shape_Coords"], row["Bent_Plane"], self.element, None, row["Bar_Diameter"], row["Spacing"], row["zone_width_mm"])
-                df_phys["volumetric_ratio_mm3"] = df_core.apply(compute_vol, axis=1)
-                keep = [cfg["pk"], "Reinf_ID", "Zone_ID"] + list(cfg["columns"].keys())
-                df_phys = df_phys[keep]
-                self._upsert_phys(df_phys, transv_table, pk=cfg["pk"])
-
-
-        # Prestressing
-        if self.element == "hcs" and "HCS_Prestressing" in self.mapping:
-            cfg = self.mapping["HCS_Prestressing"]
-            # Load the prestress core table
-            df_core = pd.read_sql(
-                f""" SELECT Strand_ID, Reinf_ID, Strand_Diameter, Num_Wires, ST_AsText(Strand_Coord_XY) AS Strand_Coord_XY
-                FROM `{core_db}`.`HCS_Prestressing` """, con=self.core_engine )
-
-            # Pull height from the parent geometry
-            df_geom = pd.read_sql(
-                f""" SELECT Reinf_ID, Height
-                FROM `{core_db}`.`HCS_Geometry`""", con=self.core_engine)
-
-            # Merge 
-            df_core = df_core.merge(df_geom, on="Reinf_ID", how="left")
-
-            if df_core.empty: # no rows to process, skip this table
-                print(f"[skip] no geometry for {self.element}, skipping HCS_Prestressing")
-            else:
-                df_phys = self._apply_formulas(df_core, cfg)
-                keep = [cfg["pk"], "Reinf_ID"] + list(cfg["columns"].keys()) # Keep only pk + all mapped phys columns
-                df_phys = df_phys[keep]
-                self._upsert_phys(df_phys, "HCS_Prestressing", pk=cfg["pk"])
-
-
-        # Element volume & mass (depends on corbels and voids) 
-        if self.element != "hcs": 
-            geom_table = f"{elt_name}_Geometry"
-            df_core = self._fetch_core(geom_table)
-            full_cfg  = self.mapping[geom_table]
-            pk        = full_cfg["pk"]
-
-            if df_core.empty: # no rows to process, skip this table
-                    print(f"[skip] no geometry for {self.element}, skipping {geom_table}")
-            else:
-                # Read the phys geometry base DataFrame
-                df_phys_geom = pd.read_sql(f"SELECT * FROM {phys_db}.{geom_table}", self.phys_engine)
-
-                # Pull Coords_XYZ + Has_Corbel/Has_Void flags from the core geometry if they exist
-                cols_to_pull = ["Product_ID", "Coords_XYZ"]
-                core_cols = pd.read_sql(
-                    f"SHOW COLUMNS FROM `{core_db}`.`{geom_table}`", con=self.core_engine)["Field"].tolist()
-                if "Has_Corbel" in core_cols:
-                    cols_to_pull.append("Has_Corbel")
-                if "Has_Void" in core_cols:
-                    cols_to_pull.append("Has_Void")
-
-                df_core_geom = pd.read_sql(
-                    f"SELECT {', '.join(cols_to_pull)} " f" FROM `{core_db}`.`{geom_table}`", con=self.core_engine)
-
-                # Pull corbel volumes
-                if self.element in ("wall", "beam", "column"):
-                    # Read corbel volumes keyed by product_id
-                    df_corb = pd.read_sql(f"SELECT `{fk_col}` AS Product_ID, volume_m3 AS corb_volume_m3 "
-                                        f"FROM `{phys_db}`.`Corbel_Geometry`", con=self.phys_engine )
-                else:
-                    df_corb = pd.DataFrame(columns=["Product_ID", "corb_volume_m3"]) # no corbels for slabs = empty DF
-
-                # Read void volumes for this element
-                void_table = f"{elt_name}_Voids"
-                if void_table in self.mapping:
-                    df_void = pd.read_sql(f"SELECT Product_ID, volume_m3 AS void_volume_m3 \
-                                        FROM {phys_db}.{void_table}", con=self.phys_engine)
-                else:
-                    df_void = pd.DataFrame(columns=["Product_ID","void_volume_m3"])
-
-                # Merge everything onto a single DF
-                for d in (df_phys_geom, df_core_geom, df_corb, df_void):
-                    d["Product_ID"] = d["Product_ID"].astype(str).str.strip()
-                df = (
-                    df_phys_geom
-                    .merge(df_core_geom, on="Product_ID", how="left")
-                    .merge(df_corb,      on="Product_ID", how="left")
-                    .merge(df_void,      on="Product_ID", how="left")
-                    .fillna({
-                        "corb_volume_m3": 0.0,
-                        "void_volume_m3": 0.0,
-                        "Has_Corbel": False,
-                        "Has_Void": False
-                    })
-                )
-
-                # Call the formulas for *only* volume & mass
-                vol_col_cfg = full_cfg["columns"]["element_volume_m3"].copy()
-                vol_col_cfg["args"] = full_cfg["columns"]["element_volume_m3"]["args"] # Keep the original args (including 'element')
-                mini_cfg = {
-                    "pk": full_cfg["pk"],
-                    "columns": {
-                        "element_volume_m3": vol_col_cfg,
-                        "element_mass_kg":   full_cfg["columns"]["element_mass_kg"],
-                    }
-                }
-                df_full_phys = self._apply_formulas(df, mini_cfg)
-
-                # Subset & upsert
-                keep = [pk] + list(full_cfg["columns"].keys())
-                df_up = df_full_phys[keep]
-
-                with self.phys_engine.begin() as conn:
-                    tmp = f"_tmp_{geom_table}"
-
-                    # Drop old temp table if it exists
-                    conn.execute(text(f"DROP TABLE IF EXISTS `{tmp}`;"))
-
-                    # Create fresh temp table without reflection
-                    df_up.to_sql(tmp, conn, if_exists="fail", index=False)
-
-                    # Build INSERT
-                    keep = [pk] + list(full_cfg["columns"].keys())
-                    cols   = ", ".join(f"`{c}`" for c in keep)
-                    updates = ", ".join(f"`{c}`=VALUES(`{c}`)" for c in keep if c != pk)
-                    conn.execute(text(f"""
-                        INSERT INTO `{geom_table}` ({cols})
-                        SELECT {cols} FROM `{tmp}`
-                        ON DUPLICATE KEY UPDATE {updates};
-                    """))
-                    conn.execute(text(f"DROP TABLE IF EXISTS `{tmp}`;")) # Clean up
-        
\ No newline at end of file
+        df_core = self._fetch_core(stage.table, [stage.pk, fk_col], stage)
+
+        if df_core.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping {stage.table}")
+            return
+        # JOIN in parent Coords_XYZ from the element Geometry table
+        core_parent_geom = (self._fetch_core(f"{elt_name}_Geometry", ["Product_ID"], stage)
+                            .rename(columns={"Product_ID": fk_col}))
+        df_core = df_core.merge(core_parent_geom, on=fk_col, how="left")
+
+        # Filter out any rows without a parent (NaN in fk_col)
+        df_core = df_core[df_core[fk_col].notna()]
+        if df_core.empty:
+            print(f"[skip] no corbels for {self.element}, skipping {stage.table}")
+            return
+        # Merge phys total_length_mm and density from the parent phys geometry
+        phys_parent_geom = self._fetch_upstream(
+            stage, f"{elt_name}_Geometry", "Product_ID").rename(columns={"Product_ID": fk_col})
+
+        # Depending on element, populate the correct FK column
+        for col in ("Wall_Product_ID","Beam_Product_ID","Column_Product_ID"):
+            if col not in df_core.columns:
+                df_core[col] = None
+
+        # Normalize the key
+        df_core[fk_col] = df_core[fk_col].astype(str).str.strip()
+        phys_parent_geom[fk_col] = phys_parent_geom[fk_col].astype(str).str.strip()
+
+        # Merge once with an indicator
+        df_core = df_core.merge(
+            phys_parent_geom,
+            on=fk_col,
+            how="left",
+            indicator="match",
+            suffixes=("", "_drop")
+        )
+        # Clean up drops and indicator, merge and upsert
+        df_core = df_core.drop(columns=[c for c in df_core.columns if c.endswith("_drop")] + ["match"])
+        df_phys = self._apply_formulas(df_core, stage.steps)
+        keep = [stage.pk, fk_col] + stage.columns # Keep pk, the owning element and all mapped phys columns
+        self._upsert_phys(df_phys[keep], stage.table, pk=stage.pk)
+
+    # Longitudinal Reinforcement
+    def _stage_long_reinf(self, stage):
+        long_table = stage.table
+        # pull core data, including WKT for Layer_Coords
+        df_core = self._fetch_core(long_table, [stage.pk, "Zone_ID"], stage)
+
+        if df_core.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping {long_table}")
+            return
+        # Retrieve zone_height_mm
+        phys_zone = self._fetch_upstream(stage, f"{self._elt_name}_Zone_Geometry", "Zone_ID", extra=["Reinf_ID"])
+        df_core = df_core.merge(phys_zone, on="Zone_ID", how="left")
+
+        df_phys = self._apply_formulas(df_core, stage.steps) # apply formulas
+        keep = [stage.pk, "Reinf_ID"] + stage.columns
+        self._upsert_phys(df_phys[keep], long_table, pk=stage.pk)
+
+    # Transverse reinforcement
+    def _stage_transv_reinf(self, stage):
+        elt_name = self._elt_name
+        geom_table = f"{elt_name}_Geometry"
+        transv_table = stage.table
+        # Pull core data with WKT for Shape_Coords
+        df_core = self._fetch_core(transv_table, [stage.pk, "Zone_ID", "Reinf_ID"], stage)
+        if df_core.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping {transv_table}")
+            return
+        # Bring in the zone width under the name the formulas expect
+        phys_zone = self._fetch_upstream(stage, f"{elt_name}_Zone_Geometry", "Zone_ID")
+        df_core = df_core.merge(phys_zone, on="Zone_ID", how="left")
+
+        # Section type and diameters from the parent geometry (elliptical columns)
+        if geom_table in stage.sources() or geom_table in stage.upstream():
+            parent = self._fetch_core(geom_table, ["Reinf_ID", "Product_ID"], stage)
+            if geom_table in stage.upstream():
+                parent = parent.merge(self._fetch_upstream(stage, geom_table, "Product_ID"),
+                                      on="Product_ID", how="left")
+            df_core = df_core.merge(parent.drop(columns="Product_ID"), on="Reinf_ID", how="left")
+
+        df_phys = self._apply_formulas(df_core, stage.steps)
+        keep = [stage.pk, "Reinf_ID", "Zone_ID"] + stage.columns
+        self._upsert_phys(df_phys[keep], transv_table, pk=stage.pk)
+
+    # Prestressing
+    def _stage_prestressing(self, stage):
+        # Load the prestress core table
+        df_core = self._fetch_core(stage.table, [stage.pk, "Reinf_ID"], stage)
+
+        # Pull height from the parent geometry
+        df_geom = self._fetch_core("HCS_Geometry", ["Reinf_ID"], stage)
+
+        # Merge 
+        df_core = df_core.merge(df_geom, on="Reinf_ID", how="left")
+
+        if df_core.empty: # no rows to process, skip this table
+            print(f"[skip] no geometry for {self.element}, skipping HCS_Prestressing")
+            return
+        df_phys = self._apply_formulas(df_core, stage.steps)
+        keep = [stage.pk, "Reinf_ID"] + stage.columns # Keep only pk + all mapped phys columns
+        self._upsert_phys(df_phys[keep], stage.table, pk=stage.pk)
+
+
+#----------------------------------------------------------------------------------------#
+#                                 MULTI-ELEMENT RUNS
+#----------------------------------------------------------------------------------------#
+
+# Phys tables written by more than one of the elements, e.g. Corbel_Geometry -> [wall, beam, column]
+def shared_tables(mapping_path: str, elements: List[str]) -> Dict[str, List[str]]:
+    _, plans = load_plans(mapping_path, "phys")
+    writers: Dict[str, List[str]] = {}
+    for element in elements:
+        for table in plans[element].tables():
+            writers.setdefault(table, []).append(element)
+    return {table: elts for table, elts in writers.items() if len(elts) > 1}
+
+# One element's full phys run in a worker process: (element, seconds, error or None)
+def _load_element(core_url: str, phys_url: str, mapping_path: str, element: str, options: dict, table_locks):
+    start = time.perf_counter()
+    try:
+        PhysLoader(create_engine(core_url), create_engine(phys_url), mapping_path, element,
+                   table_locks=table_locks, **options).run()
+        return element, time.perf_counter() - start, None
+    except Exception:
+        return element, time.perf_counter() - start, traceback.format_exc()
+
+# Run the phys pipelines of several elements in a process pool. Element pipelines are independent
+# apart from the tables they share, whose stages run under one cross-process lock per table.
+# Returns {element: error or None}; per-element timings are printed as each one finishes.
+def load_phys_elements(core_url: str, phys_url: str, mapping_path: str, elements: Optional[List[str]] = None,
+                       workers: Optional[int] = None, **options) -> Dict[str, Optional[str]]:
+    elements = list(elements or ELEMENTS)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(elements)))
+    shared = shared_tables(mapping_path, elements)  # compiles (and caches) the plans once, before forking
+    for table, elts in shared.items():
+        print(f"[schedule] {table} is shared by {', '.join(elts)}: its stages are serialised")
+
+    results: Dict[str, Optional[str]] = {}
+    start = time.perf_counter()
+    with multiprocessing.Manager() as manager:
+        locks = {table: manager.Lock() for table in shared}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_load_element, core_url, phys_url, mapping_path, element, options, locks)
+                       for element in elements]
+            for future in as_completed(futures):
+                element, seconds, error = future.result()
+                results[element] = error
+                print(f"[time] {element}: {seconds:.1f}s ({'ok' if error is None else 'FAILED'})")
+                if error is not None:
+                    print(error)
+    failed = [e for e in elements if results[e] is not None]
+    print(f"[time] all elements: {time.perf_counter() - start:.1f}s with {workers} workers"
+          + (f", failed: {', '.join(failed)}" if failed else ""))
+    return results
+
+
+#----------------------------------------------------------------------------------------#
+#                                  DISTRIBUTED RUNS
+#----------------------------------------------------------------------------------------#
+
+# Split each element's products into partitions and publish them to the work queue as one row per
+# partition and phase (see utils.workqueue). Returns the number of queue rows of the job.
+def publish_phys_job(core_url: str, phys_url: str, mapping_path: str, job: str, elements: List[str],
+                     partitions: int) -> int:
+    core_engine = create_engine(core_url)
+    queued = {}
+    for element in elements:
+        loader = PhysLoader(core_engine, create_engine(phys_url), mapping_path, element)
+        slices = loader.partitions(partitions)
+        print(f"[queue] {element}: {len(slices)} partitions x {len(loader.plan.phases())} phases")
+        queued[element] = (len(loader.plan.phases()), slices)
+    return publish(core_engine, job, queued)
+
+# A worker: claim the job's rows and run each one's phase for its partition until the job is done.
+# Runs as a local worker process, or on another host through `cli.py phys-worker`.
+def work_phys_job(core_url: str, phys_url: str, mapping_path: str, job: str, options: dict) -> int:
+    core_engine, phys_engine = create_engine(core_url), create_engine(phys_url)
+    loaders: Dict[str, PhysLoader] = {}
+
+    def run_item(item: WorkItem):
+        if item.element not in loaders:
+            loaders[item.element] = PhysLoader(core_engine, phys_engine, mapping_path, item.element, **options)
+        loader = loaders[item.element]
+        loader.snapshots, loader.transfers = TableSnapshots(), TransferLog(core_engine) # nothing carried between rows
+        loader.run_partition(item.products, item.reinfs, loader.plan.phases()[item.phase])
+    return work(core_engine, job, run_item)
+
+# Publish a job and work it with local worker processes (other hosts may join with the same job ID).
+# Returns the elements with failed partitions.
+def load_phys_distributed(core_url: str, phys_url: str, mapping_path: str, elements: List[str],
+                          partitions: int, workers: Optional[int] = None, job: Optional[str] = None,
+                          **options) -> List[str]:
+    job = job or f"phys-{time.strftime('%Y%m%d-%H%M%S')}"
+    workers = (os.cpu_count() or 1) if workers is None else max(0, workers)
+    start = time.perf_counter()
+    publish_phys_job(core_url, phys_url, mapping_path, job, elements, partitions)
+    if workers == 0:
+        print(f"[queue] {job}: published only, start workers with `cli.py phys-worker --job {job}`")
+        return []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(work_phys_job, core_url, phys_url, mapping_path, job, options) for _ in range(workers)]
+        done = sum(future.result() for future in as_completed(futures))
+
+    failed = unfinished_elements(create_engine(core_url), job)
+    print(f"[time] {job}: {done} partitions in {time.perf_counter() - start:.1f}s with {workers} local workers"
+          + (f", unfinished: {', '.join(failed)}" if failed else ""))
+    return failed
@@ -0,0 +1,209 @@
+# Import packages
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import hashlib
+import multiprocessing
+import os
+import time
+import traceback
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from core.wall_run import load_wall
+from core.beam_run import load_beam
+from core.column_run import load_column
+from core.hcs_run import load_hcs
+from core.slab_run import load_slab
+from core.materials_run import load_materials
+from core.site_run import load_site
+
+from phys_loader import _load_element, shared_tables
+from anal_loader import AnalysisLoader
+from utils.plan import ELEMENTS
+
+
+#----------------------------------------------------------------------------------------#
+#                                   PIPELINE STAGES
+#----------------------------------------------------------------------------------------#
+
+"""
+`cli.py run-all` turns a folder of workbooks into a populated analysis layer:
+
+    core:materials -> core:site -> core:<element> (one stage per workbook) -> phys:<element> -> anal
+
+Workbooks are matched to loaders by file-name prefix (Materials*.xlsx, Site*.xlsx, Wall*.xlsx, ...).
+Each finished stage is checkpointed in the core Run_Ledger table. A restarted run skips stages
+already done, unless an upstream stage ran again or a workbook's contents changed. Stages whose
+dependencies are met run concurrently in a process pool.
+"""
+LEDGER_TABLE = "Run_Ledger"
+CORE_LOADERS: Dict[str, Callable] = {
+    "materials": load_materials, "site": load_site,
+    "wall": load_wall, "beam": load_beam, "column": load_column, "slab": load_slab, "hcs": load_hcs,
+}
+WORKBOOK_SUFFIXES = (".xlsx", ".xlsm", ".xls")
+
+
+class PipelineStage(NamedTuple):
+    name: str                       # e.g. "core:wall:Wall_Block_A.xlsx", "phys:wall", "anal"
+    deps: Tuple[str, ...]
+    func: Callable
+    args: tuple
+    fingerprint: str = ""           # workbook content hash for core stages
+
+
+# Content hash of a workbook, so an edited file is loaded again under the same name
+def _fingerprint(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# Workbooks of the data folder per core loader, by case-insensitive file-name prefix
+def find_workbooks(data_dir: str) -> Dict[str, List[str]]:
+    found: Dict[str, List[str]] = {}
+    for name in sorted(os.listdir(data_dir)):
+        if not name.lower().endswith(WORKBOOK_SUFFIXES) or name.startswith("~$"):
+            continue
+        kind = next((k for k in CORE_LOADERS if name.lower().startswith(k)), None)
+        if kind is None:
+            print(f"[run-all] ignoring {name}: no loader matches its name")
+            continue
+        found.setdefault(kind, []).append(os.path.join(data_dir, name))
+    return found
+
+def _load_anal(core_url: str, phys_url: str, anal_url: str, mapping_path: str):
+    AnalysisLoader(create_engine(core_url), create_engine(phys_url), create_engine(anal_url), mapping_path).run()
+
+def _load_phys(core_url: str, phys_url: str, mapping_path: str, element: str, table_locks):
+    _, _, error = _load_element(core_url, phys_url, mapping_path, element, {}, table_locks)
+    if error is not None:
+        raise RuntimeError(error)
+
+# Run one stage in a worker: (name, seconds, error or None)
+def _run_stage(name: str, func: Callable, args: tuple):
+    start = time.perf_counter()
+    try:
+        func(*args)
+        return name, time.perf_counter() - start, None
+    except Exception:
+        return name, time.perf_counter() - start, traceback.format_exc()
+
+# The core -> phys -> anal DAG for the workbooks found in data_dir
+def build_stages(data_dir: str, conn: tuple, urls: Dict[str, str], mappings: Dict[str, str],
+                 table_locks) -> List[PipelineStage]:
+    host, port, user, password, db_core = conn
+    workbooks = find_workbooks(data_dir)
+    stages: List[PipelineStage] = []
+
+    # One stage per workbook; workbooks of the same kind load one after another, since they
+    # can share reference rows (e.g. two wall files using the same reinforcement set)
+    def core_stages(kind: str, deps: Tuple[str, ...]) -> Tuple[str, ...]:
+        names = []
+        for path in workbooks.get(kind, []):
+            name = f"core:{kind}:{os.path.basename(path)}"
+            stages.append(PipelineStage(name, deps + tuple(names[-1:]), CORE_LOADERS[kind],
+                                        (path, host, port, user, password, db_core), _fingerprint(path)))
+            names.append(name)
+        return tuple(names)
+
+    # Reference data first (element rows point at strength classes, steel grades and buildings)
+    materials = core_stages("materials", ())
+    site = core_stages("site", materials)
+    phys = []
+    for element in ELEMENTS:
+        loaded = core_stages(element, materials + site)
+        if loaded:
+            stages.append(PipelineStage(f"phys:{element}", loaded, _load_phys,
+                                        (urls["core"], urls["phys"], mappings["phys"], element, table_locks)))
+            phys.append(f"phys:{element}")
+    if phys:
+        stages.append(PipelineStage("anal", tuple(phys), _load_anal,
+                                    (urls["core"], urls["phys"], urls["anal"], mappings["anal"])))
+    return stages
+
+
+#----------------------------------------------------------------------------------------#
+#                                     RUN LEDGER
+#----------------------------------------------------------------------------------------#
+
+# Stages a run has completed: {stage: fingerprint}
+def ledger_done(core_engine, run_id: str) -> Dict[str, str]:
+    df = pd.read_sql(text(f"SELECT Stage, Fingerprint FROM {LEDGER_TABLE} WHERE Run_ID = :run AND Status = 'done'"),
+                     core_engine, params={"run": run_id})
+    return dict(zip(df["Stage"], df["Fingerprint"]))
+
+def ledger_record(core_engine, run_id: str, stage: PipelineStage, seconds: float, error: Optional[str]):
+    with core_engine.begin() as conn:
+        conn.execute(text(f"""
+            INSERT INTO {LEDGER_TABLE} (Run_ID, Stage, Fingerprint, Status, Seconds, Detail)
+            VALUES (:run, :stage, :fp, :status, :seconds, :detail)
+            ON DUPLICATE KEY UPDATE Fingerprint=VALUES(Fingerprint), Status=VALUES(Status),
+                                    Seconds=VALUES(Seconds), Detail=VALUES(Detail)
+        """), {"run": run_id, "stage": stage.name, "fp": stage.fingerprint,
+               "status": "done" if error is None else "failed", "seconds": seconds,
+               "detail": None if error is None else error[-60000:]})
+
+
+#----------------------------------------------------------------------------------------#
+#                                      SCHEDULER
+#----------------------------------------------------------------------------------------#
+
+# Run the DAG, skipping stages the ledger has as done. Returns the names of failed stages
+# (stages downstream of a failure are not started and are reported as blocked).
+def run_pipeline(core_engine, run_id: str, stages: List[PipelineStage], workers: int = 1) -> List[str]:
+    done = ledger_done(core_engine, run_id)
+    by_name = {stage.name: stage for stage in stages}
+    finished, ran, failed = set(), set(), []
+    pending = list(stages)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+        while pending or running:
+            for stage in list(pending):
+                if any(d in failed or d not in finished for d in stage.deps):
+                    continue
+                pending.remove(stage)
+                # Checkpointed, unchanged, and nothing upstream ran again: skip
+                if done.get(stage.name) == stage.fingerprint and not ran.intersection(stage.deps):
+                    print(f"[run-all] {stage.name}: done in an earlier attempt, skipped")
+                    finished.add(stage.name)
+                    continue
+                print(f"[run-all] {stage.name}: started")
+                running[pool.submit(_run_stage, stage.name, stage.func, stage.args)] = stage.name
+            if not running:
+                break
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                del running[future]
+                name, seconds, error = future.result()
+                ledger_record(core_engine, run_id, by_name[name], seconds, error)
+                if error is None:
+                    print(f"[run-all] {name}: done in {seconds:.1f}s")
+                    finished.add(name)
+                    ran.add(name)
+                else:
+                    print(f"[run-all] {name}: FAILED after {seconds:.1f}s\n{error}")
+                    failed.append(name)
+
+    blocked = [stage.name for stage in pending]
+    print(f"[run-all] {run_id}: {len(ran)} ran, {len(finished) - len(ran)} skipped, {len(failed)} failed"
+          + (f", blocked: {', '.join(blocked)}" if blocked else "")
+          + f" ({time.perf_counter() - start:.1f}s)")
+    return failed + blocked
+
+# Build and run the whole pipeline for a data folder (the run ID defaults to the folder name)
+def run_all(data_dir: str, conn: tuple, db_phys: str, db_anal: str, mappings: Dict[str, str],
+            run_id: Optional[str] = None, workers: int = 1) -> List[str]:
+    host, port, user, password, db_core = conn
+    base = f"mysql+mysqlconnector://{user}:{password}@{host}:{port}"
+    urls = {"core": f"{base}/{db_core}", "phys": f"{base}/{db_phys}", "anal": f"{base}/{db_anal}"}
+    run_id = run_id or os.path.basename(os.path.normpath(data_dir))
+    core_engine = create_engine(urls["core"])
+
+    with multiprocessing.Manager() as manager:
+        locks = {table: manager.Lock() for table in shared_tables(mappings["phys"], list(ELEMENTS))}
+        stages = build_stages(data_dir, conn, urls, mappings, locks)
+        if not stages:
+            print(f"[run-all] no workbooks found in {data_dir}")
+            return []
+        return run_pipeline(core_engine, run_id, stages, workers)
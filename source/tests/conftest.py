@@ -0,0 +1,6 @@
+# Import packages
+import os
+import sys
+
+# The loaders import their helpers as top-level packages (utils, core) from source/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,42 @@
+# Import packages
+import pandas as pd
+from sqlalchemy import create_engine
+from utils.changelog import log_core_changes
+from utils.depindex import dependency_rows, write_dependencies
+
+
+# Cursor of a core database with the given tables, recording the statements run on it
+class Cursor:
+    def __init__(self, tables):
+        self.tables, self.inserted, self.found = set(tables), [], []
+
+    def execute(self, sql, params=()):
+        self.found = [params] if params and params[0] in self.tables else []
+
+    def fetchall(self):
+        return self.found
+
+    def executemany(self, sql, rows):
+        self.inserted.extend(rows)
+
+
+BATCHES = [("INSERT INTO Wall_Geometry (Wall_Product_ID, Coords_XYZ) VALUES (%s, %s)", [("W1", "..."), ("W2", "...")])]
+
+
+def test_log_core_changes_inserts_the_keys():
+    cur = Cursor({"Core_Change_Log"})
+    log_core_changes(cur, "wall", BATCHES)
+    assert [row[2] for row in cur.inserted] == ["W1", "W2"]
+
+# A database from before the log existed still loads, without logging
+def test_log_core_changes_skips_a_missing_table(capsys):
+    cur = Cursor(set())
+    log_core_changes(cur, "wall", BATCHES)
+    assert cur.inserted == [] and "Core_Change_Log" in capsys.readouterr().out
+
+
+def test_write_dependencies_skips_a_missing_table(capsys):
+    engine = create_engine("sqlite://")
+    rows = dependency_rows(pd.DataFrame({"Product_ID": ["B1"], "Strength_Class": ["C30/37"]}), "Beam_Capacity")
+    write_dependencies(engine, "Beam_Capacity", ["B1"], rows)
+    assert "Anal_Dependencies" in capsys.readouterr().out
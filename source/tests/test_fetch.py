@@ -0,0 +1,23 @@
+# Import packages
+import pandas as pd
+from sqlalchemy import create_engine
+
+from utils.fetch import TableSnapshots, fetch_by_keys
+
+
+# Only the written rows' keys are read back as an upsert's baseline, in IN lists of chunksize
+def test_fetch_by_keys_reads_only_the_keys():
+    engine = create_engine("sqlite://")
+    pd.DataFrame({"ID": [str(i) for i in range(10)], "Value": range(10)}).to_sql("Phys", engine, index=False)
+    df = fetch_by_keys(engine, "`Phys`", ["ID", "Value"], "ID", ["7", "2", "7", "42"], chunksize=1)
+    assert sorted(df["ID"]) == ["2", "7"]
+    assert fetch_by_keys(engine, "`Phys`", ["ID", "Value"], "ID", []).columns.tolist() == ["ID", "Value"]
+
+
+def test_snapshot_rows_need_every_key_and_column():
+    snapshots = TableSnapshots()
+    snapshots.put("t", pd.DataFrame({"ID": [1, 2, 3], "A": [10, 20, 30]}), "ID")
+    assert snapshots.rows("t", ["ID", "A"], "ID", ["1", "3"])["A"].tolist() == [10, 30]
+    assert snapshots.rows("t", ["ID", "A"], "ID", ["1", "4"]) is None
+    assert snapshots.rows("t", ["ID", "B"], "ID", ["1"]) is None
+    assert snapshots.rows("u", ["ID"], "ID", ["1"]) is None
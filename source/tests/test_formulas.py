@@ -0,0 +1,97 @@
+# Import packages
+from contextlib import nullcontext
+import numpy as np
+import pytest
+from utils.formulas import (FORMULA_REGISTRY, BATCH_REGISTRY, corb_dist_from_top_mm, corb_dist_from_top_mm_batch,
+                            zone_height_mm, zone_height_mm_batch, zone_length_mm, zone_length_mm_batch)
+from utils.functions import format_multipointz, format_multipointzm, format_polygon
+from utils.geometry import derive, geometry_cache
+
+
+# Parent walls of different heights, and one corbel on each
+TALL, SHORT = format_multipointz([[(0, 0, 0), (1000, 200, 3480)], [(0, 0, 0), (1000, 200, 1000)]])
+CORBEL = format_multipointz([[(100, 0, 2500), (400, 300, 3000), (100, 300, 2800)]])[0]
+
+# A 600 x 2000 reinforcement zone, read in the plane of each row
+ZONE = format_polygon([[(0, 0), (600, 0), (600, 2000), (0, 2000)]])[0]
+
+
+def test_corbel_dist_from_top_matches_scalar():
+    parents = np.array([TALL, SHORT], dtype=object)
+    corbels = np.array([CORBEL, CORBEL], dtype=object)
+    expected = [corb_dist_from_top_mm(p, c) for p, c in zip(parents, corbels)]
+    assert corb_dist_from_top_mm_batch(parents, corbels).tolist() == expected
+
+# Every corbel formula reads the same per-corbel records, with or without a run cache
+@pytest.mark.parametrize("cached", [False, True])
+def test_corbel_batches_match_scalar(cached):
+    low = format_multipointz([[(0, 0, 200), (300, 250, 900), (300, 0, 600), (0, 250, 600)]])[0]
+    corbels = np.array([CORBEL, low, CORBEL, low], dtype=object)
+    planes = np.array(["XZ", "YZ", "yz", "XZ"], dtype=object)
+    with geometry_cache() if cached else nullcontext():
+        for name, args in (("corb_depth_mm", (corbels,)), ("rect_blk_height_mm", (corbels,)),
+                           ("tri_blk_height_mm", (corbels,)), ("corb_length_mm", (corbels, planes)),
+                           ("corb_midpoint_mm", (corbels, planes))):
+            expected = [FORMULA_REGISTRY[name](*row) for row in zip(*args)]
+            assert BATCH_REGISTRY[name](*args).tolist() == expected, name
+
+# Stirrup legs are shared per shape and plane; the same shape bent in another plane counts differently
+@pytest.mark.parametrize("cached", [False, True])
+def test_stirrup_legs_match_scalar(cached):
+    hoop, = format_multipointzm([[(0, 25, 0, 80), (0, 25, 500, 90), (0, 300, 500, 90), (0, 300, 0, 90), (0, 40, 0, 100)]])
+    flat, = format_multipointzm([[(25, 0, 0, 80), (25, 0, 500, 90), (300, 0, 500, 0), (300, 0, 0, 90)]])
+    stirrups = np.array([hoop, flat, hoop, flat, hoop], dtype=object)
+    planes = np.array(["YZ", "XZ", "yz", "YZ", "XZ"], dtype=object)
+    n = len(stirrups)
+    ratio_args = (stirrups, planes, "wall", np.array([None] * n, dtype=object), np.full(n, 10.0),
+                  np.full(n, 150.0), np.full(n, 300.0))
+    with geometry_cache() if cached else nullcontext():
+        for _ in range(2):   # the second pass is served from the cache
+            legs = BATCH_REGISTRY["num_legs"](stirrups, planes)
+            assert ["({},{})".format(*pair) for pair in legs.tolist()] == [
+                FORMULA_REGISTRY["num_legs"](w, p) for w, p in zip(stirrups, planes)]
+            ratios = BATCH_REGISTRY["volumetric_ratio_mm3"](*ratio_args)
+            assert ["({:.6f},{:.6f})".format(*pair) for pair in ratios.tolist()] == [
+                FORMULA_REGISTRY["volumetric_ratio_mm3"](w, p, "wall", *row) for w, p, *row in zip(*ratio_args[:2], *ratio_args[3:])]
+        with pytest.raises(ValueError, match="Invalid bent_plane"):
+            BATCH_REGISTRY["num_legs"](stirrups[:2], np.array(["YZ", None], dtype=object))
+
+# Derived rows are built once per distinct geometry and run, and shared by later columns
+def test_derived_rows_built_once_per_run():
+    seen = []
+    def build(shapes):
+        seen.append(len(shapes))
+        return shapes.maxs()[:, 2]
+    with geometry_cache():
+        first = derive(np.array([CORBEL, TALL, CORBEL], dtype=object), "multipointz", "top", build)
+        second = derive(np.array([SHORT, TALL], dtype=object), "multipointz", "top", build)
+    assert first.tolist() == [3000, 3480, 3000] and second.tolist() == [1000, 3480]
+    assert seen == [2, 1]
+
+# A corbel whose parent has no Coords_XYZ must fail, not take another element's height
+@pytest.mark.parametrize("missing", [None, np.nan])
+def test_corbel_dist_from_top_missing_parent(missing):
+    parents = np.array([missing, TALL, SHORT], dtype=object)
+    corbels = np.array([CORBEL, CORBEL, CORBEL], dtype=object)
+    with pytest.raises(TypeError):
+        corb_dist_from_top_mm(missing, CORBEL)
+    with pytest.raises(TypeError, match="row 0"):
+        corb_dist_from_top_mm_batch(parents, corbels)
+
+def test_zone_dimensions_match_scalar():
+    zones = np.array([ZONE, ZONE, ZONE], dtype=object)
+    planes = np.array(["XZ", "yz", "XY"], dtype=object)
+    totals = np.array([5000.0, 5000.0, 5000.0])
+    for batch, scalar in ((zone_length_mm_batch, zone_length_mm), (zone_height_mm_batch, zone_height_mm)):
+        expected = [scalar(z, p, t) for z, p, t in zip(zones, planes, totals)]
+        assert batch(zones, planes, totals).tolist() == expected
+
+# A zone without a plane is an unknown plane, not the plane of the last distinct value
+@pytest.mark.parametrize("missing", [None, np.nan])
+@pytest.mark.parametrize("batch", [zone_length_mm_batch, zone_height_mm_batch])
+def test_zone_dimensions_missing_plane(missing, batch):
+    zones = np.array([ZONE, ZONE], dtype=object)
+    with pytest.raises(AttributeError):
+        zone_height_mm(ZONE, missing, 5000.0)
+    with pytest.raises(ValueError, match="Unknown zone_plane"):
+        batch(zones, np.array([missing, "XZ"], dtype=object), np.array([5000.0, 5000.0]))
@@ -0,0 +1,35 @@
+# Import packages
+import numpy as np
+import pandas as pd
+from utils.functions import (coord_text, format_linestr, format_multipointz, format_multipointzm, format_point,
+                             format_pointz, format_polygon, format_tinz)
+
+
+# WKT text as the += builders wrote it before format_wkt, byte for byte. Values keep the text of their
+# own type, so ints and floats stay mixed within a geometry ("1000 0.0"): that is intentional.
+def test_wkt_text_unchanged():
+    assert format_multipointz([[(0, 0, 1500), (1200.5, 0.0, 3000)], []]) == [
+        "MULTIPOINT Z ((0 0 1500), (1200.5 0.0 3000))", "MULTIPOINT Z)"]
+    assert format_multipointzm([[(0, 0, 0, 1), (1.5, 2, np.int64(3), np.float64(4.0))]]) == [
+        "MULTIPOINT ZM ((0 0 0 1), (1.5 2 3 4.0))"]
+    assert format_polygon([[(0, 0), (1000, 0.0), (1000, 200)]]) == ["POLYGON((0 0, 1000 0.0, 1000 200, 0 0))"]
+    assert format_point([(12, 3.5)]) == "POINT(12 3.5)"
+    assert format_linestr([(0, 0), (2500.0, 10)]) == "LINESTRING(0 0, 2500.0 10)"
+    assert format_pointz(pd.Series([(1, 2, 3), (1.0, 2, 3.25)])) == ["POINT Z (1 2 3)", "POINT Z (1.0 2 3.25)"]
+
+# A frame's coordinates print in its common dtype: floats once any column is float
+def test_coord_text_follows_frame_dtype():
+    frame = pd.DataFrame({"a": [1500, 20], "b": [2.5, 3.0]})
+    assert coord_text(frame)[0].tolist() == ["1500.0", "20.0"]
+    assert coord_text(frame[["a"]])[0].tolist() == ["1500", "20"]
+
+
+def test_tin_text_unchanged():
+    assert format_tinz([[(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)]]) == [
+        "TIN Z (((0 1 0, 1 0 0, 0 0 0, 0 1 0)), ((0 0 1, 1 0 0, 0 0 0, 0 0 1)), "
+        "((0 0 1, 0 1 0, 0 0 0, 0 0 1)), ((0 0 1, 0 1 0, 1 0 0, 0 0 1)))"]
+    assert format_tinz([[(0, 0, 0), (1.5, 0, 0), (0, 1, 0), (0, 0, 1)]]) == [
+        "TIN Z (((0.0 1.0 0.0, 1.5 0.0 0.0, 0.0 0.0 0.0, 0.0 1.0 0.0)), "
+        "((0.0 0.0 1.0, 1.5 0.0 0.0, 0.0 0.0 0.0, 0.0 0.0 1.0)), "
+        "((0.0 0.0 1.0, 0.0 1.0 0.0, 0.0 0.0 0.0, 0.0 0.0 1.0)), "
+        "((0.0 0.0 1.0, 0.0 1.0 0.0, 1.5 0.0 0.0, 0.0 0.0 1.0)))"]
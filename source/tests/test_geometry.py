@@ -0,0 +1,29 @@
+# Import packages
+import numpy as np
+import pytest
+from utils.formulas import total_height_mm, total_height_mm_batch
+from utils.functions import format_multipointz
+from utils.geometry import RaggedCoords, geometry_cache
+
+
+# Two walls of different heights, as the core loaders write them
+TALL, SHORT = format_multipointz([[(0, 0, 0), (1000, 200, 3480)], [(0, 0, 0), (1000, 200, 1000)]])
+
+
+def test_from_wkt_repeats_decode_once_per_value():
+    shapes = RaggedCoords.from_wkt([TALL, SHORT, TALL], "multipointz")
+    assert shapes.extent("z").tolist() == [3480, 1000, 3480]
+
+# A missing geometry must not pick up another row's coordinates (factorize codes it -1)
+@pytest.mark.parametrize("missing", [None, np.nan])
+@pytest.mark.parametrize("cached", [False, True])
+def test_from_wkt_missing_value_raises(missing, cached):
+    column = np.array([missing, TALL, SHORT], dtype=object)
+    with pytest.raises(TypeError):
+        total_height_mm(missing)
+    if cached:
+        with geometry_cache(), pytest.raises(TypeError, match="row 0"):
+            total_height_mm_batch(column)
+    else:
+        with pytest.raises(TypeError, match="row 0"):
+            total_height_mm_batch(column)
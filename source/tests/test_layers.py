@@ -0,0 +1,63 @@
+# Import packages
+import sqlite3
+import numpy as np
+import pandas as pd
+from anal_loader import BEAM_FEATURES_SQL
+from utils.layers import LAYER_COLUMNS, pivot_layers
+
+
+# Bar rows of Beam_Long_Reinf: R1 two layers, R2 three layers, R3 a single layer, R4 two bars at
+# the same depth (the lower Long_ID is the tensile one)
+BARS = pd.DataFrame({
+    "Long_ID": [1, 2, 3, 4, 5, 6, 7, 8, 9],
+    "Reinf_ID": ["R1", "R2", "R1", "R2", "R3", "R2", "R4", "R4", "R4"],
+    "bar_area_mm2": [402.0, 226.0, 157.0, 603.0, 314.0, 100.0, 201.0, 101.0, 50.0],
+    "effective_depth_mm": [460.0, 40.0, 40.0, 455.0, 450.0, 250.0, 400.0, 400.0, 50.0],
+})
+
+# The per-design groupby.apply pivot pivot_layers replaced (it failed on a single-layer design)
+def old_pivot(df):
+    def layers(grp):
+        return pd.Series({"As1_mm2": grp.iloc[0]["bar_area_mm2"], "As2_mm2": grp.iloc[1]["bar_area_mm2"],
+                          "d_mm": grp.iloc[0]["effective_depth_mm"], "dp_mm": grp.iloc[1]["effective_depth_mm"]})
+    ranked = df.sort_values("effective_depth_mm", ascending=False)
+    return ranked.groupby("Reinf_ID")[["bar_area_mm2", "effective_depth_mm"]].apply(layers).reset_index()
+
+
+def test_pivot_layers_matches_old_pivot():
+    multi = BARS[BARS["Reinf_ID"].isin(["R1", "R2"])]
+    pd.testing.assert_frame_equal(pivot_layers(multi, tiebreak="Long_ID"), old_pivot(multi))
+
+
+def test_pivot_layers_single_layer_and_ties():
+    out = pivot_layers(BARS, tiebreak="Long_ID").set_index("Reinf_ID")
+    assert list(out.columns) == list(LAYER_COLUMNS)
+    assert out.loc["R3"].tolist() == [314.0, 0.0, 450.0, 0.0]   # no compressive layer
+    assert out.loc["R4"].tolist() == [201.0, 101.0, 400.0, 400.0]
+    swapped = BARS.assign(Long_ID=BARS["Long_ID"].replace({7: 8, 8: 7}))
+    assert pivot_layers(swapped, tiebreak="Long_ID").set_index("Reinf_ID").loc["R4", "As1_mm2"] == 101.0
+
+# The sql assembly mode ranks layers in BEAM_FEATURES_SQL; both modes give the same layers
+def test_sql_layers_match_pivot_layers():
+    conn = sqlite3.connect(":memory:")
+    for schema in ("core", "phys"):
+        conn.execute(f"ATTACH ':memory:' AS {schema}")
+    tables = {
+        "phys.Beam_Long_Reinf": BARS,
+        "core.Beam_Long_Reinf": BARS[["Long_ID", "Reinf_ID"]].assign(Steel_Grade="B500B"),
+        "core.Beam_Geometry": pd.DataFrame({"Product_ID": ["B1", "B2", "B3", "B4"], "Reinf_ID": ["R1", "R2", "R3", "R4"],
+                                            "Strength_Class": "C30/37"}),
+        "core.Concrete_Props": pd.DataFrame({"Strength_Class": ["C30/37"], "f_ck": [30.0]}),
+        "core.Steel_Props": pd.DataFrame({"Steel_Grade": ["B500B"], "f_yk": [500.0]}),
+        "phys.Beam_Geometry": pd.DataFrame({"Product_ID": ["B1", "B2", "B3", "B4"], "total_width_mm": 300.0}),
+    }
+    for name, df in tables.items():
+        conn.execute(f"CREATE TABLE {name} ({', '.join(df.columns)})")
+        conn.executemany(f"INSERT INTO {name} VALUES ({', '.join('?' * df.shape[1])})",
+                         df.astype(object).itertuples(index=False, name=None))
+
+    sql = pd.read_sql(BEAM_FEATURES_SQL.format(core="core", phys="phys"), conn)
+    sql = sql.sort_values("Reinf_ID")[["Reinf_ID", *LAYER_COLUMNS]].reset_index(drop=True)
+    expected = pivot_layers(BARS, tiebreak="Long_ID").sort_values("Reinf_ID").reset_index(drop=True)
+    np.testing.assert_array_equal(sql["Reinf_ID"], expected["Reinf_ID"])
+    np.testing.assert_allclose(sql[list(LAYER_COLUMNS)].astype(float), expected[list(LAYER_COLUMNS)])
@@ -0,0 +1,30 @@
+# Import packages
+import os
+import pickle
+import shutil
+import pytest
+from utils.plan import load_plans
+
+
+# A copy of the repository's configs and schemas, so the plan cache is written under tmp_path
+@pytest.fixture
+def mapping(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    shutil.copytree(os.path.join(root, "configs"), tmp_path / "configs",
+                    ignore=shutil.ignore_patterns(".plan_cache"))
+    shutil.copytree(os.path.join(root, "schemas"), tmp_path / "schemas")
+    return str(tmp_path / "configs" / "anal_map.yml")
+
+# A truncated cache (an interrupted or raced dump) is a cache miss, and is replaced
+@pytest.mark.parametrize("content", [b"", b"\x80\x04\x95garbage"])
+def test_unreadable_plan_cache_recompiles(mapping, content):
+    _, plans = load_plans(mapping, "anal")
+    folder = os.path.join(os.path.dirname(mapping), ".plan_cache")
+    (cached,) = os.listdir(folder)
+    with open(os.path.join(folder, cached), "wb") as f:
+        f.write(content)
+    _, again = load_plans(mapping, "anal")
+    assert again.keys() == plans.keys()
+    assert os.listdir(folder) == [cached]
+    with open(os.path.join(folder, cached), "rb") as f:
+        assert pickle.load(f)["plans"].keys() == plans.keys()
@@ -0,0 +1,92 @@
+# Import packages
+import numpy as np
+import pandas as pd
+from core.tables.Corbel_Geometry_Wall import corbel_geom_table
+from core.tables.Wall_Geometry import wall_geom_table
+
+
+# Pinned output of the synthetic sheets below: 3D points of a wall (as the modules wrote them before
+# the block segmentation), and of its corbel extruded from the side (XZ) or front (XY) view
+COORDS_XYZ = ('MULTIPOINT Z ((0.0 0.0 0.0), (0.0 0.0 2500.0), (0.0 0.0 3000.0), (0.0 200.0 0.0), '
+              '(0.0 200.0 2500.0), (500.0 0.0 0.0), (500.0 0.0 2500.0), (500.0 0.0 3000.0), '
+              '(500.0 200.0 0.0), (500.0 200.0 2500.0), (500.0 200.0 3000.0), (1000.0 0.0 0.0), '
+              '(1000.0 0.0 2500.0), (1000.0 0.0 3000.0), (1000.0 200.0 0.0), '
+              '(1000.0 200.0 2500.0), (1000.0 200.0 3000.0))')
+CORBEL_XZ = ('MULTIPOINT Z ((10.0 0.0 1000.0), (10.0 0.0 1200.0), (10.0 20.0 1000.0), '
+             '(10.0 20.0 1200.0), (10.0 220.0 1000.0), (10.0 220.0 1200.0), (10.0 300.0 1000.0), '
+             '(10.0 300.0 1200.0), (310.0 0.0 1000.0), (310.0 0.0 1200.0), (310.0 20.0 1000.0), '
+             '(310.0 20.0 1200.0), (310.0 220.0 1000.0), (310.0 220.0 1200.0), '
+             '(310.0 300.0 1000.0), (310.0 300.0 1200.0))')
+CORBEL_XY = ('MULTIPOINT Z ((0.0 10.0 1000.0), (0.0 10.0 1200.0), (0.0 20.0 1000.0), '
+             '(0.0 20.0 1200.0), (0.0 220.0 1000.0), (0.0 220.0 1200.0), (0.0 310.0 1000.0), '
+             '(0.0 310.0 1200.0), (10.0 10.0 1000.0), (10.0 10.0 1200.0), (10.0 20.0 1000.0), '
+             '(10.0 20.0 1200.0), (10.0 220.0 1000.0), (10.0 220.0 1200.0), (10.0 310.0 1000.0), '
+             '(10.0 310.0 1200.0), (300.0 10.0 1000.0), (300.0 10.0 1200.0), (300.0 20.0 1000.0), '
+             '(300.0 20.0 1200.0), (300.0 220.0 1000.0), (300.0 220.0 1200.0), '
+             '(300.0 310.0 1000.0), (300.0 310.0 1200.0), (310.0 10.0 1000.0), '
+             '(310.0 10.0 1200.0), (310.0 20.0 1000.0), (310.0 20.0 1200.0), '
+             '(310.0 220.0 1000.0), (310.0 220.0 1200.0), (310.0 310.0 1000.0), '
+             '(310.0 310.0 1200.0))')
+
+
+# A Wall_Geometry sheet as the core loaders read it: two header rows, one block of rows per wall
+# (all walls alike, with a gable row in the front view only and one radius/bevel row), then a blank
+# row. `corbels` gives the extrusion plane of a corbel on each wall, or None for no corbel.
+def wall_sheet(corbels=(None, None)):
+    rows = [[None] * 43 for _ in range(2)]
+    for e, plane in enumerate(corbels):
+        block = [[None] * 43 for _ in range(5)]
+        block[0][:4] = [f"W{e}", "R1", 0, 1]
+        block[0][14], block[0][15], block[0][19], block[0][27] = 0, 0, 0, 0
+        block[0][39:43] = ["C30/37", 16, "NC", "note"]
+        for i, (x, z) in enumerate([(0, 0), (1000, 0), (1000, 2500), (0, 2500), (500, 3000)]):
+            block[i][5], block[i][6] = x, z
+        for i, (y, z) in enumerate([(0, 0), (200, 0), (200, 2500), (0, 2500)]):
+            block[i][8], block[i][9] = y, z
+        for i, (x, y) in enumerate([(0, 0), (1000, 0), (1000, 200)]):
+            block[i][11], block[i][12] = x, y
+        block[0][7], block[0][10], block[0][13] = 0, 10, 20
+        if plane is not None:
+            block[0][27], block[0][28] = 1, plane
+            for i, (a, b) in enumerate([(0, 0), (300, 0), (300, 200), (0, 200)]):
+                block[i][35], block[i][36] = a + 10, b + 20
+                if plane == "XZ":
+                    block[i][32], block[i][33] = a, b + 1000
+                else:
+                    block[i][29], block[i][30] = a, b + 1000
+        rows += block
+    rows.append([None] * 43)
+    cols = [f"c{i}" for i in range(43)]
+    cols[0], cols[42] = "Product ID", "Notes"
+    df = pd.DataFrame(rows, columns=cols).replace({None: np.nan}).infer_objects()
+    df.replace({np.nan: None}, inplace=True)
+    return df
+
+
+def test_wall_geometry_blocks():
+    _, (first, _), _ = wall_geom_table(wall_sheet())
+    assert first[4] == COORDS_XYZ
+    assert first[6] == "MULTIPOINT Z ((0.0 10.0 20.0))"
+    assert first[7] == "POLYGON((0.0 0.0, 1000.0 0.0, 1000.0 200.0, 0.0 0.0, 0.0 0.0))"
+
+# The last wall follows the same rules as the others. Before the block segmentation its views were
+# read only on rows with both a front x and a plan x (dropping the gable row), its empty
+# radius/bevel rows were written as "(None None None)" and its footprint ring was not closed.
+def test_wall_geometry_last_block_like_the_others():
+    _, (first, last), _ = wall_geom_table(wall_sheet())
+    assert last[0] == "W1"
+    assert last[1:] == first[1:]
+
+
+def test_wall_corbels_use_their_own_plane():
+    _, tuples, _ = corbel_geom_table(wall_sheet(("XZ", "XY")), None)
+    assert [t[:2] for t in tuples] == [("W0", "XZ"), ("W1", "XY")]
+    assert tuples[0][2] == CORBEL_XZ
+    # Before, the last corbel took the previous corbel's plane
+    assert tuples[1][2] == CORBEL_XY
+
+# A sheet with a single corbel used to fail on the last-corbel branch
+def test_wall_single_corbel():
+    _, tuples, _ = corbel_geom_table(wall_sheet((None, "XZ")), None)
+    assert [t[:2] for t in tuples] == [("W1", "XZ")]
+    assert tuples[0][2] == CORBEL_XZ
@@ -0,0 +1,64 @@
+# Import packages
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from utils.upsert import diff_rows
+
+
+TYPES = {"Ratio": "DECIMAL(6,3)", "Area": "FLOAT", "Count": "INT", "Label": "VARCHAR(45)"}
+
+# Rows as the table holds them: DECIMAL values come back from the MySQL driver as Decimal objects
+STORED = pd.DataFrame({
+    "ID": ["A", "B", "C", "D"],
+    "Ratio": [Decimal("1.234"), Decimal("0.500"), Decimal("2.000"), None],
+    "Area": [0.1, 2.5, 3.0, 4.0],
+    "Count": [3, 4, 5, 6],
+    "Label": ["x", None, "z", "w"],
+})
+
+
+def frame(**changes):
+    df = STORED.assign(Ratio=[1.234, 0.5, 2.0, np.nan], Count=[3.0, 4.0, 5.0, 6.0])
+    for col, values in changes.items():
+        df[col] = values
+    return df
+
+# Values equal to what the columns store are unchanged: a recomputed ratio within the DECIMAL scale,
+# a float64 that rounds to the stored FLOAT, an int stored as a float, and None against NaN
+def test_equal_as_stored_is_unchanged():
+    df = frame(Ratio=[1.23449, 0.5004, 2, None], Area=[np.float64(np.float32(0.1)), 2.5, 3.0, 4.0],
+               Label=["x", np.nan, "z", "w"])
+    new, groups, unchanged = diff_rows(df, STORED, "ID", TYPES)
+    assert new.empty and groups == [] and unchanged == 4
+
+
+def test_new_changed_and_unchanged_rows():
+    df = pd.concat([frame(Ratio=[1.24, 0.5, 2.0, 1.0], Count=[3, 7, 5, 6]),
+                    pd.DataFrame({"ID": ["E"], "Ratio": [1.0], "Area": [1.0], "Count": [1], "Label": ["e"]})],
+                   ignore_index=True)
+    new, groups, unchanged = diff_rows(df, STORED, "ID", TYPES)
+    assert new["ID"].tolist() == ["E"]
+    assert unchanged == 1
+    # One update group per changed-column signature, each updating only its differing columns
+    assert sorted((cols, rows["ID"].tolist()) for cols, rows in groups) == [
+        (["Count"], ["B"]), (["Ratio"], ["A", "D"])]
+
+
+def test_signature_groups_split_by_changed_columns():
+    df = frame(Area=[1.0, 2.5, 9.0, 4.0], Label=["x", "b", "zz", "w"])
+    _, groups, unchanged = diff_rows(df, STORED, "ID", TYPES)
+    assert sorted((cols, rows["ID"].tolist()) for cols, rows in groups) == [
+        (["Area"], ["A"]), (["Area", "Label"], ["C"]), (["Label"], ["B"])]
+    assert unchanged == 1
+
+# Stored rows repeating a key compare against the last of them
+def test_duplicate_stored_keys_use_the_last():
+    stored = pd.concat([STORED, STORED.iloc[[0]].assign(Count=9)], ignore_index=True)
+    _, groups, unchanged = diff_rows(frame(), stored, "ID", TYPES)
+    assert [(cols, rows["ID"].tolist()) for cols, rows in groups] == [(["Count"], ["A"])]
+    assert unchanged == 3
+
+# A column the table does not hold yet is always written
+def test_unstored_column_is_written():
+    _, groups, unchanged = diff_rows(frame().assign(Extra=1), STORED, "ID", TYPES)
+    assert [(cols, len(rows)) for cols, rows in groups] == [(["Extra"], 4)] and unchanged == 0
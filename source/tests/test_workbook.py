@@ -0,0 +1,36 @@
+# Import packages
+import pandas as pd
+import pytest
+from utils.workbook import SheetColumns, read_workbook
+
+
+# One workbook: a wide sheet with a named column past the positional ones, and a narrow sheet
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "Wall_Test.xlsx"
+    wide = pd.DataFrame({f"c{i}": [i, i + 1] for i in range(8)}).rename(columns={"c5": "Notes"})
+    with pd.ExcelWriter(path) as writer:
+        wide.to_excel(writer, sheet_name="Geometry", index=False)
+        wide.iloc[:, :3].to_excel(writer, sheet_name="Narrow", index=False)
+    return str(path)
+
+# Every sheet is parsed once, with no header probe
+@pytest.fixture
+def parses(monkeypatch):
+    calls = []
+    parse = pd.ExcelFile.parse
+    monkeypatch.setattr(pd.ExcelFile, "parse", lambda self, sheet, **kw: calls.append(sheet) or parse(self, sheet, **kw))
+    return calls
+
+
+def test_read_workbook_cuts_to_positions_and_names(workbook, parses):
+    frames = read_workbook(workbook, {"Geometry": SheetColumns(2, ("Notes",)), "Narrow": SheetColumns(2)})
+    assert frames["Geometry"].columns.tolist() == ["c0", "c1", "c2", "c3", "c4", "Notes"]
+    assert frames["Narrow"].columns.tolist() == ["c0", "c1"]
+    assert parses == ["Geometry", "Narrow"]
+
+
+def test_read_workbook_keeps_narrow_and_full_sheets(workbook):
+    frames = read_workbook(workbook, {"Narrow": SheetColumns(5), "Geometry": SheetColumns()})
+    assert frames["Narrow"].shape == (2, 3)
+    assert frames["Geometry"].shape == (2, 8)
@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import List, NamedTuple, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+
+#----------------------------------------------------------------------------------------#
+#                                  BLOCK SEGMENTATION
+#----------------------------------------------------------------------------------------#
+
+"""
+The data-collection sheets list elements as blocks of rows: the row that opens a block carries
+its key (a Product ID, a non-zero void or corbel count, ...) and the rows below it, up to the
+next opening row, hold the rest of its coordinates. segment labels every sheet row with its
+block in one pass, and split_blocks/block_points cut columns of the sheet into per-block lists
+from that labelling, instead of walking the sheet cell by cell with iloc.
+"""
+
+class Blocks(NamedTuple):
+    rows: np.ndarray                # sheet row position opening each block
+    ids: np.ndarray                 # block number of every sheet row, -1 outside any block
+
+
+# Blocks opened by the rows from `start` on where `opens` is True. A block runs up to the next
+# opening row; rows before the first block, and from row `stop` on, belong to none.
+def segment(opens: Sequence[bool], start: int = 0, stop: Optional[int] = None) -> Blocks:
+    opens = np.array(opens, dtype=bool)
+    opens[:start] = False
+    ids = np.cumsum(opens) - 1
+    if stop is not None:
+        ids[max(stop, 0):] = -1
+    return Blocks(np.flatnonzero(opens), ids)
+
+# Rows whose count cell opens a block: not empty and not zero
+def nonzero(values: pd.Series) -> np.ndarray:
+    return (values.notna() & (values != 0)).to_numpy()
+
+# Per-row values split into their blocks: a list per block, in row order, of the rows where
+# `keep` is True. Rows of a 2D array come out as tuples, items of a 1D array as they are.
+def split_blocks(values: np.ndarray, blocks: Blocks, keep: Optional[np.ndarray] = None) -> List[list]:
+    keep = blocks.ids >= 0 if keep is None else (blocks.ids >= 0) & keep
+    kept = values[keep]
+    items = list(map(tuple, kept.tolist())) if kept.ndim == 2 else list(kept)
+
+    # Block numbers never decrease down the sheet, so each block's kept rows are one slice
+    edges = np.searchsorted(blocks.ids[keep], np.arange(len(blocks.rows) + 1)).tolist()
+    return [items[a:b] for a, b in zip(edges[:-1], edges[1:])]
+
+# Points of every block from sheet columns `cols`: a list of tuples per block, in row order.
+# Rows with an empty cell are skipped (how="any"), or only rows with every cell empty (how="all").
+def block_points(sheet: pd.DataFrame, blocks: Blocks, cols: Sequence[int], how: str = "any") -> List[List[tuple]]:
+    values = sheet.iloc[:, list(cols)].to_numpy(dtype=object)
+    empty = pd.isna(values)
+    return split_blocks(values, blocks, ~(empty.any(axis=1) if how == "any" else empty.all(axis=1)))
@@ -0,0 +1,151 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+import re
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+
+#----------------------------------------------------------------------------------------#
+#                                  CORE CHANGE LOG
+#----------------------------------------------------------------------------------------#
+
+"""
+The core loaders record every Product_ID / Reinf_ID / Zone_ID they insert in Core_Change_Log
+(see schemas/Core_Schema_v4.sql). An --incremental phys or anal run reads the pending rows,
+widens them to the products and reinforcement sets they reach (a zone -> its Reinf_ID -> the
+products using it, and back), rebuilds only those rows, and stamps the log rows it consumed.
+Anal consumes only rows phys has already consumed, so capacities are never built from stale
+phys values.
+"""
+CHANGE_LOG_TABLE = "Core_Change_Log"
+LAYERS = ("phys", "anal")
+
+_RE_INSERT = re.compile(r"INSERT INTO\s+`?(\w+)`?\s*\(([^)]*)\)", re.I)
+
+# Log column a core column's value is recorded under (Wall_Product_ID -> Product_ID, ...)
+def _log_column(column: str) -> Optional[str]:
+    for key in ("Product_ID", "Reinf_ID", "Zone_ID"):
+        if column == key or column.endswith(f"_{key}"):
+            return key
+    return None
+
+# (table, Product_ID, Reinf_ID, Zone_ID) rows for the keys carried by one bulk insert
+def change_keys(insert_sql: str, tups) -> List[Tuple[str, Optional[str], Optional[str], Optional[str]]]:
+    m = _RE_INSERT.search(insert_sql or "")
+    if m is None or not tups:
+        return []
+    table = m.group(1)
+    columns = [c.strip().strip("`") for c in m.group(2).split(",")]
+    slots = {key: i for i, c in enumerate(columns) if (key := _log_column(c)) is not None}
+    if not slots:
+        return []
+    rows = set()
+    for tup in tups:
+        keys = [tup[slots[k]] if k in slots else None for k in ("Product_ID", "Reinf_ID", "Zone_ID")]
+        if any(k is not None for k in keys):
+            rows.add((table, *(None if k is None else str(k) for k in keys)))
+    return sorted(rows, key=lambda r: tuple("" if v is None else v for v in r))
+
+# Record the keys of a core load's bulk inserts, on the loader's own cursor and transaction.
+# A core database created before the log existed is loaded without it (see README, Upgrading).
+def log_core_changes(cur, element: str, batches: Iterable[Tuple[str, list]]):
+    rows = [(element, *row) for insert, tups in batches for row in change_keys(insert, tups)]
+    if not rows:
+        return
+    cur.execute("SHOW TABLES LIKE %s", (CHANGE_LOG_TABLE,))
+    if not cur.fetchall():
+        print(f"[warning] no {CHANGE_LOG_TABLE} table, {element} changes not logged; "
+              "incremental runs will not see them until the table is created and a full build is run")
+        return
+    cur.executemany(f"INSERT INTO {CHANGE_LOG_TABLE} (Element, Table_Name, Product_ID, Reinf_ID, Zone_ID) "
+                    "VALUES (%s, %s, %s, %s, %s)", rows)
+
+
+class ChangeSet(NamedTuple):
+    """Pending log rows up to max_id, widened to every product/reinforcement set they affect."""
+    max_id: Optional[int]
+    products: FrozenSet[str] = frozenset()
+    reinfs: FrozenSet[str] = frozenset()
+
+    @property
+    def empty(self) -> bool:
+        return self.max_id is None
+
+    # Mask of df rows an incremental run rebuilds: any product or Reinf_ID key column in the set
+    def affects(self, df: pd.DataFrame) -> pd.Series:
+        mask = pd.Series(False, index=df.index)
+        for col in df.columns:
+            key = _log_column(col)
+            if key == "Product_ID":
+                mask |= df[col].astype(str).isin(self.products)
+            elif key == "Reinf_ID":
+                mask |= df[col].astype(str).isin(self.reinfs)
+        return mask
+
+    # Whether a table with `columns` has a product or Reinf_ID key column the set can restrict it by
+    def keyed(self, columns: Iterable[str]) -> bool:
+        return any(_log_column(col) in ("Product_ID", "Reinf_ID") for col in columns)
+
+    # WHERE clause (and its expanding bind params) restricting a table with `columns` to the set
+    def where(self, columns: Iterable[str]) -> Tuple[str, Dict[str, list]]:
+        conds, params = [], {}
+        for col in columns:
+            key = _log_column(col)
+            if key in ("Product_ID", "Reinf_ID"):
+                values = sorted(self.products if key == "Product_ID" else self.reinfs)
+                if values:
+                    params[f"k{len(params)}"] = values
+                    conds.append(f"`{col}` IN :k{len(params) - 1}")
+        return (" OR ".join(conds) if conds else "FALSE"), params
+
+    def __str__(self) -> str:
+        return f"{len(self.products)} products / {len(self.reinfs)} reinforcement sets"
+
+# Text query with every dict param bound as an expanding IN list
+def expanding(sql: str, params: Dict[str, list]):
+    return text(sql).bindparams(*(bindparam(k, expanding=True) for k in params))
+
+def _pending_filter(layer: str) -> str:
+    if layer not in LAYERS:
+        raise ValueError(f"Unknown layer '{layer}', expected one of {LAYERS}")
+    if layer == "phys":
+        return "Phys_Consumed_At IS NULL AND Element = :element"
+    return "Anal_Consumed_At IS NULL AND Phys_Consumed_At IS NOT NULL"
+
+# Pending log rows for a layer (phys: one element's rows; anal: rows phys has consumed), widened
+# through `links`: frames of (product column, Reinf_ID) and (Zone_ID, Reinf_ID) pairs from core
+def pending_changes(core_engine, layer: str, element: Optional[str] = None,
+                    products_reinfs: Optional[pd.DataFrame] = None,
+                    zones_reinfs: Optional[pd.DataFrame] = None) -> ChangeSet:
+    log = pd.read_sql(text(f"SELECT Change_ID, Product_ID, Reinf_ID, Zone_ID FROM {CHANGE_LOG_TABLE} "
+                           f"WHERE {_pending_filter(layer)}"),
+                      core_engine, params={"element": element})
+    if log.empty:
+        return ChangeSet(None)
+
+    products = set(log["Product_ID"].dropna().astype(str))
+    reinfs = set(log["Reinf_ID"].dropna().astype(str))
+    zones = set(log["Zone_ID"].dropna().astype(str))
+    # zone -> its reinforcement set; product -> its reinforcement set -> every product sharing it
+    if zones_reinfs is not None and zones:
+        reinfs |= set(zones_reinfs.loc[zones_reinfs["Zone_ID"].astype(str).isin(zones), "Reinf_ID"].dropna().astype(str))
+    if products_reinfs is not None:
+        pid, rid = products_reinfs["Product_ID"].astype(str), products_reinfs["Reinf_ID"].astype(str)
+        reinfs |= set(rid[pid.isin(products)])
+        products |= set(pid[rid.isin(reinfs)])
+    return ChangeSet(int(log["Change_ID"].max()), frozenset(products), frozenset(reinfs))
+
+# Stamp a layer's pending log rows up to the change set's max_id as consumed
+def mark_consumed(core_engine, layer: str, changes: ChangeSet, element: Optional[str] = None):
+    if changes.empty:
+        return
+    column = "Phys_Consumed_At" if layer == "phys" else "Anal_Consumed_At"
+    with core_engine.begin() as conn:
+        conn.execute(text(f"UPDATE {CHANGE_LOG_TABLE} SET {column} = CURRENT_TIMESTAMP "
+                          f"WHERE {_pending_filter(layer)} AND Change_ID <= :max_id"),
+                     {"element": element, "max_id": changes.max_id})
@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Dict, Iterable, Set
+import pandas as pd
+from sqlalchemy import inspect, text
+from utils.changelog import expanding
+
+
+#----------------------------------------------------------------------------------------#
+#                              REFERENCE DEPENDENCY INDEX
+#----------------------------------------------------------------------------------------#
+
+"""
+Anal_Dependencies (see schemas/Anal_Schema_v1.sql) records, per analysis row, the reference
+keys its inputs were looked up by. A correction to a reference table then maps to the rows
+that used the corrected key, and only those are recomputed:
+    Concrete_Props.Strength_Class                     -> f_ck
+    Steel_Props.Steel_Grade                           -> f_yk
+    Concrete_Testing / Reinforcement_Testing.Test_Region_ID -> in-situ results of the element
+"""
+DEPENDENCY_TABLE = "Anal_Dependencies"
+
+# Reference table -> the key its rows are referenced by
+REFERENCE_TABLES: Dict[str, str] = {
+    "Concrete_Props":        "Strength_Class",
+    "Steel_Props":           "Steel_Grade",
+    "Concrete_Testing":      "Test_Region_ID",
+    "Reinforcement_Testing": "Test_Region_ID",
+}
+REF_KINDS = tuple(dict.fromkeys(REFERENCE_TABLES.values()))
+
+# Reference keys as stored in the index: integer IDs widened to float by a left merge stay "7", not "7.0"
+def _key(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+# Index rows (Anal_Table, Product_ID, Ref_Kind, Ref_Key) for every reference-key column of df
+def dependency_rows(df: pd.DataFrame, table: str, pk: str = "Product_ID") -> pd.DataFrame:
+    parts = []
+    for kind in REF_KINDS:
+        if kind in df.columns:
+            sub = df[[pk, kind]].dropna()
+            parts.append(pd.DataFrame({"Product_ID": sub[pk].map(_key), "Ref_Key": sub[kind].map(_key), "Ref_Kind": kind}))
+    if not parts:
+        return pd.DataFrame(columns=["Anal_Table", "Product_ID", "Ref_Kind", "Ref_Key"])
+    rows = pd.concat(parts, ignore_index=True).drop_duplicates()
+    return rows.assign(Anal_Table=table)[["Anal_Table", "Product_ID", "Ref_Kind", "Ref_Key"]]
+
+# Replace the index rows of the given products of one analysis table. An analysis database
+# created before the index existed is loaded without it (see README, Upgrading).
+def write_dependencies(anal_engine, table: str, products: Iterable[str], rows: pd.DataFrame):
+    products = sorted({str(p) for p in products})
+    if not products:
+        return
+    if not inspect(anal_engine).has_table(DEPENDENCY_TABLE):
+        print(f"[warning] no {DEPENDENCY_TABLE} table, {table} dependencies not indexed; "
+              "invalidate will not find these rows until the table is created and load-anal is rerun")
+        return
+    params = {"products": products}
+    with anal_engine.begin() as conn:
+        conn.execute(expanding(f"DELETE FROM `{DEPENDENCY_TABLE}` WHERE Anal_Table = :table "
+                               "AND Product_ID IN :products", params), {"table": table, **params})
+        if len(rows):
+            conn.execute(text(f"INSERT INTO `{DEPENDENCY_TABLE}` (Anal_Table, Product_ID, Ref_Kind, Ref_Key) "
+                              "VALUES (:Anal_Table, :Product_ID, :Ref_Kind, :Ref_Key)"),
+                         rows.to_dict("records"))
+
+# Products of each analysis table computed from any of the given keys of a reference table
+def dependents(anal_engine, ref_table: str, keys: Iterable) -> Dict[str, Set[str]]:
+    if ref_table not in REFERENCE_TABLES:
+        raise ValueError(f"Unknown reference table '{ref_table}', expected one of {list(REFERENCE_TABLES)}")
+    keys = sorted({str(k) for k in keys})
+    if not keys:
+        return {}
+    params = {"keys": keys}
+    df = pd.read_sql(expanding(f"SELECT DISTINCT Anal_Table, Product_ID FROM `{DEPENDENCY_TABLE}` "
+                               "WHERE Ref_Kind = :kind AND Ref_Key IN :keys", params),
+                     anal_engine, params={"kind": REFERENCE_TABLES[ref_table], **params})
+    return {t: set(g["Product_ID"].astype(str)) for t, g in df.groupby("Anal_Table")}
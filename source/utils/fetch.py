@@ -0,0 +1,146 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+
+#----------------------------------------------------------------------------------------#
+#                                 PROJECTED SELECTS
+#----------------------------------------------------------------------------------------#
+
+# SELECT list for a projection, returning spatial columns as WKT under their own names
+def select_list(columns: Iterable[str], spatial: Iterable[str] = ()) -> str:
+    spatial = set(spatial)
+    return ", ".join(f"ST_AsText(`{c}`) AS `{c}`" if c in spatial else f"`{c}`" for c in columns)
+
+# Rows of `table` (a quoted, optionally schema-qualified name) whose `pk` is one of `keys`,
+# read in IN lists of `chunksize` keys, e.g. the rows an upsert is about to compare against
+def fetch_by_keys(engine, table: str, columns: Iterable[str], pk: str, keys: Iterable,
+                  chunksize: int = 1000) -> pd.DataFrame:
+    columns, keys = list(columns), list(dict.fromkeys(keys))
+    sql = text(f"SELECT {select_list(columns)} FROM {table} WHERE `{pk}` IN :keys").bindparams(
+        bindparam("keys", expanding=True))
+    frames = [pd.read_sql(sql, engine, params={"keys": keys[i:i + chunksize]})
+              for i in range(0, len(keys), chunksize)]
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+# Approximate bytes a fetched frame took on the wire: text lengths plus 8 bytes per scalar
+def payload_bytes(df: pd.DataFrame) -> int:
+    total = 0
+    for col in df.columns:
+        s = df[col].dropna()
+        if s.dtype == object:
+            total += int(s.astype(str).str.len().sum())
+        else:
+            total += 8 * len(s)
+    return total
+
+def _mb(n: float) -> str:
+    return f"{n / 1e6:.2f} MB"
+
+
+#----------------------------------------------------------------------------------------#
+#                                   TRANSFER LOG
+#----------------------------------------------------------------------------------------#
+
+class TransferLog:
+    """
+    Tallies bytes fetched per table against what a SELECT * of the same table would have
+    moved. The SELECT * figure is the table's DATA_LENGTH from information_schema, read once
+    per run, so the comparison costs a single metadata query rather than a second fetch.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.before = 0
+        self.after = 0
+        self._sizes: Optional[Dict[str, int]] = None
+
+    def _table_size(self, table: str) -> Optional[int]:
+        if self._sizes is None:
+            rows = pd.read_sql(
+                text("SELECT TABLE_NAME, DATA_LENGTH FROM information_schema.TABLES "
+                     "WHERE TABLE_SCHEMA = :db"),
+                self.engine, params={"db": self.engine.url.database})
+            self._sizes = dict(zip(rows["TABLE_NAME"], rows["DATA_LENGTH"].fillna(0).astype(int)))
+        return self._sizes.get(table)
+
+    # Record one projected fetch and log its size next to the full-table estimate
+    def record(self, table: str, df: pd.DataFrame):
+        after = payload_bytes(df)
+        before = max(self._table_size(table) or 0, after)
+        self.before += before
+        self.after += after
+        print(f"[io] {table}: {len(df.columns)} cols, ~{_mb(before)} -> {_mb(after)}")
+
+    def summary(self) -> str:
+        saved = 1 - self.after / self.before if self.before else 0.0
+        return f"~{_mb(self.before)} -> {_mb(self.after)} ({saved:.0%} less)"
+
+
+#----------------------------------------------------------------------------------------#
+#                                   TABLE SNAPSHOTS
+#----------------------------------------------------------------------------------------#
+
+class TableSnapshots:
+    """
+    Run-scoped frames per table, so a table read (or written) by one stage is served from
+    memory to the later stages. A request for columns the snapshot lacks re-fetches the
+    union of what is held and what is asked for. Frames the loader upserts are merged in
+    place by primary key, the way ON DUPLICATE KEY UPDATE changes the table.
+    """
+    def __init__(self):
+        self.frames: Dict[Hashable, pd.DataFrame] = {}
+        self.hits = 0
+        self.misses = 0
+
+    # Columns from the snapshot of `key`, calling fetch(columns) when they are not all held
+    def get(self, key: Hashable, columns: List[str], fetch: Callable[[List[str]], pd.DataFrame]) -> pd.DataFrame:
+        cached = self.frames.get(key)
+        if cached is not None and set(columns) <= set(cached.columns):
+            self.hits += 1
+            return cached[columns].copy()
+        self.misses += 1
+        held = list(cached.columns) if cached is not None else []
+        df = fetch(list(dict.fromkeys([*held, *columns])))
+        self.frames[key] = df
+        return df[columns].copy()
+
+    # Rows of the snapshot of `key` whose pk is in `keys`, or None unless it holds `columns` and
+    # every one of those keys (rows it holds are as the table stores them: read or written this run)
+    def rows(self, key: Hashable, columns: List[str], pk: str, keys: Iterable) -> Optional[pd.DataFrame]:
+        cached = self.frames.get(key)
+        if cached is None or not set(columns) <= set(cached.columns):
+            return None
+        held = cached[pk].astype(str)
+        wanted = pd.Index(list(keys)).astype(str)
+        if not wanted.isin(held).all():
+            return None
+        self.hits += 1
+        return cached.loc[held.isin(wanted).to_numpy(), columns].copy()
+
+    # Apply an upsert of df (keyed by pk) to the snapshot of `key`
+    def put(self, key: Hashable, df: pd.DataFrame, pk: str):
+        cached = self.frames.get(key)
+        if cached is None:
+            self.frames[key] = df.reset_index(drop=True).copy()
+            return
+        # Columns the upsert leaves alone keep their current values on updated rows
+        untouched = [c for c in cached.columns if c not in df.columns]
+        if untouched:
+            df = df.merge(cached[[pk, *untouched]], on=pk, how="left")
+        kept = cached[~cached[pk].isin(df[pk])]
+        order = list(dict.fromkeys([*cached.columns, *df.columns]))
+        # An empty remainder would turn the new columns' dtypes into object on concat
+        merged = pd.concat([kept, df], ignore_index=True) if len(kept) else df.reset_index(drop=True).copy()
+        self.frames[key] = merged.reindex(columns=order)
+
+    def summary(self) -> str:
+        return f"{len(self.frames)} tables held, {self.hits} hits / {self.misses} misses"
@@ -5,22 +5,53 @@
 # import connector and packages
 from __future__ import annotations
 from typing import List, Tuple, Optional, Any, Callable, Dict
-from shapely import wkt
-from shapely.errors import DimensionError
-import re, math
+import math
 from collections import Counter
+import numpy as np
+import pandas as pd
+from utils.geometry import AXIS_INDEX, PLANE_AXES, RaggedCoords, decode_wkt, derive, parse_geometry
 
 
 # Registry for dynamic formula lookup
 FORMULA_REGISTRY: Dict[str, Callable[..., Any]] = {}
 
-def register_formula(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
-    """Decorator to register a formula under a given name."""
+# Registry for column-at-a-time implementations, keyed by the same formula name
+BATCH_REGISTRY: Dict[str, Callable[..., Any]] = {}
+
+# Write-time string formats for formulas whose batch version returns (a, b) pairs
+PAIR_FORMATS: Dict[str, str] = {}
+
+def register_formula(name: str, batch: Optional[Callable[..., Any]] = None,
+                     pair_format: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator to register a formula under a given name. An optional batch implementation,
+    taking whole columns (NumPy arrays or Series) in the same argument order, is registered
+    alongside it and preferred by the loaders. A batch implementation that returns numeric
+    (a, b) pairs names the string format the pairs are stored in, applied at write time.
+    """
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         FORMULA_REGISTRY[name] = func
+        if batch is not None:
+            BATCH_REGISTRY[name] = batch
+        if pair_format is not None:
+            PAIR_FORMATS[name] = pair_format
         return func
     return decorator
 
+# Coerce a column (or scalar) to float64, mapping None to NaN
+def as_float(values: Any) -> Any:
+    return np.asarray(values, dtype=float)
+
+# Object column of (a, b) tuples from two equal-length arrays
+def as_pairs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    out = np.empty(len(a), dtype=object)
+    out[:] = list(zip(a.tolist(), b.tolist()))
+    return out
+
+# Format a pair column for storage; values already formatted (scalar path) pass through
+def format_pairs(values: Any, fmt: str) -> List[Any]:
+    return [fmt.format(*v) if isinstance(v, tuple) else v for v in values]
+
 
 #----------------------------------------------------------------------------------------#
 #                                  HELPER FUNCTIONS
@@ -28,73 +59,38 @@ def register_formula(name: str) -> Callable[[Callable[..., Any]], Callable[...,
 
 # Convert a POINT WKT string to a list of (x, y, z) tuples
 def parse_pointz(wkt_str: str) -> List[Tuple[float, float, float]]:
-    # Shapley interprets all 2D and 3D POINTs the same, so a third empty dim must be added.
-    geom = wkt.loads(wkt_str)
-    if geom.geom_type.lower() != "point":
-        raise ValueError("Expected POINT geometry.")
-    try:
-        z = geom.z
-    except DimensionError:
-        z = 0.0
-    return [(geom.x, geom.y, z)]    
+    # 2D POINTs get a zero third dim
+    return [tuple(p) for p in decode_wkt(wkt_str, "POINT", 3).tolist()]
 
 # Convert a MULTIPOINT Z WKT string to a list of (x, y, z) tuples
 def parse_multipointz(wkt_str: str) -> List[Tuple[float, float, float]]:
-    # Shapley normalizes any mulitpoint with extra dims (Z, M, or ZM) the same way
-
-    geom = wkt.loads(wkt_str)
-    if geom.geom_type.lower() != "multipoint":
-        raise ValueError("Expected MULTIPOINTZ geometry.")
-    return [(pt.x, pt.y, getattr(pt, "z", 0.0)) for pt in geom.geoms]
+    # Any extra M dim is dropped, and 2D multipoints get a zero Z
+    return [tuple(p) for p in decode_wkt(wkt_str, "MULTIPOINT", 3).tolist()]
 
 # Parse MULTIPOINT ZM WKT into list of (x, y, z, m=theta)
 def parse_multipointzm(wkt_str: str) -> List[Tuple[float, float, float, float]]:
-    _RE_NUM = r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?"
-    nums = re.findall(_RE_NUM, wkt_str)
-    if len(nums) % 4 != 0:
-        raise ValueError("Expected quadruples (x y z m) in the WKT.")
-    vals = list(map(float, nums))
-    return [(vals[i], vals[i+1], vals[i+2], vals[i+3]) for i in range(0, len(vals), 4)]
+    return [tuple(p) for p in decode_wkt(wkt_str, "MULTIPOINT", 4).tolist()]
+
+# Embed 2D (a, b) coords into 3D based on the plane (XY, XZ, or YZ), leaving the missing axis at 0
+def embed_in_plane(coords2d: np.ndarray, zone_plane: str) -> np.ndarray:
+    plane = zone_plane.upper()
+    if plane not in PLANE_AXES:
+        raise ValueError(f"Unknown zone_plane: {zone_plane}")
+    triples = np.zeros((len(coords2d), 3))
+    triples[:, list(PLANE_AXES[plane])] = coords2d[:, :2]
+    return triples
 
 # Parse a 2D POLYGON WKT and embed it into 3D coords based on the plane (XY, XZ, or YZ)
 def parse_polygon_zones(polygon_wkt: str, zone_plane: str) -> list[tuple[float,float,float]]:
-    geom = wkt.loads(polygon_wkt)
-    if geom.geom_type.lower() != "polygon":
-        raise ValueError("Expected POLYGON geometry.")
-    coords2d = list(geom.exterior.coords)
-    plane = zone_plane.upper()
-    triples = []
     # Shapley treats every vertex as (x, y) with no z - so convert to a triple
-    for x2, y2 in coords2d:
-        if plane == "XY":
-            triples.append((x2, y2, 0.0))
-        elif plane == "XZ":
-            triples.append((x2, 0.0, y2))
-        elif plane == "YZ":
-            triples.append((0.0, x2, y2))
-        else:
-            raise ValueError(f"Unknown zone_plane: {zone_plane}")
-    return triples
+    coords2d = parse_geometry(polygon_wkt, "polygon").coords
+    return [tuple(p) for p in embed_in_plane(coords2d, zone_plane).tolist()]
 
 # Parse 2D LINESTRING and embed it into 3D coords based on the plane (XY, XZ, or YZ)
 def parse_linestring_zones(linestring_wkt: str, zone_plane: str) -> List[Tuple[float, float, float]]:
-    geom = wkt.loads(linestring_wkt)
-    if geom.geom_type.lower() != "linestring":
-        raise ValueError("Expected LINESTRING geometry.")
-    coords2d = list(geom.coords)
-    plane = zone_plane.upper()
-    triples: List[Tuple[float, float, float]] = []
     # Shapley treats all linestrings (2D or 3D) the same (e.g. including Z or ZM).
-    for x2, y2 in coords2d:
-        if plane == "XY":
-            triples.append((x2, y2, 0.0))
-        elif plane == "XZ":
-            triples.append((x2, 0.0, y2))
-        elif plane == "YZ":
-            triples.append((0.0, x2, y2))
-        else:
-            raise ValueError(f"Unknown zone_plane: {zone_plane}")
-    return triples
+    coords2d = parse_geometry(linestring_wkt, "linestring").coords
+    return [tuple(p) for p in embed_in_plane(coords2d, zone_plane).tolist()]
 
 # Get the max-min span along 'x', 'y', or 'z'
 def extent_along_axis(coords: List[Tuple[float, float, float]], axis: str) -> float:
@@ -102,12 +98,60 @@ def extent_along_axis(coords: List[Tuple[float, float, float]], axis: str) -> fl
     vals = [c[idx] for c in coords]
     return max(vals) - min(vals)
 
-# Get the dimensions of a polygon along a specified axis
+# Get the max-min span of a MULTIPOINT Z geometry along 'x', 'y', or 'z', decoded once per run
+def geometry_extent(wkt_str: str, axis: str) -> float:
+    return parse_geometry(wkt_str, "multipointz").extent(axis)
+
+# Per-element max-min spans of a whole MULTIPOINT Z column along 'x', 'y', or 'z'
+def geometry_extent_batch(wkt_values: Any, axis: str) -> np.ndarray:
+    return RaggedCoords.from_wkt(wkt_values, "multipointz").extent(axis)
+
+# Get the dimensions of a polygon along a specified axis - zero for the axis the plane doesn't span
 def zone_extent(polygon_wkt: str, zone_plane: str, axis: str) -> float:
-    coords3d = parse_polygon_zones(polygon_wkt, zone_plane)
-    idx = {"x":0,"y":1,"z":2}[axis.lower()]
-    vals = [c[idx] for c in coords3d]
-    return max(vals) - min(vals)
+    plane = zone_plane.upper()
+    if plane not in PLANE_AXES:
+        raise ValueError(f"Unknown zone_plane: {zone_plane}")
+    idx = AXIS_INDEX[axis.lower()]
+    if idx not in PLANE_AXES[plane]:
+        return 0.0
+    geom = parse_geometry(polygon_wkt, "polygon")
+    j = PLANE_AXES[plane].index(idx)
+    return float(geom.maxs[j] - geom.mins[j])
+
+# 2D spans (max - min per coordinate) of a set of polygons
+def polygon_spans(shapes: RaggedCoords) -> np.ndarray:
+    return shapes.maxs() - shapes.mins()
+
+"""
+Zone extents for a whole Zone_Coords column: the polygon spans (kept per polygon in the run's
+geometry cache, as the three zone formulas read them in turn) are scattered onto x/y/z through
+each row's plane, giving an (n, 3) array with NaN on the axis a plane doesn't span. Where
+totals are given (axis -> parent element total), those NaNs fall back to the parent total, as
+the scalar zone formulas do. Rows whose plane is not XY/XZ/YZ raise only when an axis they name
+is asked for, again matching the scalar path; a missing plane (factorize code -1) raises for
+every axis.
+"""
+def zone_dimensions(polygon_wkt: Any, zone_plane: Any, totals: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    codes, planes = pd.factorize(pd.Series(np.asarray(zone_plane, dtype=object)).str.upper())
+    span = derive(polygon_wkt, "polygon", "polygon_spans", polygon_spans)
+    # Plane remap as an axis permutation: row i's two spans land on axes plane_axes[i]. The
+    # per-plane arrays end with an entry for missing planes, which code -1 picks up.
+    known = np.array([p in PLANE_AXES for p in planes] + [False], dtype=bool)
+    table = np.array([PLANE_AXES.get(p, (0, 1)) for p in planes] + [(0, 1)], dtype=np.int64)
+    rows = np.flatnonzero(known[codes]) if len(codes) else np.empty(0, dtype=np.int64)
+    ext = np.full((len(codes), 3), np.nan)
+    ext[rows[:, None], table[codes[rows]]] = span[rows]
+
+    out = ext.copy()
+    for axis, total in (totals or {}).items():
+        idx = AXIS_INDEX[axis]
+        names = np.array([axis.upper() in p for p in planes] + [True], dtype=bool)   # plane names the axis
+        wants = names[codes] if len(codes) else np.zeros(0, dtype=bool)
+        bad = wants & np.isnan(ext[:, idx])
+        if bad.any():
+            raise ValueError(f"Unknown zone_plane: {np.asarray(zone_plane, dtype=object)[bad][0]}")
+        out[:, idx] = np.where(wants, ext[:, idx], as_float(total))
+    return out
 
 # Typical density values for common concrete types in kg/m^3
 DENSITY_MAP: Dict[str, float] = {
@@ -124,50 +168,74 @@ DENSITY_MAP: Dict[str, float] = {
 #                                  GEOMETRIC PROPERTIES
 #----------------------------------------------------------------------------------------#
 
+# Batch versions of the element totals - one decode pass over the whole Coords_XYZ column
+def total_height_mm_batch(wkt_str: Any) -> np.ndarray:
+    return geometry_extent_batch(wkt_str, "z")
+
+def total_length_mm_batch(wkt_str: Any) -> np.ndarray:
+    return geometry_extent_batch(wkt_str, "x")
+
+def total_width_mm_batch(wkt_str: Any) -> np.ndarray:
+    return geometry_extent_batch(wkt_str, "y")
+
+def total_thickness_mm_batch(wkt_str: Any, element: str) -> np.ndarray:
+    if element.lower() != "wall":
+        return np.full(len(wkt_str), np.nan)
+    return geometry_extent_batch(wkt_str, "y")
+
+def d_a_mm_batch(wkt_str: Any, element: str) -> np.ndarray:
+    if element.lower() != "column":
+        return np.full(len(wkt_str), np.nan)
+    return geometry_extent_batch(wkt_str, "x")
+
+def d_b_mm_batch(wkt_str: Any, element: str) -> np.ndarray:
+    if element.lower() != "column":
+        return np.full(len(wkt_str), np.nan)
+    return geometry_extent_batch(wkt_str, "y")
+
 # Total element height in mm
-@register_formula("total_height_mm")
+@register_formula("total_height_mm", batch=total_height_mm_batch)
 def total_height_mm(wkt_str: str) -> float:
-    coords = parse_multipointz(wkt_str)
-    return extent_along_axis(coords, "z")
+    return geometry_extent(wkt_str, "z")
 
 # Total element length in mm
-@register_formula("total_length_mm")
+@register_formula("total_length_mm", batch=total_length_mm_batch)
 def total_length_mm(wkt_str: str) -> float:
-    coords = parse_multipointz(wkt_str)
-    return extent_along_axis(coords, "x")
+    return geometry_extent(wkt_str, "x")
 
 # Total element width in mm - all elements except walls
-@register_formula("total_width_mm")
+@register_formula("total_width_mm", batch=total_width_mm_batch)
 def total_width_mm(wkt_str: str) -> Optional[float]:
-    coords = parse_multipointz(wkt_str)
-    return extent_along_axis(coords, "y")
+    return geometry_extent(wkt_str, "y")
 
 # Total wall thickness in mm - used for wall elements only
-@register_formula("total_thickness_mm")
+@register_formula("total_thickness_mm", batch=total_thickness_mm_batch)
 def total_thickness_mm(wkt_str: str, element: str) -> Optional[float]:
     if element.lower() != "wall":
         return None
-    coords = parse_multipointz(wkt_str)
-    return extent_along_axis(coords, "y")
+    return geometry_extent(wkt_str, "y")
 
 # First 'a' diameter of an elliptical column
-@register_formula("d_a_mm")
+@register_formula("d_a_mm", batch=d_a_mm_batch)
 def d_a_mm(wkt_str: str, element: str) -> Optional[float]:
     if element.lower() != "column":
         return None
-    coords = parse_multipointz(wkt_str)
-    return extent_along_axis(coords, "x")
+    return geometry_extent(wkt_str, "x")
 
 # Second 'b' diameter of an elliptical column
-@register_formula("d_b_mm")
+@register_formula("d_b_mm", batch=d_b_mm_batch)
 def d_b_mm(wkt_str: str, element: str) -> Optional[float]:
     if element.lower() != "column":
         return None
-    coords = parse_multipointz(wkt_str)
-    return extent_along_axis(coords, "y")
+    return geometry_extent(wkt_str, "y")
+
+# Density in kg/m^3 based on concrete type - batch version
+def density_kgm3_batch(concrete_type: Any) -> np.ndarray:
+    types = pd.Series(np.asarray(concrete_type, dtype=object))
+    return types.map(DENSITY_MAP).fillna(2400).to_numpy(dtype=float)
 
 # Density in kg/m^3 based on concrete type
-@register_formula("density_kgm3")
+@register_formula("density_kgm3", batch=density_kgm3_batch)
 def density_kgm3(concrete_type: str) -> float:
     return DENSITY_MAP.get(concrete_type, 2400)  # default to Normal if missing
 
@@ -197,27 +265,41 @@ def element_volume_m3(wkt_str: str, element: str, corb_volume_m: float = 0.0, vo
 
     return base_vol
     
+# Total element mass in kg - batch version
+def element_mass_kg_batch(volume: Any, density: Any) -> np.ndarray:
+    return as_float(volume) * as_float(density)
+
 # Total element mass in kg
-@register_formula("element_mass_kg")
+@register_formula("element_mass_kg", batch=element_mass_kg_batch)
 def element_mass_kg(volume: float, density: float) -> float:
     return volume * density
 
+# Zone extents in mm - batch versions, all three read from one zone_dimensions pass
+def zone_length_mm_batch(polygon_wkt: Any, zone_plane: Any, total_length_mm: Any) -> np.ndarray:
+    return zone_dimensions(polygon_wkt, zone_plane, {"x": total_length_mm})[:, 0]
+
+def zone_height_mm_batch(polygon_wkt: Any, zone_plane: Any, total_height_mm: Any) -> np.ndarray:
+    return zone_dimensions(polygon_wkt, zone_plane, {"z": total_height_mm})[:, 2]
+
+def zone_width_mm_batch(polygon_wkt: Any, zone_plane: Any, total_width_mm: Any) -> np.ndarray:
+    return zone_dimensions(polygon_wkt, zone_plane, {"y": total_width_mm})[:, 1]
+
 # Zone length in mm - if zone_plane includes X, use polygon extent along X; otherwise use total_length_mm
-@register_formula("zone_length_mm")
+@register_formula("zone_length_mm", batch=zone_length_mm_batch)
 def zone_length_mm(polygon_wkt: str, zone_plane: str, total_length_mm: float) -> float:
     if "X" in zone_plane.upper():
         return zone_extent(polygon_wkt, zone_plane, "x")
     return total_length_mm
 
 # Zone height in mm - if zone_plane includes Z, use polygon extent along z; otherwise use total_height_mm
-@register_formula("zone_height_mm")
+@register_formula("zone_height_mm", batch=zone_height_mm_batch)
 def zone_height_mm(polygon_wkt: str, zone_plane: str, total_height_mm: float) -> float:
     if "Z" in zone_plane.upper():
         return zone_extent(polygon_wkt, zone_plane, "z")
     return total_height_mm
 
 # Zone width in mm - if zone_plane includes Y, use polygon extent along Y; otherwise use total_width_mm
-@register_formula("zone_width_mm")
+@register_formula("zone_width_mm", batch=zone_width_mm_batch)
 def zone_width_mm(polygon_wkt: str, zone_plane: str, total_width_mm: float) -> float:
     if "Y" in zone_plane.upper():
         return zone_extent(polygon_wkt, zone_plane, "y")
@@ -228,66 +310,129 @@ def zone_width_mm(polygon_wkt: str, zone_plane: str, total_width_mm: float) -> f
 #                              CORBEL GEOMETRIC PROPERTIES
 #----------------------------------------------------------------------------------------#
 
+"""
+Corbel descriptor: every corbel column is derived from one fixed-width record per corbel,
+so a batch decodes each Corb_Coords_XYZ once instead of once per column. Within a run the
+records are kept in the geometry cache, as the corbel formulas run back to back on them.
+"""
+CORBEL_RECORD = np.dtype([("mins", float, 3), ("maxs", float, 3), ("rect_blk_h", float), ("tri_blk_h", float)])
+
+# Corbel records (axis extremes and block heights) of a set of corbel shapes
+def build_corbel_records(shapes: RaggedCoords) -> np.ndarray:
+    rec = np.empty(len(shapes), dtype=CORBEL_RECORD)
+    rec["mins"], rec["maxs"] = shapes.mins(), shapes.maxs()
+    zs = shapes.top_levels("z", 2)            # top of corbel and bottom of its rectangular block
+    two = ~np.isnan(zs[:, 1])
+    rec["rect_blk_h"] = np.where(two, zs[:, 0] - zs[:, 1], 0.0)
+    rec["tri_blk_h"] = np.where(two, zs[:, 1] - rec["mins"][:, 2], 0.0)
+    return rec
+
+# Corbel records for a whole column of corbels
+def corbel_records(corb_wkt: Any) -> np.ndarray:
+    return derive(corb_wkt, "multipointz", "corbel_records", build_corbel_records)
+
+# Index of the in-plane axis a corbel is extruded along: x for XZ, y otherwise
+def corbel_axis(extruded_plane: Any) -> np.ndarray:
+    return np.where(pd.Series(np.asarray(extruded_plane, dtype=object)).str.upper().eq("XZ").to_numpy(), 0, 1)
+
+# Corbel depth in mm - batch version
+def corb_depth_mm_batch(corb_wkt: Any) -> np.ndarray:
+    rec = corbel_records(corb_wkt)
+    return rec["maxs"][:, 1] - rec["mins"][:, 1]
+
 # Corbel depth in mm
-@register_formula("corb_depth_mm")
+@register_formula("corb_depth_mm", batch=corb_depth_mm_batch)
 def corb_depth_mm(corb_wkt: str) -> float:
     # Corbel depth (out-of-plane thickness) = Y-extent of corbel multipoint.
-    coords = parse_multipointz(corb_wkt)
-    return extent_along_axis(coords, "y")
+    return geometry_extent(corb_wkt, "y")
+
+# Corbel length in mm - batch version
+def corb_length_mm_batch(corb_wkt: Any, extruded_plane: Any) -> np.ndarray:
+    rec, rows = corbel_records(corb_wkt), np.arange(len(corb_wkt))
+    idx = corbel_axis(extruded_plane)
+    return rec["maxs"][rows, idx] - rec["mins"][rows, idx]
 
 # Corbel length in mm
-@register_formula("corb_length_mm")
+@register_formula("corb_length_mm", batch=corb_length_mm_batch)
 def corb_length_mm(corb_wkt: str, extruded_plane: str) -> float: 
-    coords = parse_multipointz(corb_wkt)
     axis = "x" if extruded_plane.upper() == "XZ" else "y"
-    return extent_along_axis(coords, axis)
+    return geometry_extent(corb_wkt, axis)
+
+# Corbel midpoint along X in mm - batch version
+def corb_midpoint_mm_batch(corb_wkt: Any, extruded_plane: Any) -> np.ndarray:
+    rec, rows = corbel_records(corb_wkt), np.arange(len(corb_wkt))
+    idx = corbel_axis(extruded_plane)
+    hi, lo = rec["maxs"][rows, idx], rec["mins"][rows, idx]
+    return hi - ((hi - lo) / 2)
 
 # Corbel midpoint along X in mm
-@register_formula("corb_midpoint_mm")
+@register_formula("corb_midpoint_mm", batch=corb_midpoint_mm_batch)
 def corb_midpoint_mm(corb_wkt: str, extruded_plane: str) -> float:
-    coords = parse_multipointz(corb_wkt)
+    geom = parse_geometry(corb_wkt, "multipointz")
     axis = "x" if extruded_plane.upper() == "XZ" else "y"
     idx = {"x": 0, "y": 1}[axis]
-    values = [c[idx] for c in coords]
-    length = max(values) - min(values)
-    return max(values) - (length / 2)
+    length = geom.maxs[idx] - geom.mins[idx]
+    return float(geom.maxs[idx] - (length / 2))
+
+# Distance from top of element to corbel bottom in mm - batch version
+def corb_dist_from_top_mm_batch(parent_wkt: Any, corb_wkt: Any) -> np.ndarray:
+    return geometry_extent_batch(parent_wkt, "z") - corbel_records(corb_wkt)["maxs"][:, 2]
 
 # Distance from top of element to corbel bottom in mm
-@register_formula("corb_dist_from_top_mm")
+@register_formula("corb_dist_from_top_mm", batch=corb_dist_from_top_mm_batch)
 def corb_dist_from_top_mm(parent_wkt: str, corb_wkt: str) -> float:
     parent_height = total_height_mm(parent_wkt)
-    coords = parse_multipointz(corb_wkt)
-    zmax = max(c[2] for c in coords)
-    return parent_height - zmax
+    zmax = parse_geometry(corb_wkt, "multipointz").maxs[2]
+    return float(parent_height - zmax)
+
+# Height of rectangular block component in mm - batch version
+def rect_blk_height_mm_batch(corb_wkt: Any) -> np.ndarray:
+    return corbel_records(corb_wkt)["rect_blk_h"].copy()
 
 # Height of rectangular block component in mm
-@register_formula("rect_blk_height_mm")
+@register_formula("rect_blk_height_mm", batch=rect_blk_height_mm_batch)
 def rect_blk_height_mm(corb_wkt: str) -> float:
-    coords = parse_multipointz(corb_wkt)
-    zs = sorted({z for (_, _, z) in coords}, reverse=True)
+    coords = parse_geometry(corb_wkt, "multipointz").coords
+    zs = sorted(set(coords[:, 2].tolist()), reverse=True)
     if len(zs) < 2:
         return 0.0
     return zs[0] - zs[1]
 
+# Height of triangular block component in mm - batch version
+def tri_blk_height_mm_batch(corb_wkt: Any) -> np.ndarray:
+    return corbel_records(corb_wkt)["tri_blk_h"].copy()
+
 # Height of triangular block component in mm
-@register_formula("tri_blk_height_mm")
+@register_formula("tri_blk_height_mm", batch=tri_blk_height_mm_batch)
 def tri_blk_height_mm(corb_wkt: str) -> float:
-    coords = parse_multipointz(corb_wkt)
-    zs = sorted({z for (_, _, z) in coords}, reverse=True)
+    coords = parse_geometry(corb_wkt, "multipointz").coords
+    zs = sorted(set(coords[:, 2].tolist()), reverse=True)
     if len(zs) < 2:
         return 0.0
     bottom_of_rect = zs[1]
     min_z = zs[-1]
     return bottom_of_rect - min_z
 
+# Horizontal offset of corbel midpoint from element centerline in mm - batch version
+def centerHoffset_mm_batch(midpoint_mm: Any, total_length_mm: Any) -> np.ndarray:
+    return as_float(midpoint_mm) - (as_float(total_length_mm) / 2)
+
 # Horizontal offset of corbel midpoint from element centerline in mm
-@register_formula("centerHoffset_mm")
+@register_formula("centerHoffset_mm", batch=centerHoffset_mm_batch)
 def centerHoffset_mm(midpoint_mm: float, total_length_mm: float) -> float:
     return midpoint_mm - (total_length_mm / 2)
 
 
+# Corbel volume in m3 - batch version
+def corb_volume_m3_batch(corb_depth_mm: Any, corb_length_mm: Any, rect_blk_height_mm: Any, tri_blk_height_mm: Any) -> np.ndarray:
+    depth_m = as_float(corb_depth_mm) / 1000
+    length_m = as_float(corb_length_mm) / 1000
+    tri_volume = 0.5 * depth_m * (as_float(tri_blk_height_mm) / 1000) * length_m
+    rect_volume = depth_m * (as_float(rect_blk_height_mm) / 1000) * length_m
+    return tri_volume + rect_volume
+
 # Corbel volume in m3 - specifically for a rectangular+triangular geometry
-@register_formula("corb_volume_m3")
+@register_formula("corb_volume_m3", batch=corb_volume_m3_batch)
 def corb_volume_m3(corb_depth_mm: float, corb_length_mm: float, rect_blk_height_mm: float, tri_blk_height_mm: float,) -> float:
     # Simplified approximation - does not account for recesses. 
     # Alternatively, use the TIN Z shell attribute to calculate volume.
@@ -296,8 +441,12 @@ def corb_volume_m3(corb_depth_mm: float, corb_length_mm: float, rect_blk_height_
     return tri_volume + rect_volume
 
 
+# Corbel mass in kg - batch version
+def corb_mass_kg_batch(corb_volume_m3: Any, density_kgm3: Any) -> np.ndarray:
+    return as_float(corb_volume_m3) * as_float(density_kgm3)
+
 # Corbel mass in kg
-@register_formula("corb_mass_kg")
+@register_formula("corb_mass_kg", batch=corb_mass_kg_batch)
 def corb_mass_kg(corb_volume_m3: float, density_kgm3: float) -> float:
     return corb_volume_m3 * density_kgm3
 
@@ -307,53 +456,75 @@ def corb_mass_kg(corb_volume_m3: float, density_kgm3: float) -> float:
 #                          VOID PROPERTIES - WALLS AND SOLID SLABS
 #----------------------------------------------------------------------------------------#
 
+# Batch versions of the void dimensions - one decode pass over the whole Void_Coords_XYZ column
+def baseVoffset_mm_batch(void_wkt: Any) -> np.ndarray:
+    return RaggedCoords.from_wkt(void_wkt, "multipointz").mins()[:, 2]
+
+def void_center_mm_batch(void_wkt: Any) -> np.ndarray:
+    voids = RaggedCoords.from_wkt(void_wkt, "multipointz")
+    return (voids.mins()[:, 0] + voids.maxs()[:, 0]) / 2
+
+def void_height_mm_batch(void_wkt: Any, element: str) -> np.ndarray:
+    axis = {"wall": "z", "slab": "y"}.get(element.lower())
+    if axis is None: # Other element types don't have voids
+        raise ValueError(f"Unknown element type: {element.lower()}")
+    return geometry_extent_batch(void_wkt, axis)
+
+def void_length_mm_batch(void_wkt: Any) -> np.ndarray:
+    return geometry_extent_batch(void_wkt, "x")
+
+def void_depth_mm_batch(void_wkt: Any, element: str) -> np.ndarray:
+    axis = {"wall": "y", "slab": "z"}.get(element.lower())
+    if axis is None: # Other element types don't have voids
+        raise ValueError(f"Unknown element type: {element.lower()}")
+    return geometry_extent_batch(void_wkt, axis)
+
 # Void base vertical offset in mm - min Z
-@register_formula("baseVoffset_mm")
+@register_formula("baseVoffset_mm", batch=baseVoffset_mm_batch)
 def baseVoffset_mm(void_wkt: str) -> float:
-    coords = parse_multipointz(void_wkt)
-    return min(z for (_, _, z) in coords)
+    return float(parse_geometry(void_wkt, "multipointz").mins[2])
 
 # Void horizontal center in mm
-@register_formula("void_center_mm")
+@register_formula("void_center_mm", batch=void_center_mm_batch)
 def void_center_mm(void_wkt: str) -> float:
     # Voids in both walls and solid slabs run horizontally in x 
-    coords = parse_multipointz(void_wkt)
-    xs = [x for (x, _, _) in coords]
-    return (min(xs) + max(xs)) / 2
+    geom = parse_geometry(void_wkt, "multipointz")
+    return float(geom.mins[0] + geom.maxs[0]) / 2
 
 # Void height in mm
-@register_formula("void_height_mm")
+@register_formula("void_height_mm", batch=void_height_mm_batch)
 def void_height_mm(void_wkt: str, element: str) -> float:
-    coords = parse_multipointz(void_wkt)
     elem = element.lower()
     if elem == "wall":
-        return extent_along_axis(coords, "z")
+        return geometry_extent(void_wkt, "z")
     elif elem == "slab":
-        return extent_along_axis(coords, "y")
+        return geometry_extent(void_wkt, "y")
     else: # Other element types don't have voids
         raise ValueError(f"Unknown element type: {elem}")
 
 # Void length in mm
-@register_formula("void_length_mm")
+@register_formula("void_length_mm", batch=void_length_mm_batch)
 def void_length_mm(void_wkt: str) -> float:
     # Voids in both walls and solid slabs run horizontally in x 
-    coords = parse_multipointz(void_wkt)
-    return extent_along_axis(coords, "x")
+    return geometry_extent(void_wkt, "x")
 
 # Void depth in mm
-@register_formula("void_depth_mm")
+@register_formula("void_depth_mm", batch=void_depth_mm_batch)
 def void_depth_mm(void_wkt: str, element: str) -> Optional[float]:
-    coords = parse_multipointz(void_wkt)
     elem = element.lower()
     if elem == "wall":
-        return extent_along_axis(coords, "y")
+        return geometry_extent(void_wkt, "y")
     elif elem == "slab":
-        return extent_along_axis(coords, "z")
+        return geometry_extent(void_wkt, "z")
     else: # Other element types don't have voids
         raise ValueError(f"Unknown element type: {elem}")
 
+# Void volume in m3 - batch version
+def void_volume_m3_batch(length_mm: Any, depth_mm: Any, height_mm: Any) -> np.ndarray:
+    return (as_float(length_mm) / 1000) * (as_float(depth_mm) / 1000) * (as_float(height_mm) / 1000)
+
 # Void volume in m3 - approximated as a uniform rectangular prism
-@register_formula("void_volume_m3")
+@register_formula("void_volume_m3", batch=void_volume_m3_batch)
 def void_volume_m3(length_mm: float, depth_mm: float, height_mm: float) -> float:
     return (length_mm / 1000) * (depth_mm / 1000) * (height_mm / 1000)
 
@@ -390,8 +561,12 @@ def bar_length_mm(linestring_wkt: str, zone_plane: str) -> float:
         length += math.dist(p0, p1) 
     return length
 
+# Total cross-sectional area of all bars in the layer in mm2 - batch version
+def bar_area_mm2_batch(bar_diam_mm: Any, num_bars: Any) -> np.ndarray:
+    return math.pi * (as_float(bar_diam_mm) ** 2) / 4 * as_float(num_bars)
+
 # Total cross-sectional area of all bars in the layer in mm2
-@register_formula("bar_area_mm2")
+@register_formula("bar_area_mm2", batch=bar_area_mm2_batch)
 def bar_area_mm2(bar_diam_mm: float, num_bars: int) -> float:
     area_single = math.pi * (bar_diam_mm ** 2) / 4
     return area_single * num_bars
@@ -415,14 +590,55 @@ def effective_depth_mm(linestring_wkt: str, zone_plane: str, zone_height_mm: flo
 #                           TRANSVERSE REINFORCEMENT PROPERTIES
 #----------------------------------------------------------------------------------------#
 
-"""
-Estimate number of legs along both axes of the bent plane. Returns a string "(n1,n2)".
-This estimate uses the bent angle 'theta' to determine if a segment is anchored or not, 
-and counts the number of anchored segments along each axis in the plane. 
-"""
-@register_formula("num_legs")
-def num_legs(stirrup_wkt: str, bent_plane: str) -> str:
-    pts = parse_multipointzm(stirrup_wkt)
+# Upper-cased bent planes of a column of stirrups, each checked to name two of X, Y and Z
+# (checked once per distinct value)
+def bent_planes(bent_plane: Any) -> pd.Series:
+    codes, uniques = pd.factorize(np.asarray(bent_plane, dtype=object))
+    upper = [p.upper() if isinstance(p, str) else None for p in uniques]
+    if (codes < 0).any() or not all(p is not None and len(p) == 2 and all(c in "XYZ" for c in p) for p in upper):
+        raise ValueError("Invalid bent_plane.")
+    return pd.Series(np.array(upper, dtype=object)[codes])
+
+# Leg counts (legsA, legsB) for every stirrup of a column at once, as integer arrays
+def num_legs_counts(shapes: RaggedCoords, bent_plane: Any) -> Tuple[np.ndarray, np.ndarray]:
+    planes = bent_planes(bent_plane)
+    axis_idx = {"X": 0, "Y": 1, "Z": 2}
+    seg = shapes.segment_ids
+    idxA = planes.str[0].map(axis_idx).to_numpy(dtype=np.int64)[seg]
+    idxB = planes.str[1].map(axis_idx).to_numpy(dtype=np.int64)[seg]
+
+    # Each point paired with the next one around the closed loop
+    pts = shapes.values
+    nxt = shapes.loop_next()
+    rows = np.arange(len(pts))
+    anchored = (pts[:, 3] != 0) & (pts[nxt, 3] != 0)
+    deltaA = np.abs(pts[rows, idxA] - pts[nxt, idxA])
+    deltaB = np.abs(pts[rows, idxB] - pts[nxt, idxB])
+    alongA = deltaA > deltaB
+
+    legsA = shapes.segment_sum((anchored & alongA).astype(float)).astype(np.int64)
+    legsB = shapes.segment_sum((anchored & ~alongA).astype(float)).astype(np.int64)
+    return np.maximum(1, legsA), np.maximum(1, legsB) # ensure at least one leg
+
+# Leg counts for a column of stirrups, shared by num_legs and the ratio: kept in the run's geometry
+# cache per stirrup shape and bent plane, so each is counted once per run
+def stirrup_legs(stirrup_wkt: Any, bent_plane: Any) -> Tuple[np.ndarray, np.ndarray]:
+    planes = bent_planes(bent_plane)
+    stirrups = np.asarray(stirrup_wkt, dtype=object)
+    legs = np.empty((len(planes), 2), dtype=np.int64)
+    for plane in planes.unique():
+        rows = (planes == plane).to_numpy()
+        count = lambda shapes: np.column_stack(num_legs_counts(shapes, np.full(len(shapes), plane, dtype=object)))
+        legs[rows] = derive(stirrups[rows], "multipointzm", f"num_legs {plane}", count).reshape(-1, 2)
+    return legs[:, 0], legs[:, 1]
+
+# Number of legs for a whole column of stirrups - batch version returning (n1, n2) integer pairs
+def num_legs_batch(stirrup_wkt: Any, bent_plane: Any) -> np.ndarray:
+    return as_pairs(*stirrup_legs(stirrup_wkt, bent_plane))
+
+# Leg counts (legsA, legsB) of one stirrup
+def leg_counts(stirrup_wkt: str, bent_plane: str) -> Tuple[int, int]:
+    pts = [tuple(p) for p in parse_geometry(stirrup_wkt, "multipointzm").coords.tolist()]
     plane = bent_plane.upper()
     if len(plane) != 2 or any(c not in "XYZ" for c in plane):
         raise ValueError("Invalid bent_plane.")
@@ -450,23 +666,53 @@ def num_legs(stirrup_wkt: str, bent_plane: str) -> str:
             if anchored: # oriented along B axis
                 legsB += 1
 
-    legsA = max(1, legsA) # ensure at least one leg
-    legsB = max(1, legsB)
+    return max(1, legsA), max(1, legsB) # ensure at least one leg
+
+"""
+Estimate number of legs along both axes of the bent plane. Returns a string "(n1,n2)".
+This estimate uses the bent angle 'theta' to determine if a segment is anchored or not, 
+and counts the number of anchored segments along each axis in the plane. 
+"""
+@register_formula("num_legs", batch=num_legs_batch, pair_format="({},{})")
+def num_legs(stirrup_wkt: str, bent_plane: str) -> str:
+    legsA, legsB = leg_counts(stirrup_wkt, bent_plane)
     return f"({legsA},{legsB})"
 
+# Transverse volumetric ratios for a whole column of stirrups - batch version returning (rho1, rho2) pairs
+def volumetric_ratio_mm3_batch(stirrup_wkt: Any, bent_plane: Any, element: str, cross_section: Any,
+                               stirrup_diam_mm: Any, stirrup_spacing_mm: Any, zone_width_mm: Any,
+                               da_mm: Any = None, db_mm: Any = None) -> np.ndarray:
+    legsA, legsB = stirrup_legs(stirrup_wkt, bent_plane)
+    d, s = as_float(stirrup_diam_mm), as_float(stirrup_spacing_mm)
+
+    # Rectangular cross-sections
+    area_leg = math.pi * (d**2) / 4                       # mm2 per leg
+    concrete_per_mm = as_float(zone_width_mm) * s         # mm3 per mm length
+    rhoA = (legsA * area_leg) / concrete_per_mm
+    rhoB = (legsB * area_leg) / concrete_per_mm
+
+    # Elliptical cross-sections: single hoop rho, duplicated
+    sections = pd.Series(np.broadcast_to(np.asarray(cross_section, dtype=object), legsA.shape))
+    ell = (element.lower() == "column") & sections.str.lower().eq("elliptical").to_numpy()
+    if ell.any():
+        if da_mm is None or db_mm is None or np.isnan(as_float(da_mm)[ell]).any() or np.isnan(as_float(db_mm)[ell]).any():
+            raise ValueError("Elliptical column needs da_mm and db_mm.")
+        da, db = as_float(da_mm)[ell], as_float(db_mm)[ell]
+        P_e = math.pi * (3*(da/2 + db/2) - np.sqrt((3*da/2 + db)*(da/2 + 3*db)))
+        rho = (d[ell]**2 * P_e) / (s[ell] * da * db)
+        rhoA, rhoB = rhoA.copy(), rhoB.copy()
+        rhoA[ell] = rhoB[ell] = rho
+    return as_pairs(rhoA, rhoB)
+
 """
 Compute the transverse volumetric ratio for both axes of the stirrup using the number of legs for rectangular sections,
 and the hoop formula for elliptical cross-sections, returning (rho1,rho2).
 """
-@register_formula("volumetric_ratio_mm3")
+@register_formula("volumetric_ratio_mm3", batch=volumetric_ratio_mm3_batch, pair_format="({:.6f},{:.6f})")
 def volumetric_ratio_mm3(stirrup_wkt: str, bent_plane: str, element: str, cross_section: Optional[str], 
                          stirrup_diam_mm: float, stirrup_spacing_mm: float, zone_width_mm: float, 
                          da_mm: Optional[float] = None, db_mm: Optional[float] = None) -> float: 
-    legs_str = FORMULA_REGISTRY["num_legs"](stirrup_wkt, bent_plane)  # e.g. "(2,3)"
-    m = re.match(r"\(\s*(\d+)\s*,\s*(\d+)\s*\)", legs_str)
-    if not m:
-        raise ValueError(f"Invalid num_legs format: {legs_str}")
-    legsA, legsB = int(m.group(1)), int(m.group(2))
+    legsA, legsB = leg_counts(stirrup_wkt, bent_plane)
 
     # Elliptical cross-sections
     elem = element.lower()
@@ -496,8 +742,13 @@ def volumetric_ratio_mm3(stirrup_wkt: str, bent_plane: str, element: str, cross_
 #                           PRESTRESSING REINFORCEMENT PROPERTIES
 #----------------------------------------------------------------------------------------#
 
+# Prestressing tendon area in mm2 - batch version
+def tendon_area_mm2_batch(strand_diam: Any, num_wires: Any) -> np.ndarray:
+    d_wire = as_float(strand_diam) / 3
+    return math.pi * (d_wire ** 2) / 4 * as_float(num_wires)
+
 # Prestressing tendon area in mm2
-@register_formula("tendon_area_mm2")
+@register_formula("tendon_area_mm2", batch=tendon_area_mm2_batch)
 def tendon_area_mm2(strand_diam: float, num_wires: float) -> float:
     d_wire = strand_diam / 3
     A_wire = math.pi * (d_wire ** 2) / 4
@@ -505,9 +756,8 @@ def tendon_area_mm2(strand_diam: float, num_wires: float) -> float:
 
 @register_formula("tendon_eff_depth_mm")
 def tendon_eff_depth_mm(tendon_wkt: float, slab_height: float) -> float:
-    pts = parse_pointz(tendon_wkt)
-    _, y, _ = pts[0]
-    return slab_height - y
+    _, y, _ = parse_geometry(tendon_wkt, "pointz").coords[0]
+    return float(slab_height - y)
 
 
 
@@ -515,8 +765,36 @@ def tendon_eff_depth_mm(tendon_wkt: float, slab_height: float) -> float:
 #                                BEAM CAPACITY CALCULATIONS
 #----------------------------------------------------------------------------------------#
 
+# Eurocode 2 bending resistance (positive sagging) - batch version over whole columns, same argument order
+def beam_bending_pos_kN_batch(fck_MPa: Any, fyk_MPa: Any, b_mm: Any, d_mm: Any, As1_mm2: Any, dp_mm: Any,
+                              As2_mm2: Any = 0.0, gamma_c: Any = 1.5, gamma_s: Any = 1.15, xi_max: Any = 0.45) -> np.ndarray:
+    fck, fyk, b, d = as_float(fck_MPa), as_float(fyk_MPa), as_float(b_mm), as_float(d_mm)
+    As1, dp, As2 = as_float(As1_mm2), as_float(dp_mm), as_float(As2_mm2)
+
+    # Design strengths
+    alpha_cc = 0.85
+    f_cd = alpha_cc * fck / as_float(gamma_c)
+    f_yd = fyk / as_float(gamma_s)
+
+    # Internal steel forces
+    T_steel = As1 * f_yd
+    C_steel = As2 * f_yd
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Neutral-axis depth x, capped at xi_max * d
+        x = (T_steel - C_steel) / (0.68 * b * f_cd)
+        x = np.minimum(x, as_float(xi_max) * d)
+
+        # Lever arms and moment capacity [N·mm] → [kN·m]
+        z_c = d - 0.32 * x
+        z_s = d - dp
+        M_Rd_Nmm = 0.68 * f_cd * b * x * z_c + (C_steel * z_s)
+
+    # Section over-reinforced or no tension steel
+    return np.where(T_steel <= 0, 0.0, np.round(M_Rd_Nmm / 1e6, 3))
+
 # Eurocode 2 bending resistance (positive sagging) of a rectangular beam. Returns M_rd in kN·m.
-@register_formula("beam_bending_pos_kN")
+@register_formula("beam_bending_pos_kN", batch=beam_bending_pos_kN_batch)
 def beam_bending_pos_kN(
     fck_MPa: float,                    # concrete characteristic strength [MPa]
     fyk_MPa: float,                    # steel characteristic yield strength [MPa]
@@ -1,7 +1,9 @@
 # Import packages
 import pandas as pd
 import numpy as np
-from scipy.spatial import ConvexHull # For TIN Z triangulation
+from scipy.spatial import ConvexHull, QhullError # For TIN Z triangulation
+from operator import itemgetter
+from utils.blocks import split_blocks
 
 
 
@@ -26,99 +28,123 @@ def skip_empty_sheet(fn):
             return [], [], None
     return wrapper
 
+# WKT layout of every geometry kind written by the core loaders (kind names as in
+# utils/geometry.WKT_KINDS): opening text, coordinates per point, point text, closing text, and
+# whether the ring is closed by repeating its first point
+WKT_LAYOUTS = {
+    "point": ("POINT(", 2, "%s %s", ")", False),
+    "pointz": ("POINT Z (", 3, "%s %s %s", ")", False),
+    "linestring": ("LINESTRING(", 2, "%s %s", ")", False),
+    "polygon": ("POLYGON((", 2, "%s %s", "))", True),
+    "multipointz": ("MULTIPOINT Z (", 3, "(%s %s %s)", ")", False),
+    "multipointzm": ("MULTIPOINT ZM (", 4, "(%s %s %s %s)", ")", False),
+}
+
+# WKT strings for a whole column of geometries, each a sequence of points (tuples, lists or array
+# rows), each geometry's points joined once. Every value is printed with str() of its own type,
+# nothing is cast to a common dtype: 1500 stays "1500" and 1500.0 stays "1500.0", even within
+# one geometry. The mixed int/float text is intentional - it is byte-identical to what the
+# loaders always wrote, and MySQL reads both spellings as the same coordinate.
+def format_wkt(coords_list, kind):
+    head, dims, point, tail, closed = WKT_LAYOUTS[kind]
+    pick = itemgetter(*range(dims))
+    point_text = point.__mod__
+    wkt_list = []
+    for coords in coords_list:
+        points = list(map(point_text, map(pick, coords)))
+        if closed:
+            points.append(point_text(pick(coords[0]))) # IndexError on an empty ring
+        # An empty geometry keeps what the old += builders left: the opening text less ", "
+        wkt_list.append(head + ", ".join(points) + tail if points else head[:-2] + ")")
+    return wkt_list
+
+
 # Reformat coordinates into WKT POINT datatype
 def format_point(coords):
-    # Construct the POINT string
-    point_str = "POINT("
-    for coord in coords:
-        point_str += f"{coord[0]} {coord[1]}, "
-
-    # Remove the trailing comma and space, then close the POINT
-    point_str = point_str[:-2] + ")"
-    return point_str
+    return format_wkt([coords], "point")[0]
 
 
 # Reformat coordinates into WKT POINTZ datatype
 def format_pointz(coords):
-    # Construct the POINTZ strings for each coordinate
-    pointz_list = []
-    for coord in coords:
-        pointz_str = f"POINT Z ({coord[0]} {coord[1]} {coord[2]})"
-        pointz_list.append(pointz_str)
-    
-    return pointz_list
+    return format_wkt([[coord] for coord in coords], "pointz")
 
 
 # Reformat coordinates into WKT LINESTRING datatype
 def format_linestr(coords):
-    # Construct the LINESTRING string
-    linestring_str = "LINESTRING("
-    for coord in coords:
-        linestring_str += f"{coord[0]} {coord[1]}, "
+    return format_wkt([coords], "linestring")[0]
 
-    # Remove the trailing comma and space, then close the LINESTRING
-    linestring_str = linestring_str[:-2] + ")"
-    return linestring_str
+
+# Text of every coordinate in a frame, one Series per column, as the format_* functions print
+# them. Rows are read in the frame's common dtype (like apply(axis=1)), so an integer column next
+# to a float column prints as floats ("1500.0"), while an all-integer frame prints "1500". As in
+# format_wkt, this mixed int/float output is intentional: it matches what the loaders wrote.
+def coord_text(frame):
+    text = frame.to_numpy().astype(str)
+    return [pd.Series(text[:, i], index=frame.index, dtype=object) for i in range(text.shape[1])]
 
 
 # Reformat coordinates into WKT MULTIPOINTM datatype
 def format_multipointzm(coords_list):
-    multipointzm_list = []
-    for coords in coords_list:
-        pt_str = "MULTIPOINT ZM ("
-        for x, y, z, m in coords:
-            pt_str += f"({x} {y} {z} {m}), "
-        pt_str = pt_str[:-2] + ")"
-        multipointzm_list.append(pt_str)
-    return multipointzm_list
+    return format_wkt(coords_list, "multipointzm")
 
 
 # Reformat coordinates into WKT MULTIPOINTZ datatype
 def format_multipointz(coords_list):
-    multipointz_list = []
-    for coords in coords_list:
-        point_str = "MULTIPOINT Z ("
-        for coord in coords:
-            point_str += f"({coord[0]} {coord[1]} {coord[2]}), "
-        point_str = point_str[:-2] + ")"  # Remove the trailing comma and space, then close the MULTIPOINTZ
-        multipointz_list.append(point_str)
-    return multipointz_list
+    return format_wkt(coords_list, "multipointz")
 
 
 # Reformat coordinates into WKT POLYGON datatype
 def format_polygon(coords):
-    # Construct the WKT POLYGON strings for each row
-    wkt_polygons = []
-    for row_coords in coords:
-        polygon_str = "POLYGON(("
-        for coord in row_coords:
-            polygon_str += f"{coord[0]} {coord[1]}, "
-        # Close the polygon by repeating the first coordinate
-        first_coord = row_coords[0]
-        polygon_str += f"{first_coord[0]} {first_coord[1]}))"
-        wkt_polygons.append(polygon_str)
-    return wkt_polygons
-
-
-# Reformat coordinates into WKT TIN Z strings
+    return format_wkt(coords, "polygon")
+
+
+# Facets of a flat point set (all points in one plane, so Qhull finds no volume): the convex
+# polygon it spans in its best-fit plane, fanned into vertex index triples. No facets for a set
+# spanning no plane (fewer than three points, or all on a line).
+def flat_facets(pts_arr):
+    if len(pts_arr) < 3:
+        return []
+    centred = pts_arr.astype(float) - pts_arr.astype(float).mean(axis=0)
+    in_plane = np.linalg.svd(centred, full_matrices=False)[2][:2] # two main directions of the set
+    try:
+        ring = ConvexHull(centred @ in_plane.T).vertices.tolist() # counter-clockwise
+    except QhullError:
+        return []
+    return [(ring[0], ring[i], ring[i + 1]) for i in range(1, len(ring) - 1)]
+
+
+# Reformat coordinates into WKT TIN Z strings. Runs of identical products share one point set, so
+# each distinct set is triangulated once: sets are keyed by the array the hull is built from
+# (dtype, shape and bytes - 1500 and 1500.0 print differently, so they are different shapes).
 def format_tinz(coords_list):
+    shells = {}
     tinz_list = []
-    # print(coords_list) # For debugging
+    built = flat = 0
     for pts in coords_list:
         pts_arr = np.array(pts)
-        
-        
-        hull = ConvexHull(pts_arr)
-        triangles = []
-        for simplex in hull.simplices:
-            # simplex is a triple of indices into pts_arr
-            tri = pts_arr[simplex]
-            # close the ring by repeating the first point
-            coords = list(tri) + [tuple(tri[0])]
-            ring = ", ".join(f"{x} {y} {z}" for x, y, z in coords)
-            triangles.append(f"(({ring}))")
-        wkt = "TIN Z (" + ", ".join(triangles) + ")"
+        key = (pts_arr.dtype.str, pts_arr.shape, pts_arr.tobytes()) if pts_arr.dtype.kind in "iuf" else None
+        wkt = shells.get(key)
+        if wkt is None:
+            built += 1
+            try:
+                facets = ConvexHull(pts_arr).simplices.tolist()
+            except QhullError: # flat or degenerate element: keep loading, triangulate what it spans
+                facets = flat_facets(pts_arr)
+                flat += 1
+
+            # Text of each vertex once (tolist gives scalars that print like the array's), then each
+            # facet - a triple of vertex indices - as a ring closed by repeating its first vertex
+            vertices = list(map("%s %s %s".__mod__, map(tuple, pts_arr.tolist())))
+            triangles = ["((%s, %s, %s, %s))" % (vertices[a], vertices[b], vertices[c], vertices[a])
+                         for a, b, c in facets]
+            wkt = "TIN Z (" + ", ".join(triangles) + ")" if triangles else "TIN Z EMPTY"
+            if key is not None:
+                shells[key] = wkt
         tinz_list.append(wkt)
+
+    if tinz_list:
+        print(f"[tin] {len(tinz_list)} shells from {built} distinct point sets "
+              f"({len(tinz_list) / built:.1f}x dedupe)" + (f", {flat} flat or degenerate" if flat else ""))
     return tinz_list
 
 
@@ -162,70 +188,30 @@ def convert_to_3d_element(front_array, side_array, plan_array):
     return all_elements
 
 
-# Define the transverse reinforcement shape by creating lists of arrays
+# Transverse shape layout per bent plane: sheet columns of the two in-plane coordinates and the
+# bend angle, and the axes (x=0, y=1, z=2) the coordinates go to (the third one stays 0)
+SHAPE_PLANES = {
+    "YZ": ([10, 11, 8], (1, 2)),
+    "XY": ([9, 10, 8], (0, 1)),
+    "XZ": ([9, 11, 8], (0, 2)),
+}
+
+# Define the transverse reinforcement shape by creating lists of arrays: the (x, y, z, theta)
+# points of every reinforcement design (Blocks of the sheet), in the plane named on its first row
 def create_shape_arrays(wallTrnvRF_wksh, reinf_index):
-    shape_array = []
-
-    # Iterate over each pair of indices in reinf_index
-    for i in range(len(reinf_index) - 1):
-        start_index = reinf_index[i]
-        end_index = reinf_index[i + 1]
-
-        # Get the Bent_Plane value for the start_index
-        bent_plane = wallTrnvRF_wksh.at[start_index, 'Bent Plane']
-
-        # Determine the columns based on the Bent_Plane value
-        if bent_plane == 'YZ':
-            cols = [10, 11, 8]
-        elif bent_plane == 'XY':
-            cols = [9, 10, 8]
-        elif bent_plane == 'XZ':
-            cols = [9, 11, 8]
-        else:
+    planes = wallTrnvRF_wksh["Bent Plane"].to_numpy()[reinf_index.rows]
+    for bent_plane in planes:
+        if bent_plane not in SHAPE_PLANES:
             raise ValueError(f"Invalid Bent_Plane value '{bent_plane}'")
 
-        raw = []
-        for idx in range(start_index, end_index):
-            raw.append(tuple(wallTrnvRF_wksh.iloc[idx, cols]))  # (a, b, theta)
-
-        # inject the missing coord → (x,y,z,m)
-        zm = []
-        for a, b, theta in raw:
-            if bent_plane == 'YZ':
-                x, y, z = 0, a, b
-            elif bent_plane == 'XY':
-                x, y, z = a, b, 0
-            else:  # 'XZ'
-                x, y, z = a, 0, b
-            zm.append((x, y, z, theta))
-
-        shape_array.append(zm)
-
-    final_index = reinf_index[-1]
-    bent_plane  = wallTrnvRF_wksh.at[final_index, 'Bent Plane']
-    if bent_plane == 'YZ':
-        cols = [10, 11, 8]
-    elif bent_plane == 'XY':
-        cols = [9,  10, 8]
-    elif bent_plane == 'XZ':
-        cols = [9,  11, 8]
-    else:
-        raise ValueError(f"Invalid Bent_Plane value '{bent_plane}'")
-
-    raw = []
-    for idx in range(final_index, len(wallTrnvRF_wksh)):
-        raw.append(tuple(wallTrnvRF_wksh.iloc[idx, cols]))
-
-    zm = []
-    for a, b, theta in raw:
-        if bent_plane == 'YZ':
-            x, y, z = 0, a, b
-        elif bent_plane == 'XY':
-            x, y, z = a, b, 0
-        else:
-            x, y, z = a, 0, b
-        zm.append((x, y, z, theta))
-
-    shape_array.append(zm)
-
-    return shape_array
\ No newline at end of file
+    # Inject the missing coordinate: fill each row's points from the plane of its design
+    row_plane = planes[reinf_index.ids]
+    points = np.zeros((len(wallTrnvRF_wksh), 4), dtype=object)
+    for bent_plane, (cols, axes) in SHAPE_PLANES.items():
+        rows = (row_plane == bent_plane) & (reinf_index.ids >= 0)
+        raw = wallTrnvRF_wksh.iloc[:, cols].to_numpy()[rows] # (a, b, theta)
+        points[rows, axes[0]] = raw[:, 0]
+        points[rows, axes[1]] = raw[:, 1]
+        points[rows, 3] = raw[:, 2]
+
+    return split_blocks(points, reinf_index)
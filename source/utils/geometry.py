@@ -0,0 +1,383 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from contextlib import contextmanager
+import re
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import wkt
+
+
+#----------------------------------------------------------------------------------------#
+#                                 FAST-PATH WKT DECODER
+#----------------------------------------------------------------------------------------#
+
+"""
+The core layer only writes a handful of WKT types (MULTIPOINT Z/ZM, POINT, POLYGON, LINESTRING
+and TIN Z), so coordinates are read straight off the text: check the header, blank out the
+brackets and commas, and convert the remaining tokens to float in one NumPy call. Anything the
+fast path doesn't recognise (EMPTY, holes, odd tokens, other types) falls back to Shapely.
+"""
+
+# Geometry kinds read by the formulas: WKT type and the coordinate width returned
+WKT_KINDS: Dict[str, Tuple[str, int]] = {
+    "pointz": ("POINT", 3),
+    "multipointz": ("MULTIPOINT", 3),
+    "multipointzm": ("MULTIPOINT", 4),
+    "polygon": ("POLYGON", 2),
+    "linestring": ("LINESTRING", 2),
+    "tinz": ("TIN", 3),
+}
+
+_RE_HEADER = re.compile(r"^\s*([A-Za-z]+)\s*(ZM|Z|M)?\s*\(", re.IGNORECASE)
+_RE_FIRST_COORD = re.compile(r"\(\s*([^(),]+?)\s*[,)]")
+_RE_RING_BREAK = re.compile(r"\)\s*,\s*\(")
+_TAG_DIMS: Dict[str, int] = {"Z": 3, "M": 3, "ZM": 4}
+_WKT_STRIP = str.maketrans("(),", "   ")
+
+
+# Split a WKT string into (numeric tokens, native coordinate width), or None if the fast path can't read it
+def _wkt_tokens(wkt_str: str, geom_type: str) -> Optional[Tuple[List[str], int]]:
+    m = _RE_HEADER.match(wkt_str)
+    if m is None or m.group(1).upper() != geom_type:
+        return None
+    body = wkt_str[m.end() - 1:]
+    # Polygons are read by their exterior ring only, so rings with holes go through Shapely
+    if geom_type == "POLYGON" and _RE_RING_BREAK.search(body):
+        return None
+    tag = (m.group(2) or "").upper()
+    if tag:
+        dims = _TAG_DIMS[tag]
+    else:
+        first = _RE_FIRST_COORD.search(body)
+        if first is None:
+            return None
+        dims = len(first.group(1).split())
+    tokens = body.translate(_WKT_STRIP).split()
+    if dims < 2 or not tokens or len(tokens) % dims:
+        return None
+    return tokens, dims
+
+# Pad (with zeros) or truncate native coordinates to the requested width
+def _fit_dims(coords: np.ndarray, dims: Optional[int]) -> np.ndarray:
+    if dims is None or coords.shape[1] == dims:
+        return coords
+    out = np.zeros((len(coords), dims))
+    keep = min(dims, coords.shape[1])
+    out[:, :keep] = coords[:, :keep]
+    return out
+
+# Shapely fallback for input the fast path doesn't recognise
+def _decode_with_shapely(wkt_str: str, geom_type: str) -> np.ndarray:
+    geom = wkt.loads(wkt_str)
+    if geom.geom_type.upper() != geom_type:
+        raise ValueError(f"Expected {geom_type} geometry.")
+    if geom_type == "POLYGON":
+        geom = geom.exterior
+    return shapely.get_coordinates(geom, include_z=geom.has_z)
+
+# Decode one WKT string into an (n_points, dims) float64 array
+def decode_wkt(wkt_str: str, geom_type: str, dims: Optional[int] = None) -> np.ndarray:
+    parsed = _wkt_tokens(wkt_str, geom_type)
+    if parsed is not None:
+        tokens, native = parsed
+        try:
+            coords = np.array(tokens, dtype=float).reshape(-1, native)
+        except ValueError:
+            coords = _decode_with_shapely(wkt_str, geom_type)
+    else:
+        coords = _decode_with_shapely(wkt_str, geom_type)
+    return _fit_dims(coords, dims)
+
+# Decode a whole column of WKT strings into one flat (N, dims) buffer plus offsets into it
+def decode_wkt_column(values: Iterable[str], geom_type: str, dims: int) -> Tuple[np.ndarray, np.ndarray]:
+    values = list(values)
+    tokens: List[str] = []
+    counts: List[int] = []
+    fallback: Dict[int, np.ndarray] = {}
+    for i, wkt_str in enumerate(values):
+        parsed = _wkt_tokens(wkt_str, geom_type)
+        if parsed is not None and parsed[1] == dims:
+            tokens.extend(parsed[0])
+            counts.append(len(parsed[0]) // dims)
+        else:   # other widths are padded/truncated, or decoded by Shapely
+            fallback[i] = decode_wkt(wkt_str, geom_type, dims)
+            counts.append(len(fallback[i]))
+
+    try:
+        fast = np.array(tokens, dtype=float).reshape(-1, dims)
+    except ValueError:   # a stray token somewhere - decode string by string instead
+        return decode_wkt_column_slow(values, geom_type, dims)
+
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    if not fallback:
+        return fast, offsets
+
+    # Splice the fallback geometries back in at their positions
+    flat = np.empty((offsets[-1], dims))
+    pos = 0
+    for i in range(len(counts)):
+        start, stop = offsets[i], offsets[i + 1]
+        if i in fallback:
+            flat[start:stop] = fallback[i]
+        else:
+            flat[start:stop] = fast[pos:pos + (stop - start)]
+            pos += stop - start
+    return flat, offsets
+
+# String-by-string variant of decode_wkt_column
+def decode_wkt_column_slow(values: Iterable[str], geom_type: str, dims: int) -> Tuple[np.ndarray, np.ndarray]:
+    parts = [decode_wkt(wkt_str, geom_type, dims) for wkt_str in values]
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in parts], out=offsets[1:])
+    flat = np.concatenate(parts) if parts else np.empty((0, dims))
+    return flat, offsets
+
+
+#----------------------------------------------------------------------------------------#
+#                                PARSED GEOMETRY CACHE
+#----------------------------------------------------------------------------------------#
+
+AXIS_INDEX: Dict[str, int] = {"x": 0, "y": 1, "z": 2}
+
+# 3D axis positions spanned by each 2D plane, in (a, b) order
+PLANE_AXES: Dict[str, Tuple[int, int]] = {"XY": (0, 1), "XZ": (0, 2), "YZ": (1, 2)}
+
+class ParsedGeometry(NamedTuple):
+    """Decoded coordinates of one WKT value, shape (n_points, n_dims), with per-axis min/max."""
+    coords: np.ndarray
+    mins: np.ndarray
+    maxs: np.ndarray
+
+    # Get the max-min span along 'x', 'y', or 'z'
+    def extent(self, axis: str) -> float:
+        idx = AXIS_INDEX[axis.lower()]
+        return float(self.maxs[idx] - self.mins[idx])
+
+
+# Wrap decoded coordinates into a ParsedGeometry
+def make_parsed(coords: np.ndarray, wkt_str: str) -> ParsedGeometry:
+    if coords.size == 0:
+        raise ValueError(f"Empty geometry: {wkt_str!r}")
+    return ParsedGeometry(coords, coords.min(axis=0), coords.max(axis=0))
+
+# Decode a WKT string of the given kind (see WKT_KINDS) into a ParsedGeometry
+def decode_geometry(wkt_str: str, kind: str) -> ParsedGeometry:
+    geom_type, dims = WKT_KINDS[kind]
+    return make_parsed(decode_wkt(wkt_str, geom_type, dims), wkt_str)
+
+
+class GeometryCache:
+    """
+    Run-scoped store of decoded WKT geometries, keyed by kind and WKT text. The same
+    text always decodes to the same coordinates, so an entry is shared by every formula
+    and every column (e.g. Coords_XYZ merged into the corbel frame) that reads it. Values
+    derived from the coordinates (corbel records, zone spans, stirrup legs) are kept the
+    same way, per geometry, so the formulas that share them build them once per run.
+    """
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], ParsedGeometry] = {}
+        self._derived: Dict[Tuple[str, str], Tuple[Dict[str, int], np.ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, wkt_str: str, kind: str) -> ParsedGeometry:
+        key = (kind, wkt_str)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = decode_geometry(wkt_str, kind)
+            self._entries[key] = entry
+        else:
+            self.hits += 1
+        return entry
+
+    # Decode every value of a column not yet cached in one decoder pass
+    def prime(self, values: Iterable[str], kind: str) -> None:
+        geom_type, dims = WKT_KINDS[kind]
+        values = list(values)
+        missing = list(dict.fromkeys(v for v in values if (kind, v) not in self._entries))
+        self.hits += len(values) - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return
+        ragged = RaggedCoords(*decode_wkt_column(missing, geom_type, dims))
+        mins, maxs = ragged.mins(), ragged.maxs()
+        for i, wkt_str in enumerate(missing):
+            coords = ragged.values[ragged.offsets[i]:ragged.offsets[i + 1]]
+            self._entries[(kind, wkt_str)] = ParsedGeometry(coords, mins[i], maxs[i])
+
+    # Cached coordinates of distinct WKT values as one RaggedCoords
+    def ragged(self, values: Iterable[str], kind: str) -> "RaggedCoords":
+        values = list(values)
+        self.prime(values, kind)
+        parts = [self._entries[(kind, v)].coords for v in values]
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+        dims = WKT_KINDS[kind][1]
+        return RaggedCoords(np.concatenate(parts) if parts else np.empty((0, dims)), offsets)
+
+    # Rows derived from distinct WKT values under `name`: `build` maps a RaggedCoords of the
+    # values not seen yet to one row each, and is only called for those
+    def derived(self, values: List[str], kind: str, name: str,
+                build: Callable[["RaggedCoords"], np.ndarray]) -> np.ndarray:
+        positions, rows = self._derived.get((kind, name), ({}, None))
+        new = [v for v in values if v not in positions]
+        if new or rows is None:
+            built = build(self.ragged(new, kind))
+            start = 0 if rows is None else len(rows)
+            positions.update(zip(new, range(start, start + len(new))))
+            rows = built if rows is None else np.concatenate([rows, built])
+            self._derived[(kind, name)] = (positions, rows)
+        return rows[np.fromiter(map(positions.__getitem__, values), dtype=np.int64, count=len(values))]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def summary(self) -> str:
+        return f"{len(self)} geometries decoded, {self.hits} hits / {self.misses} misses"
+
+
+# Cache used by parse_geometry while a run is active
+_ACTIVE_CACHE: Optional[GeometryCache] = None
+
+@contextmanager
+def geometry_cache() -> Iterator[GeometryCache]:
+    """Activate a fresh geometry cache for the duration of a loader run."""
+    global _ACTIVE_CACHE
+    previous = _ACTIVE_CACHE
+    _ACTIVE_CACHE = GeometryCache()
+    try:
+        yield _ACTIVE_CACHE
+    finally:
+        _ACTIVE_CACHE = previous
+
+# Decode a WKT string through the active run cache, or directly when no run is active
+def parse_geometry(wkt_str: str, kind: str) -> ParsedGeometry:
+    if _ACTIVE_CACHE is None:
+        return decode_geometry(wkt_str, kind)
+    return _ACTIVE_CACHE.get(wkt_str, kind)
+
+# Distinct values of a WKT column and each row's position among them. factorize codes None/NaN
+# as -1, which would read as the last distinct value; the scalar formulas can't decode a missing
+# geometry either, so fail the same way.
+def factorize_geometries(values: Any, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    missing = np.flatnonzero(codes < 0)
+    if len(missing):
+        raise TypeError(f"Missing {kind} geometry at row {missing[0]}: {values[missing[0]]!r}")
+    return codes, uniques
+
+# One row per geometry of a WKT column derived from its coordinates by `build` (see
+# GeometryCache.derived), built once per distinct value and kept in the active run cache
+def derive(values: Any, kind: str, name: str, build: Callable[["RaggedCoords"], np.ndarray]) -> np.ndarray:
+    codes, uniques = factorize_geometries(values, kind)
+    if _ACTIVE_CACHE is None:
+        geom_type, dims = WKT_KINDS[kind]
+        distinct = build(RaggedCoords(*decode_wkt_column(uniques, geom_type, dims)))
+    else:
+        distinct = _ACTIVE_CACHE.derived(list(uniques), kind, name, build)
+    return distinct[codes]
+
+
+#----------------------------------------------------------------------------------------#
+#                                RAGGED COORDINATE ARRAYS
+#----------------------------------------------------------------------------------------#
+
+class RaggedCoords:
+    """
+    Point sets for a whole column of elements: one contiguous (N, dims) float64 buffer of
+    coordinates plus offsets, so element i owns values[offsets[i]:offsets[i + 1]].
+    """
+    def __init__(self, values: np.ndarray, offsets: np.ndarray):
+        self.values = np.ascontiguousarray(values, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    # Build from a column of WKT strings of the given kind, decoding each distinct value once
+    @classmethod
+    def from_wkt(cls, values: Any, kind: str) -> "RaggedCoords":
+        geom_type, dims = WKT_KINDS[kind]
+        codes, uniques = factorize_geometries(values, kind)
+        if _ACTIVE_CACHE is None:
+            distinct = cls(*decode_wkt_column(uniques, geom_type, dims))
+        else:   # serve (and fill) the run cache
+            distinct = _ACTIVE_CACHE.ragged(uniques, kind)
+        return distinct.take(codes)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    # Owning element of every point
+    @property
+    def segment_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    # New RaggedCoords holding the elements at the given positions (repeats allowed)
+    def take(self, indices: np.ndarray) -> "RaggedCoords":
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.lengths[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Shift each output position back to where its element starts in the source buffer
+        gather = np.arange(offsets[-1]) + np.repeat(self.offsets[:-1][indices] - offsets[:-1], lengths)
+        return RaggedCoords(self.values[gather], offsets)
+
+    # Per-element reduction with a ufunc (e.g. np.minimum), shape (n_elements, dims)
+    def _reduce(self, ufunc: np.ufunc) -> np.ndarray:
+        if len(self) == 0:
+            return np.empty((0, self.values.shape[1]))
+        if (self.lengths == 0).any():
+            raise ValueError("Empty geometry in column.")
+        return ufunc.reduceat(self.values, self.offsets[:-1], axis=0)
+
+    def mins(self) -> np.ndarray:
+        return self._reduce(np.minimum)
+
+    def maxs(self) -> np.ndarray:
+        return self._reduce(np.maximum)
+
+    # Per-element max-min span along 'x', 'y', or 'z'
+    def extent(self, axis: str) -> np.ndarray:
+        idx = AXIS_INDEX[axis.lower()]
+        return self.maxs()[:, idx] - self.mins()[:, idx]
+
+    # The n highest distinct values per element along 'x', 'y', or 'z', NaN where an element has fewer
+    def top_levels(self, axis: str, n: int) -> np.ndarray:
+        idx = AXIS_INDEX[axis.lower()]
+        seg, vals = self.segment_ids, self.values[:, idx]
+        order = np.lexsort((-vals, seg))          # by element, then descending value
+        v, s = vals[order], seg[order]
+        first = np.ones(len(v), dtype=bool)
+        first[1:] = (s[1:] != s[:-1]) | (v[1:] != v[:-1])
+        v, s = v[first], s[first]
+        rank = np.arange(len(v)) - np.searchsorted(s, s)   # position among the element's distinct values
+        out = np.full((len(self), n), np.nan)
+        keep = rank < n
+        out[s[keep], rank[keep]] = v[keep]
+        return out
+
+    # Index of the next point of every point, wrapping back to the first one per element (closed loops)
+    def loop_next(self) -> np.ndarray:
+        nxt = np.arange(1, len(self.values) + 1)
+        ends = self.offsets[1:][self.lengths > 0] - 1
+        nxt[ends] = self.offsets[:-1][self.lengths > 0]
+        return nxt
+
+    # Deltas from every point to the next one around its closed loop, shape (N, dims)
+    def loop_deltas(self) -> np.ndarray:
+        return self.values[self.loop_next()] - self.values
+
+    # Sum a per-point array into per-element totals
+    def segment_sum(self, per_point: np.ndarray) -> np.ndarray:
+        return np.bincount(self.segment_ids, weights=per_point, minlength=len(self))
@@ -0,0 +1,41 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Optional
+import pandas as pd
+
+
+#----------------------------------------------------------------------------------------#
+#                                REINFORCEMENT LAYERS
+#----------------------------------------------------------------------------------------#
+
+"""
+Capacity formulas take a section's reinforcement as two layers: the deepest (tensile, As1 at d)
+and the next one up (compressive, As2 at d'). A section with a single layer has no compressive
+steel: As2 = 0 and d' = 0, so the compressive term of the formulas drops out instead of turning
+the capacity into NaN.
+"""
+LAYER_COLUMNS = ("As1_mm2", "As2_mm2", "d_mm", "dp_mm")
+SINGLE_LAYER_DEFAULTS = {"As2_mm2": 0.0, "dp_mm": 0.0}
+
+# Tensile/compressive layer areas and depths per reinforcement design, in one pass over all
+# designs: rows are ranked by depth (deepest first; `tiebreak`, e.g. Long_ID, orders equal depths)
+# and the first two ranks are taken. Returns one row per `key` with LAYER_COLUMNS.
+def pivot_layers(df: pd.DataFrame, key: str = "Reinf_ID", area: str = "bar_area_mm2",
+                 depth: str = "effective_depth_mm", tiebreak: Optional[str] = None) -> pd.DataFrame:
+    by, ascending = [key, depth], [True, False]
+    if tiebreak is not None:
+        by.append(tiebreak)
+        ascending.append(True)
+    ranked = df.sort_values(by, ascending=ascending, kind="mergesort")
+    rank = ranked.groupby(key, sort=False).cumcount()
+
+    first = ranked[(rank == 0).to_numpy()].set_index(key)
+    second = ranked[(rank == 1).to_numpy()].set_index(key).reindex(first.index)
+    out = pd.DataFrame({"As1_mm2": first[area].astype(float), "As2_mm2": second[area].astype(float),
+                        "d_mm": first[depth].astype(float), "dp_mm": second[depth].astype(float)},
+                       index=first.index)
+    return out.fillna(SINGLE_LAYER_DEFAULTS).reset_index()
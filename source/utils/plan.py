@@ -0,0 +1,428 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+import hashlib
+import inspect
+import os
+import pickle
+import re
+import tempfile
+import yaml
+from utils.formulas import FORMULA_REGISTRY
+
+
+class PlanError(ValueError):
+    """Raised when a mapping has missing inputs, unknown formulas or dependency cycles."""
+
+
+#----------------------------------------------------------------------------------------#
+#                                   TABLE LAYOUTS
+#----------------------------------------------------------------------------------------#
+
+"""
+Where each mapped table's arguments can come from. A phys table reads source columns from
+its core tables, and computed columns from upstream phys tables. '{elt}' is replaced by the
+element's table prefix (Wall, Beam, Column, Slab, HCS).
+"""
+# Phys stage roles in default order: (role, table, elements the table applies to)
+PHYS_ROLES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("geometry", "{elt}_Geometry", ("wall", "beam", "column", "slab")),
+    ("panels", "Additional_Panelling", ("wall",)),
+    ("zones", "{elt}_Zone_Geometry", ("wall", "beam", "column", "slab")),
+    ("voids", "{elt}_Voids", ("wall", "slab")),
+    ("corbels", "Corbel_Geometry", ("wall", "beam", "column")),
+    ("long_reinf", "{elt}_Long_Reinf", ("wall", "beam", "column", "slab")),
+    ("transv_reinf", "{elt}_Transv_Reinf", ("wall", "beam", "column", "slab")),
+    ("prestressing", "HCS_Prestressing", ("hcs",)),
+]
+
+# Core tables each role reads source columns from
+PHYS_SOURCES: Dict[str, List[str]] = {
+    "geometry": ["{elt}_Geometry"],
+    "panels": ["Additional_Panelling"],
+    "zones": ["{elt}_Long_Reinf", "{elt}_Geometry"],
+    "voids": ["{elt}_Voids"],
+    "corbels": ["Corbel_Geometry", "{elt}_Geometry"],
+    "long_reinf": ["{elt}_Long_Reinf"],
+    "transv_reinf": ["{elt}_Transv_Reinf", "{elt}_Geometry"],
+    "prestressing": ["HCS_Prestressing", "HCS_Geometry"],
+}
+
+# Phys tables each role may read computed columns from
+PHYS_UPSTREAM: Dict[str, List[str]] = {
+    "geometry": ["Corbel_Geometry", "{elt}_Voids"],
+    "panels": [],
+    "zones": ["{elt}_Geometry"],
+    "voids": ["{elt}_Geometry"],
+    "corbels": ["{elt}_Geometry"],
+    "long_reinf": ["{elt}_Zone_Geometry"],
+    "transv_reinf": ["{elt}_Zone_Geometry", "{elt}_Geometry"],
+    "prestressing": [],
+}
+
+# Argument names the loader renames from an upstream column when merging it in
+PHYS_ALIASES: Dict[str, List[Tuple[str, str]]] = {
+    "corb_volume_m3": [("Corbel_Geometry", "volume_m3")],
+    "void_volume_m3": [("{elt}_Voids", "volume_m3")],
+    "zone_width_mm": [("{elt}_Zone_Geometry", "zone_thickness_mm")],
+    "total_length_mm": [("{elt}_Geometry", "total_depth_mm")],   # columns report length as depth
+}
+
+# Feature columns the analysis loader assembles before applying formulas
+ANAL_INPUTS: Dict[str, List[str]] = {
+    "Beam_Capacity": ["Product_ID", "Reinf_ID", "Strength_Class", "Steel_Grade",
+                      "fck_MPa", "fyk_MPa", "b_mm", "d_mm", "dp_mm", "As1_mm2", "As2_mm2"],
+}
+
+ELEMENTS: Tuple[str, ...] = ("wall", "beam", "column", "slab", "hcs")
+
+# Table-name prefix for an element, e.g. "wall" -> "Wall", "hcs" -> "HCS"
+def element_prefix(element: str) -> str:
+    return "HCS" if element.lower() == "hcs" else element.capitalize()
+
+
+#----------------------------------------------------------------------------------------#
+#                                   PLAN STRUCTURES
+#----------------------------------------------------------------------------------------#
+
+class ArgRef(NamedTuple):
+    """One resolved formula argument: where it comes from and its name in the stage frame."""
+    kind: str                   # "source", "upstream", "local" or "literal"
+    name: Any                   # frame column name (or the literal value)
+    table: Optional[str] = None # owning table for source/upstream/local columns
+    column: Optional[str] = None # column name in that table (differs from name for aliases)
+
+
+class ColumnStep(NamedTuple):
+    """One computed column: its formula, resolved arguments and calling convention."""
+    table: str
+    name: str
+    formula: str
+    args: Tuple[ArgRef, ...]
+    element_index: Optional[int]   # position of the 'element' parameter, if the formula takes one
+
+    @property
+    def needs_element(self) -> bool:
+        return self.element_index is not None
+
+    @property
+    def arg_names(self) -> List[Any]:
+        return [a.name for a in self.args]
+
+
+class Stage(NamedTuple):
+    """One evaluation pass over a table: batches of independent columns, in dependency order."""
+    role: str
+    table: str
+    pk: str
+    pass_index: int
+    batches: Tuple[Tuple[ColumnStep, ...], ...]
+    later_columns: Tuple[str, ...]  # columns of the table computed by a later pass
+
+    @property
+    def steps(self) -> List[ColumnStep]:
+        return [step for batch in self.batches for step in batch]
+
+    @property
+    def columns(self) -> List[str]:
+        return [step.name for step in self.steps]
+
+    # Source columns this stage reads, per core table
+    def sources(self) -> Dict[str, Set[str]]:
+        out: Dict[str, Set[str]] = {}
+        for step in self.steps:
+            for ref in step.args:
+                if ref.kind == "source":
+                    out.setdefault(ref.table, set()).add(ref.column)
+        return out
+
+    # Upstream computed columns this stage reads, per phys table, as {column: frame name}
+    def upstream(self) -> Dict[str, Dict[str, str]]:
+        out: Dict[str, Dict[str, str]] = {}
+        for step in self.steps:
+            for ref in step.args:
+                if ref.kind == "upstream":
+                    out.setdefault(ref.table, {})[ref.column] = ref.name
+        return out
+
+
+class ExecutionPlan(NamedTuple):
+    """Dependency-ordered stages for one element (or for the analysis layer)."""
+    element: Optional[str]
+    stages: Tuple[Stage, ...]
+    spatial: Dict[str, Tuple[str, ...]] = {}   # spatial source columns per core table
+    core_columns: Dict[str, Tuple[str, ...]] = {}   # all columns of each core table the plan reads
+    target_types: Dict[str, Dict[str, str]] = {}   # declared column types of each table the plan writes
+
+    def stage(self, table: str, pass_index: int = 0) -> Optional[Stage]:
+        for stage in self.stages:
+            if stage.table == table and stage.pass_index == pass_index:
+                return stage
+        return None
+
+    def tables(self) -> List[str]:
+        return list(dict.fromkeys(stage.table for stage in self.stages))
+
+    # Stage indexes grouped into phases: a stage reading phys rows another stage writes (an upstream
+    # table, or its own table's earlier pass) lands in a later phase than that stage
+    def phases(self) -> List[List[int]]:
+        phase: List[int] = []
+        for i, stage in enumerate(self.stages):
+            reads = set(stage.upstream()) | ({stage.table} if stage.pass_index > 0 else set())
+            before = [phase[j] for j, s in enumerate(self.stages[:i])
+                      if s.table in reads and (s.table != stage.table or s.pass_index < stage.pass_index)]
+            phase.append(1 + max(before) if before else 0)
+        return [[i for i, p in enumerate(phase) if p == k] for k in range(max(phase, default=-1) + 1)]
+
+    # Source columns every stage of the run reads from one core table
+    def source_columns(self, table: str) -> List[str]:
+        return sorted({c for stage in self.stages for c in stage.sources().get(table, ())})
+
+    def describe(self) -> str:
+        lines = []
+        for stage in self.stages:
+            batches = " | ".join(", ".join(step.name for step in batch) for batch in stage.batches)
+            lines.append(f"{stage.table} (pass {stage.pass_index}): {batches}")
+        return "\n".join(lines)
+
+
+#----------------------------------------------------------------------------------------#
+#                                   SCHEMA COLUMNS
+#----------------------------------------------------------------------------------------#
+
+_RE_CREATE = re.compile(r"CREATE TABLE(?: IF NOT EXISTS)?\s+(?:`[^`]+`\.)?`([^`]+)`\s*\((.*?)\)\s*ENGINE", re.S | re.I)
+_RE_COLUMN = re.compile(r"^\s*`([^`]+)`\s+([A-Za-z]+)", re.M)
+_RE_COLUMN_TYPE = re.compile(r"^\s*`([^`]+)`\s+([A-Za-z]+(?:\([^)]*\))?)", re.M)
+
+# MySQL spatial types, fetched as WKT with ST_AsText
+SPATIAL_TYPES = {"GEOMETRY", "POINT", "LINESTRING", "POLYGON", "MULTIPOINT", "MULTILINESTRING",
+                 "MULTIPOLYGON", "GEOMETRYCOLLECTION"}
+
+# Column names and base types per table, read from a MySQL Workbench schema script
+def read_schema_columns(schema_path: str) -> Dict[str, Dict[str, str]]:
+    with open(schema_path, "r", encoding="utf-8") as f:
+        sql = f.read()
+    return {m.group(1): {col: typ.upper() for col, typ in _RE_COLUMN.findall(m.group(2))}
+            for m in _RE_CREATE.finditer(sql)}
+
+# Full declared column types per table, e.g. {"Wall_Geometry": {"total_height_mm": "DECIMAL(10,3)"}}
+def read_schema_types(schema_path: str) -> Dict[str, Dict[str, str]]:
+    with open(schema_path, "r", encoding="utf-8") as f:
+        sql = f.read()
+    return {m.group(1): {col: typ.upper().replace(" ", "") for col, typ in _RE_COLUMN_TYPE.findall(m.group(2))}
+            for m in _RE_CREATE.finditer(sql)}
+
+# Resolve a schema file named in a mapping, relative to the repository's schemas/ folder
+def resolve_schema_path(mapping_path: str, schema_name: str) -> str:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(mapping_path)))
+    path = os.path.join(repo_root, "schemas", schema_name)
+    if not os.path.exists(path):
+        raise PlanError(f"Schema file {schema_name} named in {mapping_path} not found in schemas/")
+    return path
+
+
+#----------------------------------------------------------------------------------------#
+#                                   PLAN COMPILER
+#----------------------------------------------------------------------------------------#
+
+# Build the ColumnStep for one mapped column, resolving each arg with the given resolver
+def _make_step(table: str, name: str, col_cfg: dict, resolve) -> ColumnStep:
+    formula = col_cfg.get("formula")
+    if formula not in FORMULA_REGISTRY:
+        raise PlanError(f"{table}.{name}: unknown formula '{formula}'")
+    func = FORMULA_REGISTRY[formula]
+    params = list(inspect.signature(func).parameters)
+    element_index = params.index("element") if "element" in params else None
+    args = tuple(resolve(a) for a in col_cfg.get("args", []) or [])
+
+    # Positional checks against the formula signature ('element' is inserted by the loader)
+    call_params = [p for p in params if p != "element"]
+    if len(args) > len(call_params):
+        raise PlanError(f"{table}.{name}: {len(args)} args given, {formula} takes {len(call_params)}")
+    for i, ref in enumerate(args):
+        if isinstance(ref.name, str) and ref.name in call_params and call_params[i] != ref.name:
+            raise PlanError(f"{table}.{name}: arg '{ref.name}' is passed as {formula}'s "
+                            f"'{call_params[i]}' parameter - check the args order")
+    return ColumnStep(table, name, formula, args, element_index)
+
+# Order steps into batches of mutually independent columns (local dependencies only)
+def _batch_steps(table: str, steps: List[ColumnStep]) -> Tuple[Tuple[ColumnStep, ...], ...]:
+    by_name = {step.name: step for step in steps}
+    level: Dict[str, int] = {}
+    remaining = dict(by_name)
+    while remaining:
+        ready = {n: s for n, s in remaining.items()
+                 if all(r.name in level for r in s.args if r.kind == "local" and r.name in by_name)}
+        if not ready:
+            raise PlanError(f"{table}: dependency cycle between columns {sorted(remaining)}")
+        for n, s in ready.items():
+            deps = [level[r.name] for r in s.args if r.kind == "local" and r.name in by_name]
+            level[n] = 1 + max(deps, default=-1)
+            del remaining[n]
+    n_levels = 1 + max(level.values(), default=-1)
+    return tuple(tuple(s for s in steps if level[s.name] == k) for k in range(n_levels))
+
+# Split every table's steps into passes, in role order, so each pass only needs finished columns
+def _schedule(tables: List[Tuple[str, str, str]], steps: Dict[str, List[ColumnStep]]) -> Tuple[Stage, ...]:
+    done: Set[Tuple[str, str]] = set()
+    passes: Dict[str, int] = {}
+    stages: List[Stage] = []
+    pending = {table: list(steps[table]) for _, table, _ in tables}
+    while any(pending.values()):
+        progress = False
+        for role, table, pk in tables:
+            chosen: List[ColumnStep] = []
+            grew = True
+            while grew:   # admit columns whose inputs are done or chosen in this pass
+                grew = False
+                for step in list(pending[table]):
+                    ok = all(
+                        (r.kind in ("source", "literal"))
+                        or ((r.table, r.column) in done)
+                        or (r.kind == "local" and r.column in {c.name for c in chosen})
+                        for r in step.args
+                    )
+                    if ok:
+                        chosen.append(step)
+                        pending[table].remove(step)
+                        grew = True
+            if chosen:
+                pass_index = passes.get(table, 0)
+                passes[table] = pass_index + 1
+                later = tuple(s.name for s in pending[table])
+                stages.append(Stage(role, table, pk, pass_index, _batch_steps(table, chosen), later))
+                done.update((table, s.name) for s in chosen)
+                progress = True
+        if not progress:
+            stuck = [f"{t}.{s.name}" for t, ss in pending.items() for s in ss]
+            raise PlanError(f"Dependency cycle between columns {stuck}")
+    return tuple(stages)
+
+# Compile the phys mapping for one element into an ExecutionPlan
+def compile_phys_plan(mapping: dict, element: str, core_columns: Dict[str, Dict[str, str]]) -> ExecutionPlan:
+    elt = element_prefix(element)
+    fmt = lambda name: name.format(elt=elt)
+
+    # Tables this element loads, in default role order
+    tables = [(role, fmt(t), mapping[fmt(t)].get("pk")) for role, t, elements in PHYS_ROLES
+              if element.lower() in elements and fmt(t) in mapping]
+    roles = {table: role for role, table, _ in tables}
+    computed = {table: list((mapping[table].get("columns") or {}).keys()) for _, table, _ in tables}
+
+    steps: Dict[str, List[ColumnStep]] = {}
+    for role, table, _ in tables:
+        def resolve(arg: Any, table=table, role=role) -> ArgRef:
+            if not isinstance(arg, str):
+                return ArgRef("literal", arg)
+            if arg in computed[table]:
+                return ArgRef("local", arg, table, arg)
+            for up in map(fmt, PHYS_UPSTREAM[role]):
+                if arg in computed.get(up, []):
+                    return ArgRef("upstream", arg, up, arg)
+            for up, col in PHYS_ALIASES.get(arg, []):
+                if col in computed.get(fmt(up), []):
+                    return ArgRef("upstream", arg, fmt(up), col)
+            for src in map(fmt, PHYS_SOURCES[role]):
+                if arg in core_columns.get(src, []):
+                    return ArgRef("source", arg, src, arg)
+            raise PlanError(f"{table}: missing input '{arg}' (not a core column of "
+                            f"{', '.join(map(fmt, PHYS_SOURCES[role]))} or an upstream computed column)")
+        steps[table] = [_make_step(table, name, col_cfg, resolve)
+                        for name, col_cfg in (mapping[table].get("columns") or {}).items()]
+
+    stages = _schedule(tables, steps)
+    read = {t for stage in stages for t in stage.sources()}
+    spatial = {t: tuple(c for c, typ in core_columns[t].items() if typ in SPATIAL_TYPES) for t in read}
+    return ExecutionPlan(element.lower(), stages, {t: c for t, c in spatial.items() if c},
+                         {t: tuple(core_columns[t]) for t in read})
+
+# Compile the analysis mapping into an ExecutionPlan
+def compile_anal_plan(mapping: dict) -> ExecutionPlan:
+    tables = [("capacity", t, cfg.get("pk")) for t, cfg in mapping.items()
+              if isinstance(cfg, dict) and "pk" in cfg]
+    steps: Dict[str, List[ColumnStep]] = {}
+    for _, table, _ in tables:
+        computed = list((mapping[table].get("columns") or {}).keys())
+        def resolve(arg: Any, table=table, computed=computed) -> ArgRef:
+            if not isinstance(arg, str):
+                return ArgRef("literal", arg)
+            if arg in computed:
+                return ArgRef("local", arg, table, arg)
+            if arg in ANAL_INPUTS.get(table, []):
+                return ArgRef("source", arg, table, arg)
+            raise PlanError(f"{table}: missing input '{arg}' (not an assembled feature column)")
+        steps[table] = [_make_step(table, name, col_cfg, resolve)
+                        for name, col_cfg in (mapping[table].get("columns") or {}).items()]
+    return ExecutionPlan(None, _schedule(tables, steps))
+
+
+#----------------------------------------------------------------------------------------#
+#                                   ON-DISK PLAN CACHE
+#----------------------------------------------------------------------------------------#
+
+PLAN_CACHE_DIR = ".plan_cache"
+
+# Fingerprint of everything a compiled plan depends on: mapping, schemas, formulas and this compiler
+def _plan_key(mapping_path: str) -> str:
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(mapping_path)))
+    schema_dir = os.path.join(repo_root, "schemas")
+    paths = [mapping_path, __file__, inspect.getfile(FORMULA_REGISTRY["total_height_mm"])]
+    paths += [os.path.join(schema_dir, n) for n in sorted(os.listdir(schema_dir)) if n.endswith(".sql")]
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:20]
+
+def _cache_path(mapping_path: str, key: str) -> str:
+    folder = os.path.join(os.path.dirname(os.path.abspath(mapping_path)), PLAN_CACHE_DIR)
+    stem = os.path.splitext(os.path.basename(mapping_path))[0]
+    return os.path.join(folder, f"{stem}.{key}.pkl")
+
+# Load compiled plans for a mapping file, compiling (and caching) them when the fingerprint changed
+def load_plans(mapping_path: str, layer: str) -> Tuple[dict, Dict[Optional[str], ExecutionPlan]]:
+    """
+    Returns (mapping, plans) where plans is keyed by element for the phys layer and by None
+    for the analysis layer. Compiled plans are pickled under configs/.plan_cache keyed by a
+    hash of the mapping, the schema files, the formulas module and this compiler, so an unchanged mapping
+    skips YAML parsing and signature inspection at startup.
+    """
+    path = _cache_path(mapping_path, _plan_key(mapping_path))
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                cached = pickle.load(f)
+            return cached["mapping"], cached["plans"]
+        except (EOFError, pickle.UnpicklingError, AttributeError, ImportError): # unreadable cache: recompile
+            print(f"[plan] {os.path.basename(path)} is unreadable, recompiling")
+
+    with open(mapping_path, "r") as f:
+        mapping = yaml.safe_load(f)
+    if layer == "phys":
+        core_columns = read_schema_columns(resolve_schema_path(mapping_path, mapping["source_schema"]))
+        plans = {elt: compile_phys_plan(mapping, elt, core_columns) for elt in ELEMENTS}
+    else:
+        resolve_schema_path(mapping_path, mapping["source_schema"]["core"])
+        plans = {None: compile_anal_plan(mapping)}
+    # Declared types of the written tables, so the writer can compare values as the DB stores them
+    target_types = read_schema_types(resolve_schema_path(mapping_path, mapping["target_schema"]))
+    plans = {k: plan._replace(target_types={t: target_types.get(t, {}) for t in plan.tables()})
+             for k, plan in plans.items()}
+
+    # Dump next to the cache file and move it into place, so an interrupted or concurrent dump
+    # (e.g. phys-worker hosts sharing a checkout) never leaves a truncated cache behind
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"mapping": mapping, "plans": plans}, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    print(f"[plan] compiled {os.path.basename(mapping_path)} -> {os.path.basename(path)}")
+    return mapping, plans
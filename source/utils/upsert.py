@@ -0,0 +1,198 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+
+#----------------------------------------------------------------------------------------#
+#                                   UPSERT WRITERS
+#----------------------------------------------------------------------------------------#
+
+"""
+Two ways of writing a frame into a MySQL table keyed by its primary key:
+ - "chunked":    multi-row INSERT ... ON DUPLICATE KEY UPDATE statements of `chunksize` rows,
+                 streamed over one connection in one transaction. No DDL, one write per row.
+ - "temp_table": the original round trip - stage into a _tmp_ table, INSERT ... SELECT ...
+                 ON DUPLICATE KEY UPDATE from it, then DROP. Kept for benchmarking.
+Neither method creates permanent tables, so loaders for different elements can write the same
+phys table concurrently.
+Spatial columns are sent as WKT and bound through ST_GeomFromText.
+
+Given the rows the table already holds, the writer sends only new rows and rows whose values
+changed, and each changed row updates only the columns that differ. Values are compared as the
+column stores them (DECIMAL scale, FLOAT single precision), so a recomputed 1.23449 does not
+count as a change against a stored 1.234.
+"""
+UPSERT_METHODS = ("chunked", "temp_table")
+DEFAULT_CHUNKSIZE = 1000
+
+
+class UpsertStats(NamedTuple):
+    table: str
+    rows: int                          # rows sent to the server
+    seconds: float
+    method: str
+    inserted: Optional[int] = None     # None when the write was not compared to existing rows
+    updated: Optional[int] = None
+    unchanged: Optional[int] = None
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+    def __str__(self) -> str:
+        line = (f"{self.table}: {self.rows} rows in {self.seconds:.2f}s "
+                f"({self.rows_per_sec:,.0f} rows/s, {self.method})")
+        if self.inserted is not None:
+            line += f" - {self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged"
+        return line
+
+
+#----------------------------------------------------------------------------------------#
+#                                  CHANGE DETECTION
+#----------------------------------------------------------------------------------------#
+
+_INT_TYPES = {"TINYINT", "SMALLINT", "MEDIUMINT", "INT", "INTEGER", "BIGINT", "BOOLEAN", "BOOL"}
+
+# A column's values as MySQL stores them for its declared type, for comparison only
+def _stored(s: pd.Series, typ: str = "") -> pd.Series:
+    base = typ.split("(")[0]
+    if base in ("DECIMAL", "NUMERIC"):
+        scale = int(typ[typ.index(",") + 1:-1]) if "," in typ else 0
+        return pd.to_numeric(s).astype(float).round(scale)
+    if base in ("FLOAT", "REAL"):
+        return pd.to_numeric(s).astype(np.float32).astype(float)
+    if base == "DOUBLE" or base in _INT_TYPES:
+        return pd.to_numeric(s).astype(float)
+    return s.astype(object).where(s.notna(), None).map(lambda v: v if v is None else str(v))
+
+# Split df against the rows the table holds: (new rows, [(changed columns, rows)], unchanged count)
+def diff_rows(df: pd.DataFrame, existing: pd.DataFrame, pk: str,
+              types: Optional[Dict[str, str]] = None) -> Tuple[pd.DataFrame, List[Tuple[List[str], pd.DataFrame]], int]:
+    types = types or {}
+    held = existing.assign(**{pk: existing[pk].astype(str)}).drop_duplicates(pk, keep="last").set_index(pk)
+    keys = df[pk].astype(str)
+    is_new = ~keys.isin(held.index)
+    new, old = df[is_new.to_numpy()], df[~is_new.to_numpy()]
+    if old.empty:
+        return new, [], 0
+
+    prev = held.reindex(keys[~is_new.to_numpy()])
+    changed = pd.DataFrame(index=old.index)
+    for col in (c for c in df.columns if c != pk):
+        if col not in held.columns: # never stored: always written
+            changed[col] = True
+            continue
+        a = _stored(old[col], types.get(col, "")).to_numpy()
+        b = _stored(prev[col], types.get(col, "")).to_numpy()
+        same = (a == b) | (pd.isna(a) & pd.isna(b))
+        changed[col] = ~same
+
+    is_changed = changed.any(axis=1)
+    groups = []
+    if is_changed.any():
+        flags = changed[is_changed]
+        for signature, idx in flags.groupby(list(flags.columns), sort=False).groups.items():
+            signature = signature if isinstance(signature, tuple) else (signature,)
+            cols = [c for c, flag in zip(flags.columns, signature) if flag]
+            groups.append((cols, old.loc[idx]))
+    return new, groups, int((~is_changed).sum())
+
+
+#----------------------------------------------------------------------------------------#
+#                                   UPSERT WRITERS
+#----------------------------------------------------------------------------------------#
+
+# Python values for the DB driver: NaN/NaT -> None, NumPy scalars -> int/float/str
+def _driver_rows(df: pd.DataFrame) -> List[tuple]:
+    clean = df.astype(object).where(df.notna(), None)
+    return [tuple(row) for row in clean.itertuples(index=False, name=None)]
+
+def _placeholders(columns: List[str], spatial: Iterable[str]) -> str:
+    spatial = set(spatial)
+    return "(" + ", ".join("ST_GeomFromText(%s)" if c in spatial else "%s" for c in columns) + ")"
+
+def _update_clause(columns: Iterable[str]) -> str:
+    return ", ".join(f"`{c}`=VALUES(`{c}`)" for c in columns)
+
+# Stream df into table as chunked multi-row upserts, updating `update` columns on duplicates
+def _upsert_chunked(conn, df: pd.DataFrame, target: str, update: List[str],
+                    chunksize: int, spatial: Iterable[str]):
+    cols = ", ".join(f"`{c}`" for c in df.columns)
+    row = _placeholders(list(df.columns), spatial)
+    rows = _driver_rows(df)
+    for start in range(0, len(rows), chunksize):
+        chunk = rows[start:start + chunksize]
+        conn.exec_driver_sql(f"INSERT INTO {target} ({cols}) VALUES {', '.join([row] * len(chunk))} "
+                             f"ON DUPLICATE KEY UPDATE {_update_clause(update)}",
+                             tuple(v for r in chunk for v in r))
+
+# Stage df in a session-private TEMPORARY table, then INSERT ... SELECT ... ON DUPLICATE KEY UPDATE
+# from it. TEMPORARY tables are invisible to other sessions and dropped by the server when the
+# connection closes, so concurrent loads never share (or leave behind) a staging table; the
+# per-call suffix also keeps a pooled connection from meeting its own earlier staging table.
+def _upsert_temp_table(conn, df: pd.DataFrame, target: str, update: List[str],
+                       chunksize: int, spatial: Iterable[str]):
+    schema, table = (part.strip("`") for part in target.split("."))
+    tmp = f"`{schema}`.`_tmp_{table}_{uuid.uuid4().hex[:8]}`"
+    cols = ", ".join(f"`{c}`" for c in df.columns)
+    values = _placeholders(list(df.columns), spatial)
+    rows = _driver_rows(df)
+    conn.exec_driver_sql(f"CREATE TEMPORARY TABLE {tmp} LIKE {target}")
+    try:
+        # Write to temp
+        for start in range(0, len(rows), chunksize):
+            conn.exec_driver_sql(f"INSERT INTO {tmp} ({cols}) VALUES {values}", rows[start:start + chunksize])
+        # Upsert from that temp table
+        conn.exec_driver_sql(f"""
+            INSERT INTO {target} ({cols})
+            SELECT {cols} FROM {tmp}
+            ON DUPLICATE KEY UPDATE {_update_clause(update)}
+        """)
+    finally:
+        # Clean up: drop the temp table once done (the server drops it anyway if we die here)
+        conn.exec_driver_sql(f"DROP TEMPORARY TABLE IF EXISTS {tmp}")
+
+_WRITERS = {"chunked": _upsert_chunked, "temp_table": _upsert_temp_table}
+
+# Upsert df into schema.table by pk with the chosen method, returning timing stats. With
+# `existing` (the table's current rows), unchanged rows are skipped and changed rows update
+# only their differing columns; `types` are the declared column types used for the comparison.
+def upsert_frame(engine, df: pd.DataFrame, table: str, pk: str, schema: Optional[str] = None,
+                 method: str = "chunked", chunksize: int = DEFAULT_CHUNKSIZE,
+                 spatial: Iterable[str] = (), existing: Optional[pd.DataFrame] = None,
+                 types: Optional[Dict[str, str]] = None) -> UpsertStats:
+    if method not in UPSERT_METHODS:
+        raise ValueError(f"Unknown upsert method '{method}', expected one of {UPSERT_METHODS}")
+    writer = _WRITERS[method]
+    target = f"`{schema or engine.url.database}`.`{table}`"
+    chunksize = max(1, int(chunksize))
+    start = time.perf_counter()
+
+    # Repeated keys would be written twice with the last one winning: send only the last
+    df = df.drop_duplicates(pk, keep="last")
+    every = [c for c in df.columns if c != pk]
+    if existing is None:
+        batches, counts = [(every, df)], (None, None, None)
+    else:
+        new, changed, unchanged = diff_rows(df, existing, pk, types)
+        batches = [(every, new)] + changed
+        counts = (len(new), sum(len(rows) for _, rows in changed), unchanged)
+
+    batches = [(update, rows) for update, rows in batches if len(rows)]
+    if batches:
+        with engine.begin() as conn:
+            for update, rows in batches:
+                # A key-only table has nothing to update on a duplicate: re-set the key itself
+                writer(conn, rows, target, update or [pk], chunksize, spatial)
+    sent = sum(len(rows) for _, rows in batches)
+    stats = UpsertStats(table, sent, time.perf_counter() - start, method, *counts)
+    print(f"[write] {stats}")
+    return stats
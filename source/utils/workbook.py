@@ -0,0 +1,76 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Dict, NamedTuple, Optional, Tuple
+import importlib.util
+import os
+import time
+import pandas as pd
+
+
+#----------------------------------------------------------------------------------------#
+#                                   WORKBOOK READER
+#----------------------------------------------------------------------------------------#
+
+"""
+The core loaders read several sheets of one data-collection workbook. read_workbook opens the
+file once and parses each requested sheet from that handle, instead of one pd.read_excel (one
+open and one parse of the shared strings and styles) per sheet.
+
+Sheets are parsed with the Rust-based calamine engine when python-calamine is installed
+(pandas >= 2.2), otherwise with pandas' default openpyxl. Each sheet is cut to the leading
+columns its table modules index (they address cells by position, so the range always starts at
+column 0), extended to the header names they read.
+"""
+
+def _fast_engine() -> Optional[str]:
+    if importlib.util.find_spec("python_calamine") is None:
+        return None
+    major, minor = (int(part) for part in pd.__version__.split(".")[:2])
+    return "calamine" if (major, minor) >= (2, 2) else None
+
+EXCEL_ENGINE = _fast_engine()  # None = pandas' default (openpyxl for .xlsx)
+
+
+class SheetColumns(NamedTuple):
+    """Columns the table modules read from a sheet: the leading `ncols` by position, and names."""
+    ncols: Optional[int] = None     # None: every column
+    names: Tuple[str, ...] = ()
+
+
+# Parse one sheet cut to the leading columns covering `cols`, in a single parse. Named columns can
+# sit anywhere, so those sheets are parsed at full width and cut on the parsed header; a sheet
+# narrower than `ncols` is parsed whole.
+def _parse_sheet(book: pd.ExcelFile, sheet: str, cols: SheetColumns) -> pd.DataFrame:
+    if cols.ncols is None:
+        return book.parse(sheet)
+    if not cols.names:
+        try:
+            return book.parse(sheet, usecols=range(cols.ncols))
+        except pd.errors.ParserError: # fewer than ncols columns
+            return book.parse(sheet)
+    df = book.parse(sheet)
+    header = list(df.columns)
+    last = max([cols.ncols - 1] + [header.index(n) if n in header else len(header) for n in cols.names])
+    return df.iloc[:, :last + 1].copy() if last < len(header) - 1 else df
+
+# Parse the given sheets of a workbook from one open file: {sheet: frame}, in the order asked.
+# Per-sheet parse times are printed, e.g. "[excel] Wall_A.xlsx/Geometry: 812 rows x 43 cols in 0.41s".
+def read_workbook(file_path: str, sheets: Dict[str, SheetColumns],
+                  engine: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    engine = engine or EXCEL_ENGINE
+    name = os.path.basename(file_path)
+    frames: Dict[str, pd.DataFrame] = {}
+    start = time.perf_counter()
+    with pd.ExcelFile(file_path, engine=engine) as book:
+        opened = time.perf_counter() - start
+        for sheet, cols in sheets.items():
+            t0 = time.perf_counter()
+            df = frames[sheet] = _parse_sheet(book, sheet, cols)
+            print(f"[excel] {name}/{sheet}: {len(df)} rows x {df.shape[1]} cols in {time.perf_counter() - t0:.2f}s")
+    print(f"[excel] {name}: {len(frames)} sheets in {time.perf_counter() - start:.2f}s "
+          f"(open {opened:.2f}s, engine {engine or 'default'})")
+    return frames
@@ -0,0 +1,184 @@
+#----------------------------------------------------------------------------------------#
+#                                      PREAMBLE
+#----------------------------------------------------------------------------------------#
+
+# Import packages
+from __future__ import annotations
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import json
+import os
+import socket
+import time
+import traceback
+import pandas as pd
+from sqlalchemy import text
+
+
+#----------------------------------------------------------------------------------------#
+#                                  PHYS WORK QUEUE
+#----------------------------------------------------------------------------------------#
+
+"""
+A distributed phys build splits each element's products into partitions and publishes one
+Phys_Work_Queue row (see schemas/Core_Schema_v4.sql) per partition and phase of the element's
+stages. Products sharing a reinforcement set always land in the same partition, so a partition's
+zones and bars never belong to another one. Phases come from ExecutionPlan.phases(): a stage that
+reads phys rows written by another stage runs in a later phase, and a phase of an element is
+claimable only once every partition of its earlier phases is done (the barrier).
+
+Workers, on any host that reaches the core database, claim rows with SELECT ... FOR UPDATE
+SKIP LOCKED, so no two workers take the same row and none waits on another's claim. A row left
+'running' longer than the lease (its worker died) is claimed again; rebuilding a partition twice
+writes the same rows.
+"""
+QUEUE_TABLE = "Phys_Work_Queue"
+LEASE_SECONDS = 3600
+
+
+class WorkItem(NamedTuple):
+    job: str
+    element: str
+    phase: int
+    part: int
+    products: Tuple[str, ...]
+    reinfs: Tuple[str, ...]
+
+
+# Split products into `parts` partitions, keeping products linked through a reinforcement set
+# together. Returns [(products, reinfs)], largest group first onto the lightest partition;
+# reinforcement sets no product uses (orphan zones) are spread the same way.
+def partition_products(products_reinfs: pd.DataFrame, parts: int,
+                       reinfs: Iterable[str] = ()) -> List[Tuple[List[str], List[str]]]:
+    parent: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    pairs = products_reinfs[["Product_ID", "Reinf_ID"]]
+    for pid, rid in pairs.itertuples(index=False, name=None):
+        if pd.isna(pid):
+            continue
+        node = find(("p", str(pid)))
+        if not pd.isna(rid):
+            parent[node] = find(("r", str(rid)))
+    for rid in reinfs:
+        find(("r", str(rid)))
+
+    groups: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+    for node in list(parent):
+        groups.setdefault(find(node), []).append(node)
+    slices = [([], []) for _ in range(max(1, int(parts)))]
+    for members in sorted(groups.values(), key=lambda m: (-len(m), sorted(m))):
+        products, reinf_ids = min(slices, key=lambda s: len(s[0]) + len(s[1]))
+        products.extend(sorted(key for kind, key in members if kind == "p"))
+        reinf_ids.extend(sorted(key for kind, key in members if kind == "r"))
+    return [s for s in slices if s[0] or s[1]]
+
+# Publish a job's rows: {element: (number of phases, partitions)}. Publishing a job ID that
+# already exists resumes it instead - its failed rows are reset to pending.
+def publish(core_engine, job: str, elements: Dict[str, Tuple[int, List[Tuple[List[str], List[str]]]]]) -> int:
+    with core_engine.begin() as conn:
+        held = conn.execute(text(f"SELECT COUNT(*) FROM {QUEUE_TABLE} WHERE Job_ID = :job"), {"job": job}).scalar()
+        if held:
+            reset = conn.execute(text(f"UPDATE {QUEUE_TABLE} SET Status = 'pending', Worker = NULL, Claimed_At = NULL "
+                                      "WHERE Job_ID = :job AND Status = 'failed'"), {"job": job}).rowcount
+            print(f"[queue] {job}: resuming ({held} rows, {reset} failed rows requeued)")
+            return held
+        rows = [{"job": job, "element": element, "phase": phase, "part": part,
+                 "products": json.dumps(products), "reinfs": json.dumps(reinfs)}
+                for element, (phases, slices) in elements.items()
+                for phase in range(phases) for part, (products, reinfs) in enumerate(slices)]
+        if rows:
+            conn.execute(text(f"INSERT INTO {QUEUE_TABLE} (Job_ID, Element, Phase, Part, Products, Reinfs) "
+                              "VALUES (:job, :element, :phase, :part, :products, :reinfs)"), rows)
+    print(f"[queue] {job}: published {len(rows)} rows for {', '.join(elements) or 'no elements'}")
+    return len(rows)
+
+# A row whose element has finished every earlier phase (its barrier is open)
+_OPEN = f"""NOT EXISTS (SELECT 1 FROM {QUEUE_TABLE} b
+                       WHERE b.Job_ID = q.Job_ID AND b.Element = q.Element
+                         AND b.Phase < q.Phase AND b.Status <> 'done')"""
+
+# Claim the next row whose element has finished every earlier phase, as (item, 0, 0). When there
+# is none, returns (None, rows running or claimable, rows not done), counted in the same
+# transaction after the claim failed: a partition finishing in between (opening a barrier) shows
+# up as claimable, so no rows running or claimable means no row of the job can open up any more.
+def claim(core_engine, job: str, worker: str, lease: int = LEASE_SECONDS) -> Tuple[Optional[WorkItem], int, int]:
+    with core_engine.begin() as conn:
+        row = conn.execute(text(f"""
+            SELECT q.Element, q.Phase, q.Part, q.Products, q.Reinfs FROM {QUEUE_TABLE} q
+            WHERE q.Job_ID = :job
+              AND (q.Status = 'pending'
+                   OR (q.Status = 'running' AND q.Claimed_At < NOW() - INTERVAL :lease SECOND))
+              AND {_OPEN}
+            ORDER BY q.Phase, q.Element, q.Part
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """), {"job": job, "lease": lease}).first()
+        if row is None:
+            live, unfinished = conn.execute(text(f"""
+                SELECT COALESCE(SUM(q.Status = 'running' OR (q.Status = 'pending' AND {_OPEN})), 0),
+                       COALESCE(SUM(q.Status <> 'done'), 0)
+                FROM {QUEUE_TABLE} q WHERE q.Job_ID = :job
+            """), {"job": job}).one()
+            return None, int(live), int(unfinished)
+        conn.execute(text(f"UPDATE {QUEUE_TABLE} SET Status = 'running', Worker = :worker, "
+                          "Claimed_At = CURRENT_TIMESTAMP "
+                          "WHERE Job_ID = :job AND Element = :element AND Phase = :phase AND Part = :part"),
+                     {"job": job, "worker": worker, "element": row[0], "phase": row[1], "part": row[2]})
+    return WorkItem(job, row[0], int(row[1]), int(row[2]), tuple(json.loads(row[3])), tuple(json.loads(row[4]))), 0, 0
+
+def finish(core_engine, item: WorkItem, seconds: float, error: Optional[str] = None):
+    with core_engine.begin() as conn:
+        conn.execute(text(f"UPDATE {QUEUE_TABLE} SET Status = :status, Seconds = :seconds, Detail = :detail "
+                          "WHERE Job_ID = :job AND Element = :element AND Phase = :phase AND Part = :part"),
+                     {"status": "done" if error is None else "failed", "seconds": seconds,
+                      "detail": None if error is None else error[-60000:], "job": item.job,
+                      "element": item.element, "phase": item.phase, "part": item.part})
+
+# Row counts of a job per status, e.g. {"done": 12, "running": 2, "pending": 6}
+def job_status(core_engine, job: str) -> Dict[str, int]:
+    df = pd.read_sql(text(f"SELECT Status, COUNT(*) AS n FROM {QUEUE_TABLE} WHERE Job_ID = :job GROUP BY Status"),
+                     core_engine, params={"job": job})
+    return dict(zip(df["Status"], df["n"].astype(int)))
+
+# Elements of a job with rows not done (failed, or never reached behind a failed phase)
+def unfinished_elements(core_engine, job: str) -> List[str]:
+    df = pd.read_sql(text(f"SELECT DISTINCT Element FROM {QUEUE_TABLE} WHERE Job_ID = :job AND Status <> 'done' "
+                          "ORDER BY Element"), core_engine, params={"job": job})
+    return df["Element"].tolist()
+
+# Claim and run rows until the job is finished, or until only rows behind a failed phase remain.
+# `run_item` does the work of one row; returns the number of rows this worker completed.
+def work(core_engine, job: str, run_item: Callable[[WorkItem], None], worker: Optional[str] = None,
+         poll: float = 2.0, lease: int = LEASE_SECONDS) -> int:
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    completed = 0
+    while True:
+        item, live, unfinished = claim(core_engine, job, worker, lease)
+        if item is None:
+            if not live:
+                if unfinished:
+                    print(f"[queue] {worker}: remaining rows of {job} wait on failed partitions, stopping")
+                break
+            time.sleep(poll) # the next phase opens once the running partitions finish
+            continue
+        start = time.perf_counter()
+        try:
+            run_item(item)
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        seconds = time.perf_counter() - start
+        finish(core_engine, item, seconds, error)
+        print(f"[queue] {worker}: {item.element} phase {item.phase} part {item.part} "
+              f"({len(item.products)} products) {'done' if error is None else 'FAILED'} in {seconds:.1f}s")
+        if error is not None:
+            print(error)
+        else:
+            completed += 1
+    return completed